@@ -0,0 +1,107 @@
+"""
+In-process publish/subscribe for live dashboard events.
+
+Write paths publish small JSON events (stock deltas, new alerts, sales totals)
+per tenant once their transaction commits; the SSE and WebSocket endpoints
+subscribe to a tenant and forward whatever arrives. Each event is encoded once
+and handed to every subscriber's queue, so the cost of a dashboard client is a
+queue slot rather than a database query.
+
+The broker lives in memory, which suits single-node deployments running one
+ASGI process. Events published from other processes (e.g. management commands
+or extra WSGI workers) are not seen by its subscribers.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+
+class Subscription:
+    """One client's view of a tenant's event stream; iterate it from the event loop it was created on."""
+
+    def __init__(self, broker, tenant_id, max_queue):
+        self.broker = broker
+        self.tenant_id = str(tenant_id)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, message):
+        # Runs on the subscriber's loop. A slow client loses its oldest events instead of growing without bound.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class EventBroker:
+    def __init__(self, max_queue=None):
+        self.max_queue = max_queue or getattr(settings, 'LIVE_EVENTS_MAX_QUEUE', 256)
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, tenant_id):
+        subscription = Subscription(self, tenant_id, self.max_queue)
+        with self._lock:
+            self._subscribers[subscription.tenant_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.tenant_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.tenant_id]
+
+    def subscriber_count(self, tenant_id=None):
+        with self._lock:
+            if tenant_id is not None:
+                return len(self._subscribers.get(str(tenant_id), ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, tenant_id, event_type, data):
+        """Fan an event out to the tenant's subscribers. Safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(tenant_id), ()))
+        if not subscribers:
+            return 0
+        message = encode_event(event_type, data)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+def encode_event(event_type, data):
+    return json.dumps({'type': event_type, 'data': data}, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+broker = EventBroker()
+
+
+def publish_on_commit(tenant_id, event_type, data):
+    """Publish once the current transaction commits, so rolled-back writes are never announced."""
+    if not broker.subscriber_count(tenant_id):
+        return
+    transaction.on_commit(lambda: broker.publish(tenant_id, event_type, data))
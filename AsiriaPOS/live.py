@@ -0,0 +1,89 @@
+"""
+Live dashboard endpoints fed by ``AsiriaPOS.events``.
+
+``GET /api/live/events/`` streams server-sent events and ``/ws/live/`` is the
+WebSocket equivalent. Both authenticate once with a JWT access token (the
+``Authorization`` header, or ``?token=`` for browser clients) and then only
+forward events published for that tenant. Each stream opens with a ``snapshot``
+event carrying today's sales totals; after that nothing touches the database.
+Serve them from an ASGI server (uvicorn/daphne) so streams do not hold threads.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.timezone import localdate
+
+from authentication.async_auth import async_api_view
+from authentication.tokens import token_from_header, user_from_access_token
+from sales.sales_counters import adaily_sales_summary
+from .events import broker, encode_event
+
+
+async def _snapshot(user_client_id):
+    summary = await adaily_sales_summary(user_client_id, localdate())
+    return encode_event('snapshot', {'sales': summary})
+
+
+@async_api_view(allow_query_token=True)
+async def dashboard_events(request):
+    """Server-sent event stream of the caller's stock, alert and sales events."""
+    user = request.user
+    keepalive = getattr(settings, 'LIVE_EVENTS_KEEPALIVE', 15)
+    subscription = broker.subscribe(user.pk)
+    snapshot = await _snapshot(user.pk)
+
+    async def stream():
+        try:
+            yield f"data: {snapshot}\n\n"
+            while True:
+                try:
+                    message = await subscription.get(timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def dashboard_websocket(scope, receive, send):
+    """Raw ASGI WebSocket handler; the connection is send-only after the handshake."""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    headers = {key.decode().lower(): value.decode() for key, value in scope.get('headers', [])}
+    raw_token = token_from_header(headers.get('authorization')) or (query.get('token') or [None])[0]
+    user = await sync_to_async(user_from_access_token)(raw_token)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = broker.subscribe(user.pk)
+    try:
+        await send({'type': 'websocket.send', 'text': await _snapshot(user.pk)})
+
+        async def pump():
+            async for event in subscription:
+                await send({'type': 'websocket.send', 'text': event})
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'websocket.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(wait_for_disconnect())]
+        _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+    finally:
+        subscription.close()
@@ -0,0 +1,252 @@
+"""
+Request latency and database metrics, exposed in Prometheus text format at ``/metrics``.
+
+``MetricsMiddleware`` samples ``METRICS_SAMPLE_RATE`` of requests. For each
+sampled request it records, per view:
+- wall time;
+- query count and database time;
+- time spent building serializer ``.data``;
+- response size.
+
+Totals are kept as monotonic counters. The last ``METRICS_BUFFER_SIZE`` samples
+are kept in a ring buffer, which gives the latency quantiles. Unsampled
+requests pay for one random number.
+
+Like the event broker, the metrics live in process memory. Each worker
+process reports its own, so scrape each process (or run one ASGI process).
+"""
+import hmac
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+from .querycount import QueryCounter, count_queries, view_action
+
+Sample = namedtuple('Sample', 'view method status duration db_queries db_time serializer_time response_bytes')
+
+QUANTILES = (0.5, 0.9, 0.99)
+_current = ContextVar('metrics_request', default=None)
+
+
+class _RequestTimer:
+    def __init__(self, queries=None):
+        self.serializer_time = 0.0
+        self.depth = 0
+        # Async requests count their queries here, see ``_count_async_queries``
+        self.queries = queries
+
+
+def _count_async_queries(execute, sql, params, many, context):
+    """``execute_wrapper`` counting a query for the async request that ran it.
+
+    Async views run their queries on the ORM's own thread, whose connections
+    a ``count_queries`` block on the event loop does not reach, and which
+    concurrent requests share. Context variables follow the query there, so
+    the request's timer tells whose query it is.
+    """
+    timer = _current.get()
+    if timer is None or timer.queries is None:
+        return execute(sql, params, many, context)
+    return timer.queries(execute, sql, params, many, context)
+
+
+def _track_async_queries(sender, connection, **kwargs):
+    if _count_async_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_async_queries)
+
+
+def serializer_timing(data):
+    """Wrap a serializer's ``data`` getter so the time the outermost call takes counts as serializer time."""
+    @wraps(data)
+    def timed(self):
+        timer = _current.get()
+        if timer is None or timer.depth:
+            return data(self)
+        timer.depth += 1
+        start = time.perf_counter()
+        try:
+            return data(self)
+        finally:
+            timer.serializer_time += time.perf_counter() - start
+            timer.depth -= 1
+    return timed
+
+
+_serializers_timed = False
+
+
+def time_drf_serializers():
+    """Time ``.data`` on DRF serializers (once per process)."""
+    global _serializers_timed
+    if _serializers_timed:
+        return
+    from rest_framework import serializers
+    for cls in (serializers.BaseSerializer, serializers.Serializer, serializers.ListSerializer):
+        cls.data = property(serializer_timing(cls.data.fget))
+    _serializers_timed = True
+
+
+class MetricsStore:
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def record(self, sample):
+        key = (sample.view, sample.method)
+        with self.lock:
+            self.samples.append(sample)
+            totals = self.totals.setdefault(key, [0, 0.0, 0, 0.0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += sample.duration
+            totals[2] += sample.db_queries
+            totals[3] += sample.db_time
+            totals[4] += sample.serializer_time
+            totals[5] += sample.response_bytes
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.samples), {key: list(values) for key, values in self.totals.items()}
+
+
+store = MetricsStore(getattr(settings, 'METRICS_BUFFER_SIZE', 10000))
+
+
+def view_label(request):
+    """``ViewSet.action`` for DRF viewsets, the URL name or route otherwise."""
+    view_class, action = view_action(request)
+    if view_class is not None:
+        return f"{view_class.__name__}.{action}"
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        time_drf_serializers()
+        self.get_response = get_response
+        # Under ASGI, stay async so async views are not pushed onto a thread
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            connection_created.connect(_track_async_queries, dispatch_uid='metrics_async_queries')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timer = _RequestTimer()
+        token = _current.set(timer)
+        start = time.perf_counter()
+        try:
+            with count_queries() as queries:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries, timer)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        timer = _RequestTimer(QueryCounter())
+        token = _current.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - start, timer.queries, timer)
+        return response
+
+    def record(self, request, response, duration, queries, timer):
+        view = view_label(request)
+        if view != 'metrics':
+            store.record(Sample(
+                view=view,
+                method=request.method,
+                status=response.status_code,
+                duration=duration,
+                db_queries=queries.count,
+                db_time=queries.duration,
+                serializer_time=timer.serializer_time,
+                # Streamed bodies are not in memory; their size is unknown here
+                response_bytes=0 if response.streaming else len(response.content),
+            ))
+
+
+def _quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(view, method, **extra):
+    pairs = {'view': view, 'method': method, **extra}
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs.items()) + '}'
+
+
+def render_prometheus():
+    samples, totals = store.snapshot()
+    durations = {}
+    for sample in samples:
+        durations.setdefault((sample.view, sample.method), []).append(sample.duration)
+
+    lines = [
+        '# HELP asiria_metrics_sample_rate Fraction of requests sampled into these metrics',
+        '# TYPE asiria_metrics_sample_rate gauge',
+        f"asiria_metrics_sample_rate {getattr(settings, 'METRICS_SAMPLE_RATE', 0)}",
+        '# HELP asiria_request_duration_seconds Wall time of sampled requests; quantiles cover the recent samples only',
+        '# TYPE asiria_request_duration_seconds summary',
+    ]
+    for (view, method), values in sorted(totals.items()):
+        recent = sorted(durations.get((view, method), ()))
+        for q in QUANTILES if recent else ():
+            lines.append(f"asiria_request_duration_seconds{_labels(view, method, quantile=q)} {_quantile(recent, q):.6f}")
+        lines.append(f"asiria_request_duration_seconds_sum{_labels(view, method)} {values[1]:.6f}")
+        lines.append(f"asiria_request_duration_seconds_count{_labels(view, method)} {values[0]}")
+
+    for index, name, help_text in (
+        (2, 'asiria_db_queries_total', 'Database queries run by sampled requests'),
+        (3, 'asiria_db_query_seconds_total', 'Database time of sampled requests'),
+        (4, 'asiria_serializer_seconds_total', 'Serializer time of sampled requests'),
+        (5, 'asiria_response_bytes_total', 'Response bytes of sampled requests (streamed responses excluded)'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (view, method), values in sorted(totals.items()):
+            value = values[index]
+            lines.append(f"{name}{_labels(view, method)} {value:.6f}" if isinstance(value, float) else f"{name}{_labels(view, method)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """Prometheus scrape endpoint. Needs ``Authorization: Bearer <METRICS_TOKEN>``, or a staff session when no token is set."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,17 @@
+import csv
+import datetime
+import itertools
+import tempfile
+import uuid
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from functools import wraps
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 class SwaggerTagMixin:
     swagger_tag = None  # Set in your ViewSet
@@ -16,3 +28,84 @@ class SwaggerTagMixin:
                     setattr(view.cls, method_name, decorated)
         
         return view
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the row straight back, for streaming ``csv.writer`` output."""
+    def write(self, value):
+        return value
+
+
+class ExportMixin:
+    """Adds ``GET <list>/export/?export_format=csv|xlsx`` to a viewset.
+
+    Rows come from ``filter_queryset(get_queryset())``, so exports honour the
+    same filters as the list endpoint, and are read with ``values_list()``
+    in chunks. CSV is streamed as it is read. XLSX (needs ``openpyxl``) is
+    written to a temporary file in write-only mode, then streamed.
+    """
+    export_fields = None  # Field names or lookups such as 'product__name'; default: the model's own fields
+    export_chunk_size = 2000
+    XLSX_MAX_ROWS = 1048575  # Excel's sheet limit less the header row; longer exports continue on a new sheet
+
+    def get_export_fields(self):
+        if self.export_fields:
+            return list(self.export_fields)
+        return [field.name for field in self.get_queryset().model._meta.concrete_fields]
+
+    def get_export_filename(self):
+        return f"{self.basename}-{timezone.localtime():%Y%m%d-%H%M%S}"
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('export_format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['csv', 'xlsx'], description='File format (default csv)'),
+    ])
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Download every row matching the list filters as CSV or XLSX."""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in ('csv', 'xlsx'):
+            return Response({'detail': "export_format must be 'csv' or 'xlsx'"}, status=status.HTTP_400_BAD_REQUEST)
+        fields = self.get_export_fields()
+        rows = self.filter_queryset(self.get_queryset()).values_list(*fields).iterator(chunk_size=self.export_chunk_size)
+        if export_format == 'xlsx':
+            return self.export_xlsx(fields, rows)
+
+        writer = csv.writer(_Echo())
+        lines = itertools.chain([writer.writerow(fields)], (writer.writerow(row) for row in rows))
+        response = StreamingHttpResponse(lines, content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{self.get_export_filename()}.csv"'
+        return response
+
+    def export_xlsx(self, fields, rows):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            return Response({'detail': 'openpyxl package not installed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        workbook = Workbook(write_only=True)
+        sheet, sheet_rows = None, self.XLSX_MAX_ROWS
+        for row in rows:
+            if sheet_rows == self.XLSX_MAX_ROWS:
+                sheet, sheet_rows = workbook.create_sheet(), 0
+                sheet.append(fields)
+            sheet.append([_xlsx_value(value) for value in row])
+            sheet_rows += 1
+        if sheet is None:
+            workbook.create_sheet().append(fields)
+
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+        return FileResponse(
+            output, as_attachment=True, filename=f"{self.get_export_filename()}.xlsx",
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+
+def _xlsx_value(value):
+    # openpyxl rejects timezone-aware datetimes and UUIDs
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
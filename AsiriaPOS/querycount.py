@@ -0,0 +1,114 @@
+"""
+Per-request database query counting and query budgets.
+
+``QueryCountMiddleware`` counts the queries each request runs. With
+``QUERY_COUNT_HEADERS`` on, it reports them in ``X-DB-Query-Count`` and
+``X-DB-Query-Time-Ms``. It also checks the count against the viewset's
+``query_budgets`` (``{action: max queries}``). A request over budget is
+logged along with the statements it repeated, which is how an N+1 shows up.
+With ``QUERY_BUDGET_STRICT`` on (as in tests), ``QueryBudgetExceeded`` is
+raised instead.
+
+The middleware only runs when ``QUERY_COUNT_ENABLED`` is true. It defaults
+to ``DEBUG``, so production requests skip the extra work.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """``execute_wrapper`` that records every statement run and their total time."""
+
+    def __init__(self):
+        self.statements = []
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.statements.append(sql)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated(self, threshold):
+        """Statements (as SQL with placeholders) run at least ``threshold`` times, most repeated first."""
+        return [(sql, count) for sql, count in Counter(self.statements).most_common() if count >= threshold]
+
+
+@contextmanager
+def count_queries():
+    """Count the queries run on every database connection inside the block."""
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+def view_action(request):
+    """``(viewset class, action)`` serving ``request``, or ``(None, None)`` when it is not a DRF viewset route."""
+    match = getattr(request, 'resolver_match', None)
+    view_class = getattr(getattr(match, 'func', None), 'cls', None)
+    actions = getattr(match.func, 'actions', None) if view_class else None
+    if not actions:
+        return None, None
+    return view_class, actions.get(request.method.lower())
+
+
+def view_query_budget(request):
+    """``(view name, budget)`` for the DRF viewset action serving ``request``, or ``(None, None)``."""
+    view_class, action = view_action(request)
+    if view_class is None:
+        return None, None
+    budget = (getattr(view_class, 'query_budgets', None) or {}).get(action)
+    return f"{view_class.__name__}.{action}", budget
+
+
+def check_query_budget(request, counter):
+    """Log (or with ``QUERY_BUDGET_STRICT``, raise) when the request ran more queries than its action allows."""
+    name, budget = view_query_budget(request)
+    if budget is None or counter.count <= budget:
+        return
+    repeated = counter.repeated(getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 5))
+    message = f"{name} ran {counter.count} queries, budget is {budget} ({request.method} {request.path})"
+    if repeated:
+        message += "; repeated: " + "; ".join(f"{count}x {sql[:200]}" for sql, count in repeated[:3])
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class QueryCountMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_COUNT_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with count_queries() as counter:
+            response = self.get_response(request)
+        # Streamed bodies query while they are sent, after this point, so their counts would be partial
+        if response.streaming:
+            return response
+        if getattr(settings, 'QUERY_COUNT_HEADERS', True):
+            response['X-DB-Query-Count'] = str(counter.count)
+            response['X-DB-Query-Time-Ms'] = f"{counter.duration * 1000:.1f}"
+        check_query_budget(request, counter)
+        return response
@@ -49,11 +49,14 @@ INSTALLED_APPS = [
     'Domain',
     'authentication',
     'registry',
+    'reports',
+    'benchmarks',
     'rest_framework_simplejwt.token_blacklist',
 
 ]
 
 MIDDLEWARE = [
+    "AsiriaPOS.metrics.MetricsMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     "django.middleware.security.SecurityMiddleware",
@@ -63,6 +66,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "AsiriaPOS.querycount.QueryCountMiddleware",
 
 ]
 
@@ -191,3 +195,46 @@ SIMPLE_JWT = {
 
 # Token hashing salt for payment identifiers (do not expose publicly)
 TOKEN_HASH_SALT = "change-this-salt-in-production"
+
+# How long checkout responses are kept for replay against a repeated Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Offline sale uploads: most sales accepted per request, and sales written per transaction
+OFFLINE_SALES_BATCH_MAX_SIZE = 500
+OFFLINE_SALES_CHUNK_SIZE = 100
+
+# Seconds a tenant's daily sales counters stay cached; new sales also evict the entry on commit
+SALES_COUNTER_CACHE_TTL = 60
+
+# Live dashboard feed (SSE /api/live/events/, WebSocket /ws/live/): seconds between
+# keepalive comments, and events buffered per client before the oldest are dropped
+LIVE_EVENTS_KEEPALIVE = 15
+LIVE_EVENTS_MAX_QUEUE = 256
+
+# Bulk product import (POST /api/products/import/, manage.py import_products): most rows accepted
+# per request, and products written per transaction
+PRODUCT_IMPORT_MAX_ROWS = 50000
+PRODUCT_IMPORT_CHUNK_SIZE = 1000
+
+# Background report jobs (manage.py run_report_jobs): how long a finished result is reused
+# for identical requests, and how long a job may run before it is assumed dead and requeued
+REPORT_JOB_RESULT_TTL = timedelta(hours=24)
+REPORT_JOB_TIMEOUT = timedelta(minutes=30)
+
+# Query counting (AsiriaPOS/querycount.py): on by default when DEBUG. Adds X-DB-Query-* headers,
+# logs requests over their viewset's query_budgets (raises instead when strict), and reports
+# statements repeated this many times as a likely N+1
+QUERY_COUNT_ENABLED = DEBUG
+QUERY_COUNT_HEADERS = True
+QUERY_BUDGET_STRICT = False
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+
+# Request metrics (AsiriaPOS/metrics.py, scraped at /metrics): fraction of requests sampled
+# (0 turns the middleware off), recent samples kept for latency quantiles, and the bearer
+# token the scraper sends (when empty, only staff sessions may read the endpoint)
+METRICS_SAMPLE_RATE = 0.1
+METRICS_BUFFER_SIZE = 10000
+METRICS_TOKEN = ''
+
+# Batch PO conversion (POST /api/purchase-orders/convert-batch/): most orders converted per request
+PO_CONVERT_BATCH_MAX_SIZE = 500
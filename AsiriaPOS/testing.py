@@ -0,0 +1,53 @@
+"""
+Helpers for tests that guard query counts.
+
+    class ProductListTests(QueryCountTestMixin, TestCase):
+        def test_list_has_no_n_plus_one(self):
+            self.assertNoNPlusOne('/api/products/', lambda: make_products(10))
+
+``assertNoNPlusOne`` requests the URL, calls ``grow`` to add rows, then
+requests it again. It fails if the second request ran more queries, or if
+any statement repeated ``QUERY_N_PLUS_ONE_THRESHOLD`` times. Either means
+something is loaded per row. Both requests must also stay within the view's
+``query_budgets``.
+"""
+from django.conf import settings
+
+from .querycount import count_queries, view_query_budget
+
+
+class QueryCountTestMixin:
+    """For ``TestCase`` subclasses with an authenticated ``self.client`` (e.g. DRF's ``APIClient``)."""
+
+    def request_queries(self, url, method='get', **kwargs):
+        """``(response, QueryCounter)`` for one successful request that stays within its view's budget, if it has one."""
+        with count_queries() as counter:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, f"{method.upper()} {url} returned {response.status_code}")
+        name, budget = view_query_budget(response.wsgi_request)
+        if budget is not None:
+            self.assertLessEqual(counter.count, budget, f"{name}: {counter.count} queries, budget is {budget}")
+        return response, counter
+
+    def assertMaxQueries(self, url, budget, method='get', **kwargs):
+        response, counter = self.request_queries(url, method, **kwargs)
+        self.assertLessEqual(counter.count, budget, f"{method.upper()} {url}: {counter.count} queries, budget is {budget}")
+        return response
+
+    def assertWithinQueryBudget(self, url, method='get', **kwargs):
+        """The request stays within the budget its viewset declares (and the view declares one)."""
+        response, _ = self.request_queries(url, method, **kwargs)
+        name, budget = view_query_budget(response.wsgi_request)
+        self.assertIsNotNone(budget, f"{name or url} declares no query budget")
+        return response
+
+    def assertNoNPlusOne(self, url, grow, method='get', **kwargs):
+        _, before = self.request_queries(url, method, **kwargs)
+        grow()
+        _, after = self.request_queries(url, method, **kwargs)
+        threshold = getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 5)
+        self.assertEqual(
+            after.count, before.count,
+            f"{url}: {before.count} queries before adding rows, {after.count} after; repeated: {after.repeated(2)[:3]}",
+        )
+        self.assertEqual(after.repeated(threshold), [], f"{url} repeats statements per row")
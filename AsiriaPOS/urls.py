@@ -19,14 +19,14 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from users.views import UserClientViewSet
-from products.views import ProductViewSet, UnitViewSet, CategoryViewSet, StockMovementViewSet, StockAdjustmentViewSet, StockAlertViewSet, LocationViewSet, ProductLocationStockViewSet, StockTransferViewSet
+from products.views import ProductViewSet, UnitViewSet, CategoryViewSet, StockMovementViewSet, StockAdjustmentViewSet, StockAlertViewSet, LocationViewSet, ProductLocationStockViewSet, StockTransferViewSet, PriceListViewSet
 from registry.views import CustomerViewSet, SupplierViewSet, PaymentOptionViewSet, ExpenseCategoryViewSet, ExpenseViewSet, AnonymousIdentifyAPIView, AnonymousProfileViewSet
 from sales.views import SalesHeaderViewSet, SalesDetailViewSet, ReceiptViewSet, CashSessionViewSet, SalesPaymentViewSet, SalesReturnViewSet, SalesRefundViewSet, SalesReservationViewSet
 from purchases.views import (
     PurchaseHeaderViewSet, PurchaseDetailViewSet, PaymentViewSet,
     PurchaseOrderHeaderViewSet, PurchaseOrderDetailViewSet, GRNHeaderViewSet, GRNDetailViewSet,
-    PurchaseOrderCreateAPIView, PurchaseOrderConvertAPIView, PurchaseGenerateGRNAPIView,
-    PurchaseOrderRetrieveHeaderAPIView, PurchaseOrderRetrieveFullAPIView,
+    PurchaseOrderCreateAPIView, PurchaseOrderConvertAPIView, PurchaseOrderBatchConvertAPIView, PurchaseGenerateGRNAPIView,
+    PurchaseOrderRetrieveHeaderAPIView, PurchaseOrderRetrieveFullAPIView, PurchaseOrderMatchAPIView, PurchaseOrderOutstandingAPIView,
     PurchaseRetrieveHeaderAPIView, PurchaseRetrieveFullAPIView,
 )
 from rest_framework import permissions
@@ -40,7 +40,12 @@ from django.conf import settings
 # from wagtail.admin import urls as wagtailadmin_urls
 # from wagtail.documents import urls as wagtaildocs_urls
 
-from sales_views.views import TodaysSalesTotalAPIView, CheckoutInitializeAPIView, ReceiptLinkAPIView, ReceiptLinkByTokenAPIView
+from reports.views import ReportJobViewSet
+from sales_views.views import TodaysSalesTotalAPIView, CheckoutInitializeAPIView, CheckoutBatchUploadAPIView, ReceiptLinkAPIView, ReceiptLinkByTokenAPIView
+from AsiriaPOS.live import dashboard_events
+from AsiriaPOS.metrics import metrics
+from products import async_views as product_async_views
+from sales_views import async_views as sales_async_views
 
 class CustomSchemaGenerator(OpenAPISchemaGenerator):
     def get_schema(self, request=None, public=False):
@@ -67,6 +72,7 @@ router.register(r'stock-alerts', StockAlertViewSet, basename='stock-alerts')
 router.register(r'locations', LocationViewSet, basename='locations')
 router.register(r'location-stocks', ProductLocationStockViewSet, basename='location-stocks')
 router.register(r'stock-transfers', StockTransferViewSet, basename='stock-transfers')
+router.register(r'price-lists', PriceListViewSet, basename='price-lists')
 router.register(r'salesheaders', SalesHeaderViewSet, basename='salesheaders')
 router.register(r'salesdetails', SalesDetailViewSet, basename='salesdetails')
 router.register(r'receipts', ReceiptViewSet, basename='receipts')
@@ -88,6 +94,7 @@ router.register(r'paymentsoptions', PaymentOptionViewSet, basename='paymentsopti
 router.register(r'expensecategories', ExpenseCategoryViewSet, basename='expensecategories')
 router.register(r'expenses', ExpenseViewSet, basename='expenses')
 router.register(r'anonymousprofiles', AnonymousProfileViewSet, basename='anonymousprofiles')
+router.register(r'report-jobs', ReportJobViewSet, basename='report-jobs')
 
 # Swagger Schema Configuration
 schema_view = get_schema_view(
@@ -115,12 +122,26 @@ urlpatterns = [
     path('api/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/logout/', CustomLogoutView.as_view(), name='token_logout'),
     path('api/sales/today/', TodaysSalesTotalAPIView.as_view(), name='todays-sales'),
+    path('api/live/events/', dashboard_events, name='live-events'),
+    path('metrics', metrics, name='metrics'),
+    # Async read endpoints; run under AsiriaPOS/asgi.py to keep slow reads off the worker threads
+    path('api/async/products/', product_async_views.product_list, name='async-product-list'),
+    path('api/async/products/scan/', product_async_views.product_scan, name='async-product-scan'),
+    path('api/async/products/stock-summary/', product_async_views.stock_summary, name='async-stock-summary'),
+    path('api/async/reports/valuation/', product_async_views.valuation_report, name='async-valuation-report'),
+    path('api/async/reports/sales/', sales_async_views.sales_report, name='async-sales-report'),
+    path('api/async/reports/margin/', sales_async_views.margin_report, name='async-margin-report'),
+    path('api/async/sales/today/', sales_async_views.todays_sales, name='async-todays-sales'),
     path('api/checkout/initialize/', CheckoutInitializeAPIView.as_view(), name='checkout-initialize'),
+    path('api/checkout/batch/', CheckoutBatchUploadAPIView.as_view(), name='checkout-batch'),
     path('api/receipt/link/', ReceiptLinkAPIView.as_view(), name='receipt-link'),
     path('api/receipt/link-token/', ReceiptLinkByTokenAPIView.as_view(), name='receipt-link-token'),
     # Purchases flow endpoints
     path('api/purchase-orders/create/', PurchaseOrderCreateAPIView.as_view(), name='po-create'),
     path('api/purchase-orders/<uuid:po_header_id>/convert-to-purchase/', PurchaseOrderConvertAPIView.as_view(), name='po-convert'),
+    path('api/purchase-orders/convert-batch/', PurchaseOrderBatchConvertAPIView.as_view(), name='po-convert-batch'),
+    path('api/purchase-orders/outstanding/', PurchaseOrderOutstandingAPIView.as_view(), name='po-outstanding'),
+    path('api/purchase-orders/<uuid:po_header_id>/match/', PurchaseOrderMatchAPIView.as_view(), name='po-match'),
     path('api/purchase-orders/<uuid:po_header_id>/header/', PurchaseOrderRetrieveHeaderAPIView.as_view(), name='po-get-header'),
     path('api/purchase-orders/<uuid:po_header_id>/full/', PurchaseOrderRetrieveFullAPIView.as_view(), name='po-get-full'),
     path('api/purchases/<uuid:purchase_header_id>/generate-grn/', PurchaseGenerateGRNAPIView.as_view(), name='purchase-generate-grn'),
@@ -0,0 +1,37 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+from .tokens import token_from_header, user_from_access_token
+
+# Mirrors IsOwner | IsManager | IsEmployee on the DRF viewsets
+STAFF_GROUPS = ('Owner', 'Manager', 'Employee')
+
+
+def async_api_view(methods=('GET',), groups=STAFF_GROUPS, allow_query_token=False):
+    """Authenticate a plain async Django view with a SimpleJWT access token.
+
+    DRF views are synchronous, so async endpoints authenticate here instead:
+    the token comes from ``Authorization: Bearer`` (or ``?token=`` when
+    ``allow_query_token`` is set, for EventSource/WebSocket clients), the user
+    must belong to one of ``groups``, and ``request.user`` is set before the
+    view runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            raw_token = token_from_header(request.headers.get('Authorization'))
+            if raw_token is None and allow_query_token:
+                raw_token = request.GET.get('token')
+            user = await sync_to_async(user_from_access_token)(raw_token)
+            if user is None:
+                return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+            if groups and not await user.groups.filter(name__in=groups).aexists():
+                return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,25 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+
+def user_from_access_token(raw_token):
+    """Resolve a raw JWT access token to its active user, or None when it is missing or invalid.
+
+    Used by the live event endpoints, which run outside DRF and may receive the
+    token as a query parameter (browsers cannot set headers on EventSource/WebSocket).
+    """
+    if not raw_token:
+        return None
+    auth = JWTAuthentication()
+    try:
+        validated = auth.get_validated_token(raw_token)
+        return auth.get_user(validated)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def token_from_header(authorization):
+    parts = (authorization or '').split()
+    if len(parts) == 2 and parts[0] == 'Bearer':
+        return parts[1]
+    return None
@@ -0,0 +1,267 @@
+"""
+Synthetic store data for the benchmarks.
+
+``generate_stores`` builds tenants with a catalog and years of trading
+history: daily sales with line items, weekly purchase orders that were
+converted to purchases and received with a GRN, and the stock movements
+and FIFO cost layers for all of it. Open orders, and converted orders not
+received yet, are added for the scenarios that change them. Rows are
+written with ``bulk_create``, so model signals do not run. The generator
+keeps ``Product.stock`` equal to the sum of each product's movements itself,
+as the signals would, and costs each sale line from the layers as checkout
+does.
+
+``bulk_create`` stamps ``auto_now_add`` fields with the current time, so each
+day's rows are backdated with one ``UPDATE`` per table afterwards. Sales
+are added to the running sales counters as checkout would.
+"""
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import Category, CostLayer, Unit, Product, StockMovement
+from purchases.conversion import convert_purchase_orders
+from purchases.models import (
+    PurchaseHeader, PurchaseDetail, PurchaseOrderHeader, PurchaseOrderDetail, GRNHeader, GRNDetail,
+)
+from registry.models import Customer, PaymentOption, Supplier
+from sales.models import SalesHeader, SalesDetail, SalesCounter
+from users.models import UserClient
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class Store:
+    """One generated tenant and the rows the scenarios pick from."""
+    user_client: UserClient
+    payment_option: PaymentOption
+    products: list
+    customers: list
+    suppliers: list
+    open_orders: list = field(default_factory=list)
+    open_purchases: list = field(default_factory=list)
+    # Running stock and cost layers (oldest first) per product id while the history is generated
+    stock: dict = field(default_factory=dict)
+    layers: dict = field(default_factory=dict)
+
+
+def generate_stores(tenants=2, products=500, years=1, sales_per_day=20, open_orders=50, opening_stock=None, seed=0, log=None):
+    """Create ``tenants`` stores; each gets ``open_orders`` unconverted purchase orders for the convert scenario
+    and as many unreceived purchases for the GRN scenario.
+
+    Products open with ``opening_stock`` units each, or a random 200-400 when it is not given.
+    """
+    rng = random.Random(seed)
+    owner_group, _ = Group.objects.get_or_create(name='Owner')
+    end = timezone.localdate()
+    start = end - timedelta(days=365 * years)
+    stores = []
+    for index in range(tenants):
+        store = _make_store(rng, index, products, owner_group)
+        _trade(rng, store, start, end, sales_per_day, opening_stock)
+        store.open_orders = _make_orders(rng, store, open_orders)
+        store.open_purchases = _make_purchases(rng, store, open_orders)
+        stores.append(store)
+        if log:
+            log(f"Store {index + 1}/{tenants}: {store.user_client.storename}")
+    return stores
+
+
+def _make_store(rng, index, product_count, owner_group):
+    suffix = uuid.uuid4().hex[:8]
+    user_client = UserClient.objects.create_user(
+        phone_number=f'bench{suffix}', email=f'bench-{suffix}@example.com', password=None,
+        storename=f'bench-{suffix}', client_name=f'Benchmark store {index + 1}',
+    )
+    user_client.groups.add(owner_group)
+    payment_option = PaymentOption.objects.create(user_client=user_client, name='Cash')
+    categories = Category.objects.bulk_create([
+        Category(user_client=user_client, name=f'Bench {suffix} {i}') for i in range(20)
+    ])
+    unit = Unit.objects.create(user_client=user_client, unit_name=f'bench-{suffix}')
+    catalog = []
+    for i in range(product_count):
+        cost = Decimal(rng.randint(50, 5000)) / 100
+        catalog.append(Product(
+            user_client=user_client, category=categories[i % len(categories)], unit=unit,
+            name=f'Product {i}', sku=f'B{suffix}{i}', barcode=f'B{suffix}{i}', minQuantity=5,
+            price=(cost * Decimal('1.35')).quantize(Decimal('0.01')), cost=cost, average_cost=cost, stock=0,
+        ))
+    Product.objects.bulk_create(catalog, batch_size=BATCH_SIZE)
+    customers = Customer.objects.bulk_create([
+        Customer(user_client=user_client, name=f'Customer {i}', phone=f'9{index:03d}{i:06d}', address='')
+        for i in range(50)
+    ])
+    suppliers = Supplier.objects.bulk_create([
+        Supplier(user_client=user_client, name=f'Supplier {i}', email=f'supplier{i}-{suffix}@example.com',
+                 phone=f'8{index:03d}{i:06d}', address='')
+        for i in range(5)
+    ])
+    return Store(user_client, payment_option, catalog, customers, suppliers, stock={product.pk: 0 for product in catalog})
+
+
+def _trade(rng, store, start, end, sales_per_day, opening_stock):
+    """Opening stock on ``start``, then a purchase every Monday and ``sales_per_day`` sales every day until ``end``."""
+    day = start
+    _receive(rng, store, day, store.products, initial=True, opening_stock=opening_stock)
+    while day <= end:
+        if day.weekday() == 0:
+            _receive(rng, store, day, rng.sample(store.products, min(20, len(store.products))))
+        _sell(rng, store, day, sales_per_day)
+        day += timedelta(days=1)
+    for product in store.products:
+        product.stock = store.stock[product.pk]
+    Product.objects.bulk_update(store.products, ['stock'], batch_size=BATCH_SIZE)
+    CostLayer.objects.bulk_update(
+        [layer for layers in store.layers.values() for layer in layers], ['remaining_quantity'], batch_size=BATCH_SIZE,
+    )
+
+
+def _at(day, seconds=0):
+    return timezone.make_aware(datetime.combine(day, time(8))) + timedelta(seconds=seconds)
+
+
+def _movement(store, product, movement_type, quantity, reference, reason):
+    previous = store.stock[product.pk]
+    store.stock[product.pk] = previous + quantity
+    return StockMovement(
+        user_client=store.user_client, product=product, movement_type=movement_type, quantity=quantity,
+        previous_stock=previous, new_stock=previous + quantity, reference_number=reference,
+        reason=reason, created_by=store.user_client,
+    )
+
+
+def _backdate(model, rows, **values):
+    model.objects.filter(pk__in=[row.pk for row in rows]).update(**values)
+
+
+def _receive(rng, store, day, products, initial=False, opening_stock=None):
+    """A converted purchase order with its purchase, GRN and PURCHASE (or INITIAL) movements."""
+    user_client = store.user_client
+    supplier = rng.choice(store.suppliers)
+    when = _at(day)
+    if initial:
+        lines = [(product, opening_stock or rng.randint(200, 400)) for product in products]
+    else:
+        lines = [(product, rng.randint(20, 120)) for product in products]
+    total = sum(product.cost * quantity for product, quantity in lines)
+    reference = uuid.uuid4().hex[:10].upper()
+
+    purchase = PurchaseHeader.objects.create(
+        user_client=user_client, supplier=supplier, payment_option=store.payment_option,
+        order_number=f'PU-{reference}', invoice_number=f'INV-{reference}',
+        subtotal=total, total_cost=total, remaining_balance=0,
+    )
+    order = PurchaseOrderHeader.objects.create(
+        user_client=user_client, supplier=supplier, order_number=f'PO-{reference}', expected_date=day,
+        converted_purchase=purchase,
+    )
+    grn = GRNHeader.objects.create(
+        user_client=user_client, supplier=supplier, po_header=order, purchase_header=purchase,
+        grn_number=f'GRN-{reference}',
+    )
+    order_lines, purchase_lines, grn_lines, layers, movements = [], [], [], [], []
+    for product, quantity in lines:
+        line = dict(user_client=user_client, product=product, unit=product.unit, quantity=quantity, price_per_unit=product.cost)
+        order_lines.append(PurchaseOrderDetail(po_header=order, received_quantity=quantity, **line))
+        purchase_lines.append(PurchaseDetail(purchase_header=purchase, po_detail=order_lines[-1], received_quantity=quantity, **line))
+        grn_lines.append(GRNDetail(grn_header=grn, purchase_detail=purchase_lines[-1], **line))
+        layers.append(CostLayer(
+            user_client=user_client, product=product, grn_detail=grn_lines[-1], quantity=quantity,
+            remaining_quantity=quantity, unit_cost=product.cost, reference_number=grn.grn_number, received_at=when,
+        ))
+        store.layers.setdefault(product.pk, []).append(layers[-1])
+        movements.append(_movement(store, product, 'INITIAL' if initial else 'PURCHASE', quantity, grn.grn_number, f"GRN from {supplier.name}"))
+    for model, rows in ((PurchaseOrderDetail, order_lines), (PurchaseDetail, purchase_lines), (GRNDetail, grn_lines)):
+        model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        _backdate(model, rows, created_at=when)
+    CostLayer.objects.bulk_create(layers, batch_size=BATCH_SIZE)
+    StockMovement.objects.bulk_create(movements, batch_size=BATCH_SIZE)
+    _backdate(StockMovement, movements, created_at=when)
+    _backdate(PurchaseHeader, [purchase], created_at=when, purchase_date=when)
+    _backdate(PurchaseOrderHeader, [order], created_at=when)
+    _backdate(GRNHeader, [grn], created_at=when, received_date=when)
+
+
+def _sell(rng, store, day, count):
+    headers, details, movements = [], [], []
+    for n in range(count):
+        sold_at = _at(day, n * 60)
+        lines = {}
+        for product in rng.sample(store.products, min(rng.randint(1, 5), len(store.products))):
+            quantity = min(rng.randint(1, 3), store.stock[product.pk])
+            if quantity:
+                lines[product] = quantity
+        if not lines:
+            continue
+        total = sum(product.price * quantity for product, quantity in lines.items())
+        header = SalesHeader(
+            user_client=store.user_client, customer=rng.choice(store.customers) if rng.random() < 0.3 else None,
+            payment_option=store.payment_option, order_number=f'SO-{uuid.uuid4().hex[:12].upper()}',
+            subtotal=total, total_price=total, remaining_balance=0, status='CONFIRMED', sold_at=sold_at,
+        )
+        headers.append(header)
+        for product, quantity in lines.items():
+            details.append(SalesDetail(
+                sales_header=header, user_client=store.user_client, product=product, unit=product.unit,
+                quantity=quantity, price_per_unit=product.price, cost_of_goods=_consume(store, product, quantity),
+            ))
+            movements.append(_movement(store, product, 'SALE', -quantity, header.order_number, 'Sale'))
+    if not headers:
+        return
+    when = _at(day)
+    for model, rows in ((SalesHeader, headers), (SalesDetail, details), (StockMovement, movements)):
+        model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        _backdate(model, rows, created_at=when)
+    for header in headers:
+        header.created_at = when
+    SalesCounter.record_sales(headers)
+
+
+def _consume(store, product, quantity):
+    """Take ``quantity`` from the product's oldest open layers and return its cost."""
+    cost = Decimal('0')
+    for layer in store.layers[product.pk]:
+        taken = min(quantity, layer.remaining_quantity)
+        layer.remaining_quantity -= taken
+        cost += taken * layer.unit_cost
+        quantity -= taken
+        if not quantity:
+            break
+    return cost
+
+
+def _make_orders(rng, store, count):
+    """Unconverted purchase orders of 10 lines each."""
+    orders = PurchaseOrderHeader.objects.bulk_create([
+        PurchaseOrderHeader(
+            user_client=store.user_client, supplier=rng.choice(store.suppliers),
+            order_number=f'PO-{uuid.uuid4().hex[:12].upper()}',
+        )
+        for _ in range(count)
+    ])
+    PurchaseOrderDetail.objects.bulk_create([
+        PurchaseOrderDetail(
+            user_client=store.user_client, po_header=order, product=product, unit=product.unit,
+            quantity=rng.randint(10, 50), price_per_unit=product.cost,
+        )
+        for order in orders
+        for product in rng.sample(store.products, min(10, len(store.products)))
+    ], batch_size=BATCH_SIZE)
+    return orders
+
+
+def _make_purchases(rng, store, count):
+    """Purchase orders converted to purchases, with nothing received yet."""
+    orders = _make_orders(rng, store, count)
+    with transaction.atomic():
+        results = convert_purchase_orders(store.user_client, [order.pk for order in orders], store.payment_option)
+    purchases = PurchaseHeader.objects.in_bulk([result['purchase_header_id'] for result in results])
+    return [purchases[uuid.UUID(result['purchase_header_id'])] for result in results]
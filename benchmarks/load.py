@@ -0,0 +1,194 @@
+"""
+Concurrent till load: many terminals selling the same products at once.
+
+Each terminal runs in its own process (``run_terminal``). It rings up sales
+through checkout initialize and reserves the lines of some of them through
+``SalesDetailViewSet.reserve``, picking from one small set of products that
+every terminal shares. All terminals start together at a barrier.
+
+Every request records its latency, its outcome and its lock time. Lock time
+is the time spent in statements that take row locks: UPDATEs of product rows
+and ``SELECT ... FOR UPDATE``. A statement that waits on another terminal's
+lock shows up there. On MySQL the InnoDB row lock counters are read as well.
+
+``reconcile`` then checks that each product's stock still equals the sum of
+its stock movements, that every sale line has its SALE movement, and that
+active reservations do not exceed stock.
+"""
+import logging
+import random
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test.utils import setup_test_environment
+from rest_framework.test import APIClient
+
+from products.models import Product, StockMovement
+from sales.models import SalesDetail, SalesReservation
+from users.models import UserClient
+
+from .runner import PERCENTILES, percentile
+
+BARRIER_TIMEOUT = 300
+
+_environment_ready = False
+
+
+class LockTimer:
+    """``execute_wrapper`` that adds up the time spent in row-locking statements."""
+
+    def __init__(self):
+        self.product_update = f'UPDATE "{Product._meta.db_table}"'
+        self.total = 0.0
+
+    def is_locking(self, sql):
+        normalized = sql.replace('`', '"')
+        return normalized.startswith(self.product_update) or 'FOR UPDATE' in normalized
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.is_locking(sql):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total += time.perf_counter() - start
+
+
+def _outcome(response):
+    if response.status_code < 400:
+        return 'ok'
+    if response.status_code < 500:
+        return 'rejected'
+    return f'HTTP {response.status_code}'
+
+
+def _timed(client, path, data):
+    """``(response or None, duration, lock time, outcome)`` for one POST."""
+    timer = LockTimer()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(timer):
+            response = client.post(path, data, format='json')
+    except Exception as exc:
+        return None, time.perf_counter() - start, timer.total, f'{type(exc).__name__}: {str(exc)[:80]}'
+    return response, time.perf_counter() - start, timer.total, _outcome(response)
+
+
+def run_terminal(terminal, user_client_id, product_ids, sales, reserve_ratio, seed, barrier):
+    """One till: ``sales`` checkouts, reserving the lines of ``reserve_ratio`` of them. Runs in a worker process."""
+    global _environment_ready
+    if not _environment_ready:
+        # Lets the test client's host through ALLOWED_HOSTS, as in tests
+        setup_test_environment()
+        # Failed requests are counted in the report; their tracebacks would bury it
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        _environment_ready = True
+
+    rng = random.Random(seed * 1000 + terminal)
+    client = APIClient()
+    client.force_authenticate(UserClient.objects.get(pk=user_client_id))
+    prices = dict(Product.objects.filter(pk__in=product_ids).values_list('product_id', 'price'))
+    requests = []
+
+    barrier.wait(BARRIER_TIMEOUT)
+    started = time.time()
+    for _ in range(sales):
+        items = [
+            {'product_id': str(product_id), 'qty': rng.randint(1, 2), 'price': str(prices[product_id])}
+            for product_id in rng.sample(product_ids, min(rng.randint(1, 3), len(product_ids)))
+        ]
+        response, duration, lock_time, outcome = _timed(client, '/api/checkout/initialize/', {
+            'items': items,
+            'payment_method': 'CASH',
+            'phone': f'7{terminal:03d}000000',
+            'terminal_id': f'load-{terminal}',
+        })
+        requests.append(('checkout', duration, lock_time, outcome))
+        if outcome != 'ok' or rng.random() >= reserve_ratio:
+            continue
+        detail_ids = SalesDetail.objects.filter(sales_header__order_number=response.data['order_number']).values_list('pk', flat=True)
+        for detail_id in detail_ids:
+            _, duration, lock_time, outcome = _timed(client, f'/api/salesdetails/{detail_id}/reserve/', {})
+            requests.append(('reserve', duration, lock_time, outcome))
+    return {'terminal': terminal, 'started': started, 'finished': time.time(), 'requests': requests}
+
+
+def summarise_load(terminals):
+    """Throughput, latency, lock time and outcomes per request kind over all terminals."""
+    wall = max(t['finished'] for t in terminals) - min(t['started'] for t in terminals)
+    by_kind = defaultdict(list)
+    for terminal in terminals:
+        for kind, duration, lock_time, outcome in terminal['requests']:
+            by_kind[kind].append((duration, lock_time, outcome))
+
+    summary = {'terminals': len(terminals), 'wall_seconds': round(wall, 3), 'kinds': {}}
+    for kind, rows in by_kind.items():
+        durations = sorted(duration for duration, _, _ in rows)
+        lock_times = sorted(lock_time for _, lock_time, _ in rows)
+        outcomes = defaultdict(int)
+        for _, _, outcome in rows:
+            outcomes[outcome] += 1
+        entry = {
+            'requests': len(rows),
+            'per_second': round(outcomes['ok'] / wall, 2) if wall else 0.0,
+            'outcomes': dict(outcomes),
+            'lock_ms_total': round(sum(lock_times) * 1000, 1),
+        }
+        for p in PERCENTILES:
+            entry[f'p{p}_ms'] = round(percentile(durations, p) * 1000, 2)
+        entry['lock_p95_ms'] = round(percentile(lock_times, 95) * 1000, 2)
+        summary['kinds'][kind] = entry
+    total_ok = sum(entry['outcomes'].get('ok', 0) for entry in summary['kinds'].values())
+    summary['per_second'] = round(total_ok / wall, 2) if wall else 0.0
+    return summary
+
+
+def innodb_lock_status():
+    """InnoDB's server-wide row lock counters, or ``None`` on other databases."""
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock%%'")
+        return {name: int(value) for name, value in cursor.fetchall()}
+
+
+def reconcile(user_client_id):
+    """Stock, movement and reservation checks for one client; ``ok`` is false when any of them fails."""
+    products = Product.objects.filter(user_client_id=user_client_id)
+    movement_totals = dict(
+        StockMovement.objects.filter(product__user_client_id=user_client_id)
+        .values('product').annotate(total=Sum('quantity')).values_list('product', 'total')
+    )
+    reserved = dict(
+        SalesReservation.objects.filter(product__user_client_id=user_client_id, is_active=True)
+        .values('product').annotate(total=Sum('quantity')).values_list('product', 'total')
+    )
+
+    drift, over_reserved = [], []
+    for product_id, name, stock in products.values_list('product_id', 'name', 'stock'):
+        expected = movement_totals.get(product_id, 0)
+        if stock != expected:
+            drift.append({'product_id': str(product_id), 'name': name, 'stock': stock, 'movements': expected, 'drift': stock - expected})
+        if reserved.get(product_id, 0) > stock:
+            over_reserved.append({'product_id': str(product_id), 'name': name, 'stock': stock, 'reserved': reserved[product_id]})
+
+    sale_lines = SalesDetail.objects.filter(user_client_id=user_client_id).aggregate(lines=Count('pk'), quantity=Sum('quantity'))
+    sale_movements = StockMovement.objects.filter(user_client_id=user_client_id, movement_type='SALE').aggregate(
+        lines=Count('pk'), quantity=Sum('quantity'),
+    )
+    sales = {
+        'lines': sale_lines['lines'],
+        'quantity': sale_lines['quantity'] or 0,
+        'movement_lines': sale_movements['lines'],
+        'movement_quantity': -(sale_movements['quantity'] or 0),
+    }
+    return {
+        'ok': not drift and not over_reserved and sales['lines'] == sales['movement_lines'] and sales['quantity'] == sales['movement_quantity'],
+        'products': products.count(),
+        'drift': drift,
+        'over_reserved': over_reserved,
+        'sales': sales,
+    }
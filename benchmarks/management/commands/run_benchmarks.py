@@ -0,0 +1,92 @@
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from benchmarks.datagen import generate_stores
+from benchmarks.runner import (
+    ScenarioFailed, compare, load_baseline, results_document, run_scenario, save_baseline, store_clients,
+)
+from benchmarks.scenarios import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = ('Benchmark checkout, scan, report and purchasing endpoints on generated store data. '
+            'Runs against a throwaway test database on the configured engine (SQLite or a local server).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=2, help='Stores to generate (default: 2)')
+        parser.add_argument('--products', type=int, default=500, help='Products per store (default: 500)')
+        parser.add_argument('--years', type=int, default=1, help='Years of sales and purchase history (default: 1)')
+        parser.add_argument('--sales-per-day', type=int, default=20, help='Sales per store per day (default: 20)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data (default: 0)')
+        parser.add_argument('--iterations', type=int, default=50, help='Recorded requests per endpoint (default: 50)')
+        parser.add_argument('--warmup', type=int, default=5, help='Unrecorded requests per endpoint first (default: 5)')
+        parser.add_argument('--only', nargs='+', choices=[scenario.name for scenario in SCENARIOS], help='Endpoints to run (default: all)')
+        parser.add_argument('--baseline', help='Compare against this baseline file; exits with an error on regressions')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 slowdown against the baseline (default: 0.2 = 20%%)')
+        parser.add_argument('--save-baseline', help='Write the results to this file as a new baseline')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        baseline = load_baseline(options['baseline']) if options['baseline'] else None
+        scenarios = [scenario for scenario in SCENARIOS if not options['only'] or scenario.name in options['only']]
+
+        setup_test_environment()
+        databases = setup_databases(verbosity=options['verbosity'], interactive=False)
+        try:
+            results = self.run(scenarios, options)
+        finally:
+            teardown_databases(databases, verbosity=options['verbosity'])
+            teardown_test_environment()
+
+        self.report(results)
+        document = results_document(results, options)
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], document)
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}")
+        if baseline is not None:
+            self.check_baseline(results, document, baseline, options['tolerance'])
+
+    def run(self, scenarios, options):
+        start = time.perf_counter()
+        runs = options['warmup'] + options['iterations']
+        stores = generate_stores(
+            tenants=options['tenants'], products=options['products'], years=options['years'],
+            sales_per_day=options['sales_per_day'], seed=options['seed'],
+            open_orders=math.ceil(runs / options['tenants']),
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(f"Generated {options['tenants']} stores in {time.perf_counter() - start:.1f}s")
+
+        clients = store_clients(stores)
+        results = {}
+        for scenario in scenarios:
+            try:
+                results[scenario.name] = run_scenario(scenario, stores, clients, options['iterations'], options['warmup'])
+            except ScenarioFailed as exc:
+                raise CommandError(str(exc))
+        return results
+
+    def report(self, results):
+        self.stdout.write(f"{'endpoint':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mean ms':>9}{'queries':>9}")
+        for name, summary in results.items():
+            queries = summary['queries'] if summary['queries'] == summary['queries_min'] else f"{summary['queries_min']}-{summary['queries']}"
+            self.stdout.write(
+                f"{name:<22}{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}"
+                f"{summary['mean_ms']:>9.1f}{queries:>9}"
+            )
+
+    def check_baseline(self, results, document, baseline, tolerance):
+        for key in ('database', 'data'):
+            if document[key] != baseline.get(key):
+                self.stdout.write(self.style.WARNING(f"Baseline {key} differs ({baseline.get(key)}); the comparison may not be meaningful"))
+        regressions = compare(results, baseline, tolerance)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+            return
+        for name, message in regressions:
+            self.stdout.write(self.style.ERROR(f"{name}: {message}"))
+        raise CommandError(f"{len(regressions)} regression(s) against {baseline.get('created_at', 'the baseline')}")
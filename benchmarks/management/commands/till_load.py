@@ -0,0 +1,122 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from AsiriaPOS.parallel import django_process_pool
+from benchmarks.datagen import generate_stores
+from benchmarks.load import innodb_lock_status, reconcile, run_terminal, summarise_load
+
+
+class Command(BaseCommand):
+    help = ('Simulate many tills selling and reserving the same products at once, then reconcile stock. '
+            'Runs against a throwaway test database on the configured engine.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terminals', type=int, default=24, help='Tills, one process each (default: 24)')
+        parser.add_argument('--sales', type=int, default=50, help='Checkouts per till (default: 50)')
+        parser.add_argument('--products', type=int, default=10, help='Products every till sells from (default: 10)')
+        parser.add_argument('--opening-stock', type=int, default=10000, help='Opening stock per product (default: 10000)')
+        parser.add_argument('--reserve-ratio', type=float, default=0.5, help='Share of checkouts whose lines are then reserved (default: 0.5)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--report', help='Also write the report to this file as JSON')
+
+    def handle(self, *args, **options):
+        if options['terminals'] < 1 or options['products'] < 1:
+            raise CommandError('--terminals and --products must be at least 1')
+
+        setup_test_environment()
+        sqlite_dir = None
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST']['NAME']:
+            # The default SQLite test database lives in memory, which worker processes cannot share
+            sqlite_dir = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(sqlite_dir, 'till_load.sqlite3')
+        databases = setup_databases(verbosity=options['verbosity'], interactive=False)
+        try:
+            report = self.run(options)
+        finally:
+            teardown_databases(databases, verbosity=options['verbosity'])
+            teardown_test_environment()
+            if sqlite_dir:
+                connection.settings_dict['TEST']['NAME'] = None
+                shutil.rmtree(sqlite_dir, ignore_errors=True)
+
+        self.print_report(report)
+        if options['report']:
+            with open(options['report'], 'w') as output:
+                json.dump(report, output, indent=2)
+                output.write('\n')
+            self.stdout.write(f"Report written to {options['report']}")
+        if not report['reconciliation']['ok']:
+            raise CommandError('Stock did not reconcile')
+
+    def run(self, options):
+        store = generate_stores(
+            tenants=1, products=options['products'], years=0, sales_per_day=0, open_orders=0,
+            opening_stock=options['opening_stock'], seed=options['seed'],
+        )[0]
+        user_client_id = store.user_client.pk
+        product_ids = [product.pk for product in store.products]
+        terminals = options['terminals']
+
+        before = innodb_lock_status()
+        with multiprocessing.get_context('spawn').Manager() as manager:
+            barrier = manager.Barrier(terminals)
+            with django_process_pool(terminals, databases={'default': connection.settings_dict['NAME']}) as pool:
+                futures = [
+                    pool.submit(run_terminal, terminal, user_client_id, product_ids, options['sales'],
+                                options['reserve_ratio'], options['seed'], barrier)
+                    for terminal in range(terminals)
+                ]
+                results = [future.result() for future in futures]
+        after = innodb_lock_status()
+
+        report = summarise_load(results)
+        report['database'] = connection.vendor
+        report['options'] = {key: options[key] for key in ('terminals', 'sales', 'products', 'opening_stock', 'reserve_ratio', 'seed')}
+        if before is not None:
+            report['innodb_row_locks'] = {name: after[name] - before.get(name, 0) for name in after}
+        report['reconciliation'] = reconcile(user_client_id)
+        return report
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['terminals']} terminals on {report['database']}, {report['wall_seconds']:.1f}s, "
+            f"{report['per_second']:.1f} successful requests/s"
+        )
+        self.stdout.write(f"{'request':<10}{'count':>7}{'ok/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'lock p95':>10}{'lock total':>12}")
+        for kind, entry in report['kinds'].items():
+            self.stdout.write(
+                f"{kind:<10}{entry['requests']:>7}{entry['per_second']:>8.1f}{entry['p50_ms']:>9.1f}{entry['p95_ms']:>9.1f}"
+                f"{entry['p99_ms']:>9.1f}{entry['lock_p95_ms']:>10.1f}{entry['lock_ms_total']:>12.0f}"
+            )
+            failures = {outcome: count for outcome, count in entry['outcomes'].items() if outcome != 'ok'}
+            for outcome, count in sorted(failures.items(), key=lambda item: -item[1]):
+                self.stdout.write(f"    {count} x {outcome}")
+        if 'innodb_row_locks' in report:
+            locks = report['innodb_row_locks']
+            # Server-wide counters, so other activity on the server is included
+            self.stdout.write(
+                f"InnoDB row lock waits: {locks.get('Innodb_row_lock_waits', 0)}, "
+                f"waited {locks.get('Innodb_row_lock_time', 0)} ms"
+            )
+
+        result = report['reconciliation']
+        sales = result['sales']
+        self.stdout.write(
+            f"Sale lines: {sales['lines']} ({sales['quantity']} units); "
+            f"SALE movements: {sales['movement_lines']} ({sales['movement_quantity']} units)"
+        )
+        for row in result['drift']:
+            self.stdout.write(self.style.ERROR(
+                f"{row['name']}: stock {row['stock']}, movements add up to {row['movements']} (drift {row['drift']:+d})"
+            ))
+        for row in result['over_reserved']:
+            self.stdout.write(self.style.ERROR(f"{row['name']}: {row['reserved']} reserved, stock {row['stock']}"))
+        if result['ok']:
+            self.stdout.write(self.style.SUCCESS(f"All {result['products']} products reconcile"))
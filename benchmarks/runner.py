@@ -0,0 +1,106 @@
+"""
+Run scenarios through DRF's test client and summarise them.
+
+Every request goes through the full middleware stack and view, authenticated
+as the store's owner with ``force_authenticate`` (token checks are left out).
+Requests rotate over the stores. Warm-up requests are sent but not recorded.
+
+A baseline is the JSON that ``results_document`` produces. ``compare``
+flags an endpoint whose p95 latency grew by more than the tolerance, or
+that runs more queries than it did in the baseline.
+"""
+import json
+import math
+import platform
+import time
+
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from AsiriaPOS.querycount import count_queries
+
+PERCENTILES = (50, 95, 99)
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def store_clients(stores):
+    clients = []
+    for store in stores:
+        client = APIClient()
+        client.force_authenticate(store.user_client)
+        clients.append(client)
+    return clients
+
+
+def run_scenario(scenario, stores, clients, iterations, warmup=0):
+    """Time ``iterations`` requests of ``scenario`` after ``warmup`` unrecorded ones. Returns its summary."""
+    durations, queries = [], []
+    for i in range(warmup + iterations):
+        store, client = stores[i % len(stores)], clients[i % len(clients)]
+        path, data = scenario.build(store, i // len(stores))
+        kwargs = {'format': 'json'} if scenario.method == 'post' else {}
+        with count_queries() as counter:
+            start = time.perf_counter()
+            response = getattr(client, scenario.method)(path, data, **kwargs)
+            duration = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise ScenarioFailed(f"{scenario.name}: {scenario.method.upper()} {path} returned {response.status_code}: {response.content[:300]!r}")
+        if i >= warmup:
+            durations.append(duration)
+            queries.append(counter.count)
+    return summarise(durations, queries)
+
+
+def summarise(durations, queries):
+    durations = sorted(durations)
+    summary = {'requests': len(durations), 'mean_ms': round(sum(durations) / len(durations) * 1000, 2)}
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = round(percentile(durations, p) * 1000, 2)
+    summary['queries'] = max(queries)
+    summary['queries_min'] = min(queries)
+    return summary
+
+
+def results_document(results, options):
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'data': {key: options[key] for key in ('tenants', 'products', 'years', 'sales_per_day', 'seed')},
+        'iterations': options['iterations'],
+        'endpoints': results,
+    }
+
+
+def save_baseline(path, document):
+    with open(path, 'w') as handle:
+        json.dump(document, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def compare(results, baseline, tolerance):
+    """``(endpoint, message)`` for every regression against ``baseline``."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        if current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((name, f"p95 {before['p95_ms']}ms -> {current['p95_ms']}ms"))
+        if current['queries'] > before['queries']:
+            regressions.append((name, f"queries {before['queries']} -> {current['queries']}"))
+    return regressions
@@ -0,0 +1,70 @@
+"""
+The endpoints the benchmarks drive. Each scenario builds one request for a
+store; ``iteration`` picks different products, orders and codes from run to
+run so repeated requests do not all hit the same rows.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+Scenario = namedtuple('Scenario', 'name method build')
+
+
+def _product(store, iteration):
+    return store.products[(iteration * 7919) % len(store.products)]
+
+
+def checkout_initialize(store, iteration):
+    products = [store.products[(iteration * 3 + i) * 7919 % len(store.products)] for i in range(3)]
+    customer = store.customers[iteration % len(store.customers)]
+    return '/api/checkout/initialize/', {
+        'items': [{'product_id': str(product.pk), 'qty': 1, 'price': str(product.price)} for product in products],
+        'payment_method': 'CASH',
+        'payment_option_id': str(store.payment_option.pk),
+        'phone': customer.phone,
+        'terminal_id': f'bench-{iteration % 4}',
+    }
+
+
+def product_scan(store, iteration):
+    return '/api/products/scan/', {'code': _product(store, iteration).barcode}
+
+
+def margin_report(store, iteration):
+    today = timezone.localdate()
+    return '/api/salesdetails/margin_report/', {
+        'start_date': (today - timedelta(days=90)).isoformat(),
+        'end_date': today.isoformat(),
+    }
+
+
+def valuation(store, iteration):
+    return '/api/products/valuation/', None
+
+
+def stock_history(store, iteration):
+    return f'/api/products/{_product(store, iteration).pk}/stock_history/', None
+
+
+def po_convert(store, iteration):
+    # Each order converts once; the generator makes enough open orders for every run
+    order = store.open_orders[iteration]
+    return f'/api/purchase-orders/{order.pk}/convert-to-purchase/', {}
+
+
+def grn_generate(store, iteration):
+    # Each purchase is received once; the generator makes enough unreceived purchases for every run
+    purchase = store.open_purchases[iteration]
+    return f'/api/purchases/{purchase.pk}/generate-grn/', {'grn_number': f'GRN-BENCH-{store.user_client.pk.hex[:8]}-{iteration}'}
+
+
+SCENARIOS = [
+    Scenario('checkout_initialize', 'post', checkout_initialize),
+    Scenario('product_scan', 'get', product_scan),
+    Scenario('margin_report', 'get', margin_report),
+    Scenario('valuation', 'get', valuation),
+    Scenario('stock_history', 'get', stock_history),
+    Scenario('po_convert', 'post', po_convert),
+    Scenario('grn_generate', 'post', grn_generate),
+]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Unit, Product, StockMovement, StockAdjustment, StockAlert
+from .models import Category, Unit, Product, StockMovement, StockAdjustment, StockAlert, PriceList, PriceListItem
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -134,3 +134,19 @@ class StockAlertAdmin(admin.ModelAdmin):
         
         self.message_user(request, f"Successfully resolved {resolved_count} stock alerts.")
     resolve_alerts.short_description = "Resolve selected stock alerts"
+
+class PriceListItemInline(admin.TabularInline):
+    model = PriceListItem
+    fields = ['product', 'old_price', 'new_price']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+@admin.register(PriceList)
+class PriceListAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user_client', 'change_type', 'value', 'product_count', 'status', 'version', 'effective_from', 'applied_at']
+    list_filter = ['user_client', 'status', 'change_type']
+    search_fields = ['name']
+    ordering = ['-created_at']
+    readonly_fields = ['price_list_id', 'product_count', 'status', 'version', 'applied_at', 'created_at']
+    inlines = [PriceListItemInline]
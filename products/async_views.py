@@ -0,0 +1,104 @@
+"""
+Async read endpoints for the catalog and stock reports (``/api/async/...``).
+
+These run on the event loop when served through ``AsiriaPOS/asgi.py`` and use
+Django's async ORM, so slow reads wait on the database without holding a
+worker thread that till checkouts need. They return plain ``values()`` rows
+scoped to the caller's client rather than going through DRF serializers.
+"""
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
+
+from authentication.async_auth import async_api_view
+from .models import Product
+from .reports import money_field, stock_value_expression, valuation_aggregates, valuation_items
+
+PRODUCT_FIELDS = (
+    'product_id', 'name', 'sku', 'barcode', 'description',
+    'category_id', 'category__name', 'unit_id', 'unit__unit_name',
+    'price', 'cost', 'average_cost', 'stock', 'minQuantity', 'updated_at',
+)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _product_row(row):
+    row['category_name'] = row.pop('category__name')
+    row['unit_name'] = row.pop('unit__unit_name')
+    row['is_low_stock'] = row['stock'] <= row['minQuantity']
+    row['is_out_of_stock'] = row['stock'] <= 0
+    return row
+
+
+def _int_param(request, name, default, maximum=None):
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        return None
+    if value < 0:
+        return None
+    return min(value, maximum) if maximum else value
+
+
+@async_api_view()
+async def product_list(request):
+    """Paged product list. Query params: ``search``, ``category``, ``limit`` (max 500), ``offset``."""
+    limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    offset = _int_param(request, 'offset', 0)
+    if limit is None or offset is None:
+        return JsonResponse({"detail": "limit and offset must be non-negative integers"}, status=400)
+
+    queryset = Product.objects.filter(user_client=request.user)
+    search = request.GET.get('search')
+    if search:
+        queryset = queryset.filter(Q(name__icontains=search) | Q(sku__icontains=search) | Q(barcode__icontains=search))
+    if request.GET.get('category'):
+        queryset = queryset.filter(category_id=request.GET['category'])
+
+    count = await queryset.acount()
+    rows = [_product_row(row) async for row in queryset.order_by('name').values(*PRODUCT_FIELDS)[offset:offset + limit]]
+    return JsonResponse({'count': count, 'limit': limit, 'offset': offset, 'results': rows})
+
+
+@async_api_view()
+async def product_scan(request):
+    """Look up one product by scanned barcode or SKU (``?code=``)."""
+    code = request.GET.get('code')
+    if not code:
+        return JsonResponse({"detail": "code is required"}, status=400)
+    row = await (
+        Product.objects.filter(user_client=request.user)
+        .filter(Q(barcode=code) | Q(sku=code))
+        .values(*PRODUCT_FIELDS)
+        .afirst()
+    )
+    if row is None:
+        return JsonResponse({"detail": "Product not found"}, status=404)
+    return JsonResponse(_product_row(row))
+
+
+@async_api_view()
+async def stock_summary(request):
+    """Stock totals plus one row per product with its value and last movement time."""
+    queryset = Product.objects.filter(user_client=request.user)
+    totals = await queryset.aaggregate(
+        product_count=Count('pk'),
+        total_units=Coalesce(Sum('stock'), 0),
+        total_value=Coalesce(Sum(stock_value_expression()), 0, output_field=money_field()),
+        low_stock_count=Count('pk', filter=Q(stock__lte=F('minQuantity'))),
+        out_of_stock_count=Count('pk', filter=Q(stock__lte=0)),
+    )
+    rows = queryset.order_by('name').annotate(
+        stock_value=stock_value_expression(),
+        last_movement_at=Max('stock_movements__created_at'),
+    ).values(*PRODUCT_FIELDS, 'stock_value', 'last_movement_at')
+    return JsonResponse({**totals, 'products': [_product_row(row) async for row in rows]})
+
+
+@async_api_view()
+async def valuation_report(request):
+    """Valuation at weighted average cost, summed by the database."""
+    queryset = Product.objects.filter(user_client=request.user)
+    totals = await queryset.aaggregate(**valuation_aggregates())
+    return JsonResponse({**totals, 'items': [row async for row in valuation_items(queryset)]})
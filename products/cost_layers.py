@@ -0,0 +1,94 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from django.utils import timezone
+
+from .models import CostLayer, Product
+
+CENTS = Decimal('0.01')
+
+
+class CostLine(NamedTuple):
+    """Stock going into or out of the cost layers. ``unit_cost`` is only used when adding."""
+    product_id: UUID
+    quantity: int
+    unit_cost: Optional[Decimal] = None
+    reference_number: Optional[str] = None
+    grn_detail_id: Optional[UUID] = None
+
+
+def fallback_unit_cost(product):
+    """Unit cost for stock outside the layers: the weighted average cost, or list cost while there is none."""
+    return Decimal(product.average_cost or product.cost)
+
+
+def add_layers(user_client, lines, received_at=None):
+    """Open one layer per line, holding its quantity at its unit cost, with one insert."""
+    received_at = received_at or timezone.now()
+    return CostLayer.objects.bulk_create([
+        CostLayer(
+            user_client=user_client,
+            product_id=line.product_id,
+            grn_detail_id=line.grn_detail_id,
+            quantity=line.quantity,
+            remaining_quantity=line.quantity,
+            unit_cost=line.unit_cost,
+            reference_number=line.reference_number,
+            received_at=received_at,
+        )
+        for line in lines if line.quantity > 0
+    ])
+
+
+def consume_layers(user_client, lines, products=None):
+    """Take each line's quantity from its product's oldest open layers; returns each line's cost of goods, in order.
+
+    The open layers of every product in ``lines`` are locked and read in one
+    query and written back with one ``bulk_update``, so a whole checkout costs
+    two queries however many lines it has. Lines are consumed in the order
+    given, so two lines of one product take successive layers. Quantity the
+    open layers cannot cover (stock from before cost layers, or stock sold
+    below zero) is costed at ``fallback_unit_cost``; pass ``products`` keyed
+    by id when the caller has them, otherwise they are read when needed. Must
+    be called inside a transaction.
+    """
+    lines = list(lines)
+    if not lines:
+        return []
+    open_layers = defaultdict(list)
+    for layer in (
+        CostLayer.objects.select_for_update()
+        .filter(user_client=user_client, product_id__in={line.product_id for line in lines}, remaining_quantity__gt=0)
+        .order_by('product_id', 'received_at', 'pk')
+    ):
+        open_layers[layer.product_id].append(layer)
+
+    costs, uncovered, touched = [], [], {}
+    for line in lines:
+        layers = open_layers[line.product_id]
+        needed, cost = line.quantity, Decimal('0')
+        while needed and layers:
+            layer = layers[0]
+            taken = min(needed, layer.remaining_quantity)
+            layer.remaining_quantity -= taken
+            cost += taken * layer.unit_cost
+            needed -= taken
+            touched[layer.pk] = layer
+            if not layer.remaining_quantity:
+                layers.pop(0)
+        costs.append(cost)
+        uncovered.append(needed)
+
+    missing = {line.product_id for line, needed in zip(lines, uncovered) if needed}
+    if missing:
+        products = dict(products or {})
+        if missing - products.keys():
+            products.update(Product.objects.in_bulk(missing - products.keys()))
+        for index, (line, needed) in enumerate(zip(lines, uncovered)):
+            if needed and line.product_id in products:
+                costs[index] += needed * fallback_unit_cost(products[line.product_id])
+    if touched:
+        CostLayer.objects.bulk_update(touched.values(), ['remaining_quantity'])
+    return [cost.quantize(CENTS) for cost in costs]
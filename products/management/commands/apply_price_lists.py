@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.pricing import apply_due_price_lists
+
+
+class Command(BaseCommand):
+    help = 'Apply scheduled price lists whose effective time has passed'
+
+    def handle(self, *args, **options):
+        applied = apply_due_price_lists()
+        self.stdout.write(self.style.SUCCESS(f'Applied {applied} price lists'))
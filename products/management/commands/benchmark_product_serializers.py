@@ -0,0 +1,77 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Category, Unit, Product
+from products.serializers import ProductSerializer, ProductReadSerializer
+from users.models import UserClient
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare ProductSerializer with ProductReadSerializer on a throwaway catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Products to serialize (default: 10000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per serializer; the best is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user_client = self.make_catalog(options['rows'])
+                queryset = Product.objects.filter(user_client=user_client)
+                results = [
+                    ('ProductSerializer', self.measure(lambda: ProductSerializer(queryset.all(), many=True).data, options['repeat'])),
+                    ('ProductReadSerializer', self.measure(lambda: ProductReadSerializer(ProductReadSerializer.rows(queryset.all()), many=True).data, options['repeat'])),
+                ]
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"{options['rows']} products, best of {options['repeat']}:")
+        self.stdout.write(f"{'serializer':<24}{'total ms':>10}{'JSON ms':>10}{'queries':>9}{'KB':>8}")
+        for name, (total, render, queries, size) in results:
+            self.stdout.write(f"{name:<24}{total * 1000:>10.1f}{render * 1000:>10.1f}{queries:>9}{size / 1024:>8.0f}")
+        baseline, fast = results[0][1][0], results[1][1][0]
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {baseline / fast:.1f}x"))
+
+    def make_catalog(self, rows):
+        suffix = uuid.uuid4().hex[:8]
+        user_client = UserClient.objects.create_user(
+            phone_number=suffix, email=f'bench-{suffix}@example.com', password=None,
+            storename=f'bench-{suffix}', client_name='Benchmark',
+        )
+        categories = [Category.objects.create(user_client=user_client, name=f'Bench {suffix} {i}') for i in range(20)]
+        unit = Unit.objects.create(user_client=user_client, unit_name=f'bench-{suffix}')
+        Product.objects.bulk_create([
+            Product(
+                user_client=user_client, category=categories[i % len(categories)], unit=unit,
+                name=f'Product {i}', sku=f'B{suffix}{i}', barcode=f'B{suffix}{i}', minQuantity=5,
+                price=Decimal('12.50'), cost=Decimal('7.25'), average_cost=Decimal('7.10'), stock=i % 40,
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+        return user_client
+
+    def measure(self, serialize, repeat):
+        """Best ``(total, JSON render, queries, bytes)`` of ``repeat`` runs; total includes the queries and rendering."""
+        best = None
+        for _ in range(repeat):
+            queries = []
+            with connection.execute_wrapper(lambda execute, sql, params, many, context: queries.append(sql) or execute(sql, params, many, context)):
+                start = time.perf_counter()
+                data = serialize()
+                rendered_at = time.perf_counter()
+                body = JSONRenderer().render(data)
+                end = time.perf_counter()
+            run = (end - start, end - rendered_at, len(queries), len(body))
+            if best is None or run[0] < best[0]:
+                best = run
+        return best
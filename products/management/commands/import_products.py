@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.product_import import import_products, read_product_rows, validate_rows
+from users.models import UserClient
+
+
+class Command(BaseCommand):
+    help = 'Import or update products for a user client from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str, help='CSV (with a header row) or JSON file of products')
+        parser.add_argument(
+            '--user-client',
+            type=str,
+            required=True,
+            help='User client ID to import the products for',
+        )
+        parser.add_argument(
+            '--no-create-missing',
+            action='store_true',
+            help='Reject rows whose category or unit does not exist instead of creating it',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Products written per transaction (default: PRODUCT_IMPORT_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user_client = UserClient.objects.get(user_client_id=options['user_client'])
+        except UserClient.DoesNotExist:
+            raise CommandError(f"User client with ID {options['user_client']} not found")
+
+        with open(options['file'], 'rb') as upload:
+            raw_rows = read_product_rows(upload, options['file'])
+
+        positions, valid_rows, row_errors = validate_rows(raw_rows)
+        for position, errors in row_errors.items():
+            messages = '; '.join(f"{field}: {' '.join(str(error) for error in field_errors)}" for field, field_errors in errors.items())
+            self.stdout.write(self.style.ERROR(f"Row {position + 1}: {messages}"))
+
+        results = import_products(
+            user_client,
+            valid_rows,
+            chunk_size=options['chunk_size'],
+            create_missing=not options['no_create_missing'],
+        )
+        summary = {'created': 0, 'updated': 0, 'error': len(row_errors)}
+        for position, result in zip(positions, results):
+            summary[result['status']] += 1
+            if result['status'] == 'error':
+                self.stdout.write(self.style.ERROR(f"Row {position + 1}: {'; '.join(result['errors'])}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(raw_rows)} rows: {summary['created']} created, {summary['updated']} updated, {summary['error']} errors"
+        ))
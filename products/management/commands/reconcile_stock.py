@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from AsiriaPOS.parallel import django_process_pool
+from products.models import Product
+from products.reconciliation import tenant_stock_reconciliation
+from users.models import UserClient
+
+ISSUES = ('drift', 'unbalanced_transfers', 'locations')
+
+
+class Command(BaseCommand):
+    help = 'Check product and location stock against the stock movement ledger, and optionally repair drifted stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-client', help='Only reconcile this tenant')
+        parser.add_argument('--repair', action='store_true', help="Set drifted product stock to the ledger's")
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Processes to shard tenants across; 0 runs them in this process (default: 0)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Tenants handed to the workers per batch (default: 200)',
+        )
+        parser.add_argument('--report', help='Write every tenant with issues, in full, to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['user_client']:
+            if not UserClient.objects.filter(pk=options['user_client']).exists():
+                raise CommandError(f"User client with ID {options['user_client']} not found")
+            user_client_ids = [options['user_client']]
+        else:
+            user_client_ids = list(Product.objects.order_by().values_list('user_client_id', flat=True).distinct())
+
+        totals = dict.fromkeys(('tenants', 'products', *ISSUES, 'repaired'), 0)
+        report = {}
+        for user_client_id, result in self.reconcile(user_client_ids, options['repair'], options['workers'], options['chunk_size']):
+            totals['tenants'] += 1
+            totals['products'] += result['products']
+            totals['repaired'] += result['repaired']
+            counts = {issue: len(result[issue]) for issue in ISSUES}
+            for issue, count in counts.items():
+                totals[issue] += count
+            if any(counts.values()):
+                report[str(user_client_id)] = result
+                self.stdout.write(f"{user_client_id}: " + ', '.join(f'{count} {issue}' for issue, count in counts.items() if count))
+
+        if options['report']:
+            with open(options['report'], 'w') as output:
+                json.dump({'totals': totals, 'tenants': report}, output, cls=DjangoJSONEncoder, indent=2)
+        summary = (
+            f"Checked {totals['products']} products of {totals['tenants']} tenants: "
+            + ', '.join(f'{totals[issue]} {issue}' for issue in ISSUES)
+            + (f", repaired {totals['repaired']}" if options['repair'] else '')
+        )
+        self.stdout.write(self.style.SUCCESS(summary) if not report else self.style.WARNING(summary))
+
+    def reconcile(self, user_client_ids, repair, workers, chunk_size):
+        """Yield ``(user_client_id, result)`` as each tenant is reconciled, in batches of ``chunk_size``."""
+        if workers <= 0:
+            for user_client_id in user_client_ids:
+                yield tenant_stock_reconciliation(user_client_id, repair)
+            return
+        with django_process_pool(workers) as pool:
+            for start in range(0, len(user_client_ids), chunk_size):
+                chunk = user_client_ids[start:start + chunk_size]
+                yield from pool.map(tenant_stock_reconciliation, chunk, [repair] * len(chunk))
@@ -1,8 +1,12 @@
-from django.core.management.base import BaseCommand
-from django.db.models import Sum, Count, Q, F
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
-from datetime import datetime, timedelta
-from products.models import Product, StockMovement, StockAdjustment, StockAlert
+
+from AsiriaPOS.parallel import django_process_pool
+from products.reports import STOCK_REPORT_SECTIONS, stock_report, stock_report_rows, tenant_stock_report
 from users.models import UserClient
 
 
@@ -28,174 +32,138 @@ class Command(BaseCommand):
             default=30,
             help='Number of days to include in the report (default: 30)',
         )
+        parser.add_argument(
+            '--per-tenant',
+            action='store_true',
+            help='Report each user client separately instead of one combined report',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Processes to shard --per-tenant reports across; 0 runs them in this process (default: 0)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='User clients handed to the workers per batch with --per-tenant (default: 200)',
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=['text', 'csv', 'jsonl'],
+            default='text',
+            help='Output format (default: text)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='File to write to (default: stdout)',
+        )
 
     def handle(self, *args, **options):
         user_client_id = options.get('user_client')
         report_type = options.get('report_type')
+        sections = STOCK_REPORT_SECTIONS if report_type == 'all' else (report_type,)
         days = options.get('days')
+        end = timezone.now()
 
-        # Filter by user client if specified
-        user_client = None
         if user_client_id:
             try:
                 user_client = UserClient.objects.get(user_client_id=user_client_id)
-                self.stdout.write(f"Generating report for user client: {user_client.username}")
             except UserClient.DoesNotExist:
-                self.stdout.write(self.style.ERROR(f"User client with ID {user_client_id} not found"))
-                return
-
-        # Calculate date range
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-
-        if report_type in ['summary', 'all']:
-            self.generate_summary_report(user_client, start_date, end_date)
-
-        if report_type in ['movements', 'all']:
-            self.generate_movements_report(user_client, start_date, end_date)
-
-        if report_type in ['alerts', 'all']:
-            self.generate_alerts_report(user_client, start_date, end_date)
-
-        if report_type in ['adjustments', 'all']:
-            self.generate_adjustments_report(user_client, start_date, end_date)
-
-    def generate_summary_report(self, user_client, start_date, end_date):
-        """Generate stock summary report"""
-        self.stdout.write("\n" + "="*50)
-        self.stdout.write("STOCK SUMMARY REPORT")
-        self.stdout.write("="*50)
-
-        # Filter products
-        products_queryset = Product.objects.all()
-        if user_client:
-            products_queryset = products_queryset.filter(user_client=user_client)
-
-        # Calculate totals
-        total_products = products_queryset.count()
-        # Calculate total stock value manually since it's a property
-        total_stock_value = sum(product.stock_value for product in products_queryset)
-        low_stock_count = products_queryset.filter(stock__lte=F('minQuantity')).count()
-        out_of_stock_count = products_queryset.filter(stock__lte=0).count()
-
-        self.stdout.write(f"Total Products: {total_products}")
-        self.stdout.write(f"Total Stock Value: ${total_stock_value:,.2f}")
-        self.stdout.write(f"Low Stock Products: {low_stock_count}")
-        self.stdout.write(f"Out of Stock Products: {out_of_stock_count}")
-
-        # Top products by stock value
-        top_products = sorted(products_queryset, key=lambda p: p.stock_value, reverse=True)[:10]
-        if top_products:
-            self.stdout.write("\nTop 10 Products by Stock Value:")
-            for product in top_products:
-                self.stdout.write(f"  - {product.name}: {product.stock} units @ ${product.cost} = ${product.stock_value:,.2f}")
-
-    def generate_movements_report(self, user_client, start_date, end_date):
-        """Generate stock movements report"""
-        self.stdout.write("\n" + "="*50)
-        self.stdout.write("STOCK MOVEMENTS REPORT")
-        self.stdout.write("="*50)
-
-        # Filter movements
-        movements_queryset = StockMovement.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
-        if user_client:
-            movements_queryset = movements_queryset.filter(user_client=user_client)
-
-        # Summary
-        total_movements = movements_queryset.count()
-        total_in = movements_queryset.filter(quantity__gt=0).aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        total_out = abs(movements_queryset.filter(quantity__lt=0).aggregate(
-            total=Sum('quantity')
-        )['total'] or 0)
-
-        self.stdout.write(f"Period: {start_date.date()} to {end_date.date()}")
-        self.stdout.write(f"Total Movements: {total_movements}")
-        self.stdout.write(f"Total Stock In: {total_in}")
-        self.stdout.write(f"Total Stock Out: {total_out}")
-
-        # Movements by type
-        movements_by_type = movements_queryset.values('movement_type').annotate(
-            count=Count('movement_id'),
-            total_quantity=Sum('quantity')
-        )
-
-        if movements_by_type:
-            self.stdout.write("\nMovements by Type:")
-            for movement_type in movements_by_type:
-                self.stdout.write(f"  - {movement_type['movement_type']}: {movement_type['count']} movements, {movement_type['total_quantity']} units")
-
-    def generate_alerts_report(self, user_client, start_date, end_date):
-        """Generate stock alerts report"""
-        self.stdout.write("\n" + "="*50)
-        self.stdout.write("STOCK ALERTS REPORT")
-        self.stdout.write("="*50)
-
-        # Filter alerts
-        alerts_queryset = StockAlert.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
-        if user_client:
-            alerts_queryset = alerts_queryset.filter(user_client=user_client)
-
-        # Summary
-        total_alerts = alerts_queryset.count()
-        active_alerts = alerts_queryset.filter(is_active=True).count()
-        resolved_alerts = alerts_queryset.filter(is_active=False).count()
-
-        self.stdout.write(f"Period: {start_date.date()} to {end_date.date()}")
-        self.stdout.write(f"Total Alerts: {total_alerts}")
-        self.stdout.write(f"Active Alerts: {active_alerts}")
-        self.stdout.write(f"Resolved Alerts: {resolved_alerts}")
-
-        # Alerts by type
-        alerts_by_type = alerts_queryset.values('alert_type').annotate(
-            count=Count('alert_id'),
-            active_count=Count('alert_id', filter=Q(is_active=True))
-        )
-
-        if alerts_by_type:
-            self.stdout.write("\nAlerts by Type:")
-            for alert_type in alerts_by_type:
-                self.stdout.write(f"  - {alert_type['alert_type']}: {alert_type['count']} total, {alert_type['active_count']} active")
-
-    def generate_adjustments_report(self, user_client, start_date, end_date):
-        """Generate stock adjustments report"""
-        self.stdout.write("\n" + "="*50)
-        self.stdout.write("STOCK ADJUSTMENTS REPORT")
-        self.stdout.write("="*50)
-
-        # Filter adjustments
-        adjustments_queryset = StockAdjustment.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
-        if user_client:
-            adjustments_queryset = adjustments_queryset.filter(user_client=user_client)
-
-        # Summary
-        total_adjustments = adjustments_queryset.count()
-        approved_adjustments = adjustments_queryset.filter(is_approved=True).count()
-        pending_adjustments = adjustments_queryset.filter(is_approved=False).count()
-        total_adjusted = adjustments_queryset.aggregate(
-            total=Sum('quantity_adjusted')
-        )['total'] or 0
-
-        self.stdout.write(f"Period: {start_date.date()} to {end_date.date()}")
-        self.stdout.write(f"Total Adjustments: {total_adjustments}")
-        self.stdout.write(f"Approved: {approved_adjustments}")
-        self.stdout.write(f"Pending: {pending_adjustments}")
-        self.stdout.write(f"Total Quantity Adjusted: {total_adjusted}")
-
-        # Adjustments by type
-        adjustments_by_type = adjustments_queryset.values('adjustment_type').annotate(
-            count=Count('adjustment_id'),
-            total_quantity=Sum('quantity_adjusted')
-        )
-
-        if adjustments_by_type:
-            self.stdout.write("\nAdjustments by Type:")
-            for adjustment_type in adjustments_by_type:
-                self.stdout.write(f"  - {adjustment_type['adjustment_type']}: {adjustment_type['count']} adjustments, {adjustment_type['total_quantity']} units")
+                raise CommandError(f"User client with ID {user_client_id} not found")
+            stores = {user_client.pk: user_client.storename}
+            reports = [(user_client.pk, stock_report(user_client.pk, days, sections, end))]
+        elif options['per_tenant']:
+            stores = dict(UserClient.objects.values_list('user_client_id', 'storename'))
+            reports = self.tenant_reports(list(stores), days, sections, end, options['workers'], options['chunk_size'])
+        else:
+            stores = {None: 'All clients'}
+            reports = [(None, stock_report(None, days, sections, end))]
+
+        output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            written = getattr(self, f"write_{options['format']}")(output, reports, stores)
+        finally:
+            if options['output']:
+                output.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} reports to {options['output']}"))
+
+    def tenant_reports(self, user_client_ids, days, sections, end, workers, chunk_size):
+        """Yield ``(user_client_id, report)`` as each client's report is built, in batches of ``chunk_size``."""
+        if workers <= 0:
+            for user_client_id in user_client_ids:
+                yield tenant_stock_report(user_client_id, days, sections, end)
+            return
+        with django_process_pool(workers) as pool:
+            for start in range(0, len(user_client_ids), chunk_size):
+                chunk = user_client_ids[start:start + chunk_size]
+                yield from pool.map(
+                    tenant_stock_report, chunk,
+                    [days] * len(chunk), [sections] * len(chunk), [end] * len(chunk),
+                )
+
+    def write_jsonl(self, output, reports, stores):
+        written = 0
+        for user_client_id, report in reports:
+            line = {'user_client_id': user_client_id, 'storename': stores.get(user_client_id), **report}
+            output.write(json.dumps(line, cls=DjangoJSONEncoder) + '\n')
+            written += 1
+        return written
+
+    def write_csv(self, output, reports, stores):
+        writer = csv.writer(output)
+        writer.writerow(['user_client_id', 'storename', 'period_start', 'period_end', 'section', 'item', 'metric', 'value'])
+        written = 0
+        for user_client_id, report in reports:
+            prefix = [user_client_id or '', stores.get(user_client_id), report['period_start'].isoformat(), report['period_end'].isoformat()]
+            writer.writerows(prefix + list(row) for row in stock_report_rows(report))
+            written += 1
+        return written
+
+    def write_text(self, output, reports, stores):
+        written = 0
+        for user_client_id, report in reports:
+            output.write(f"\nStock report for {stores.get(user_client_id)}\n")
+            period = f"Period: {report['period_start'].date()} to {report['period_end'].date()}"
+            if 'summary' in report:
+                self.write_summary(output, report['summary'])
+            if 'movements' in report:
+                self.write_section(output, 'STOCK MOVEMENTS REPORT', period, report['movements'], [
+                    ('Total Movements', 'total_movements'), ('Total Stock In', 'total_in'), ('Total Stock Out', 'total_out'),
+                ], 'Movements by Type', lambda row: f"{row['movement_type']}: {row['count']} movements, {row['total_quantity']} units")
+            if 'alerts' in report:
+                self.write_section(output, 'STOCK ALERTS REPORT', period, report['alerts'], [
+                    ('Total Alerts', 'total_alerts'), ('Active Alerts', 'active_alerts'), ('Resolved Alerts', 'resolved_alerts'),
+                ], 'Alerts by Type', lambda row: f"{row['alert_type']}: {row['count']} total, {row['active_count']} active")
+            if 'adjustments' in report:
+                self.write_section(output, 'STOCK ADJUSTMENTS REPORT', period, report['adjustments'], [
+                    ('Total Adjustments', 'total_adjustments'), ('Approved', 'approved'), ('Pending', 'pending'),
+                    ('Total Quantity Adjusted', 'total_quantity_adjusted'),
+                ], 'Adjustments by Type', lambda row: f"{row['adjustment_type']}: {row['count']} adjustments, {row['total_quantity']} units")
+            written += 1
+        return written
+
+    def write_summary(self, output, summary):
+        output.write("\n" + "=" * 50 + "\nSTOCK SUMMARY REPORT\n" + "=" * 50 + "\n")
+        output.write(f"Total Products: {summary['total_products']}\n")
+        output.write(f"Total Stock Value: ${summary['total_stock_value']:,.2f}\n")
+        output.write(f"Low Stock Products: {summary['low_stock_count']}\n")
+        output.write(f"Out of Stock Products: {summary['out_of_stock_count']}\n")
+        if summary['top_products']:
+            output.write(f"\nTop {len(summary['top_products'])} Products by Stock Value:\n")
+            for product in summary['top_products']:
+                output.write(f"  - {product['name']}: {product['stock']} units @ ${product['cost']} = ${product['stock_value']:,.2f}\n")
+
+    def write_section(self, output, title, period, data, totals, breakdown_title, describe):
+        output.write("\n" + "=" * 50 + f"\n{title}\n" + "=" * 50 + "\n")
+        output.write(period + "\n")
+        for label, key in totals:
+            output.write(f"{label}: {data[key]}\n")
+        if data['by_type']:
+            output.write(f"\n{breakdown_title}:\n")
+            for row in data['by_type']:
+                output.write(f"  - {describe(row)}\n")
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from products.snapshots import take_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = "Snapshot every product's stock at the end of a day, for stock-as-of-date queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to snapshot (YYYY-MM-DD); defaults to yesterday')
+        parser.add_argument('--days', type=int, default=1, help='Number of days to snapshot, ending at --date')
+        parser.add_argument('--user-client', help='Only snapshot this tenant')
+
+    def handle(self, *args, **options):
+        try:
+            end = date.fromisoformat(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError('--date must be YYYY-MM-DD')
+        if end >= timezone.localdate():
+            raise CommandError('--date must be before today')
+
+        for offset in range(options['days'] - 1, -1, -1):
+            snapshot_date = end - timedelta(days=offset)
+            written = take_stock_snapshots(snapshot_date, user_client_id=options['user_client'])
+            self.stdout.write(f'{snapshot_date}: {written} snapshots')
+        self.stdout.write(self.style.SUCCESS('Stock snapshots taken'))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:14
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_alter_product_cost_alter_product_price'),
+        ('registry', '0005_customer_consent_timestamp_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceList',
+            fields=[
+                ('price_list_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('change_type', models.CharField(choices=[('PERCENT', 'Percentage'), ('AMOUNT', 'Fixed Amount'), ('SET', 'Set Price')], max_length=10)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('APPLIED', 'Applied'), ('CANCELLED', 'Cancelled')], default='SCHEDULED', max_length=10)),
+                ('version', models.PositiveIntegerField(blank=True, null=True)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_lists', to='products.category')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_lists_created', to=settings.AUTH_USER_MODEL)),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_lists', to='registry.supplier')),
+                ('user_client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_lists', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceListItem',
+            fields=[
+                ('price_list_item_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='products.pricelist')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_list_items', to='products.product')),
+                ('user_client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_list_items', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pricelist',
+            index=models.Index(fields=['status', 'effective_from'], name='price_list_due_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pricelist',
+            unique_together={('user_client', 'version')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='pricelistitem',
+            unique_together={('price_list', 'product')},
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:40
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_layers_for_stock_on_hand(apps, schema_editor):
+    """One opening layer per product with stock, valued as the reports value it (average cost, else list cost)."""
+    Product = apps.get_model('products', 'Product')
+    CostLayer = apps.get_model('products', 'CostLayer')
+    now = django.utils.timezone.now()
+    layers = [
+        CostLayer(
+            user_client_id=product.user_client_id, product_id=product.pk, quantity=product.stock,
+            remaining_quantity=product.stock, unit_cost=product.average_cost or product.cost,
+            reference_number='OPENING', received_at=now,
+        )
+        for product in Product.objects.filter(stock__gt=0).only('pk', 'user_client', 'stock', 'average_cost', 'cost').iterator()
+    ]
+    CostLayer.objects.bulk_create(layers, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_price_lists'),
+        ('purchases', '0011_received_quantities'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('cost_layer_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('remaining_quantity', models.PositiveIntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reference_number', models.CharField(blank=True, max_length=100, null=True)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('grn_detail', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='purchases.grndetail')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='products.product')),
+                ('user_client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'received_at'], name='cost_layer_fifo_idx')],
+            },
+        ),
+        migrations.RunPython(open_layers_for_stock_on_hand, migrations.RunPython.noop),
+    ]
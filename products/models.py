@@ -1,8 +1,13 @@
+import re
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Cast, Substr
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from users.models import UserClient 
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from AsiriaPOS.events import publish_on_commit
 
 # Create your models here.
 # This is the Product model for the AsiriaPOS application.
@@ -72,24 +77,51 @@ class Product(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.sku or self.sku == '':
-            if self.category and self.category.name:
-                # cat_initials = ''.join([word[0] for word in self.category.name.split()][:3]).upper()
-                cat_initials = self.category.name[:3].upper()
-            else:
-                cat_initials = 'GEN'
-            count = Product.objects.filter(category=self.category).count() + 1
-            self.sku = f"{cat_initials}-{count:05d}"
+            prefix = self.sku_prefix(self.category)
+            self.sku = self.allocate_skus({prefix: 1})[prefix][0]
         if not self.barcode or self.barcode == '':
             self.barcode = self.generate_unique_barcode()
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def sku_prefix(category):
+        if category and category.name:
+            # cat_initials = ''.join([word[0] for word in category.name.split()][:3]).upper()
+            return category.name[:3].upper()
+        return 'GEN'
+
+    @staticmethod
+    def allocate_skus(counts):
+        """Next free ``PREFIX-00001`` style SKUs: ``{prefix: n}`` -> ``{prefix: [n skus]}``, one query per prefix.
+
+        Numbering continues after the highest existing SKU for each prefix (SKUs are
+        unique across clients). Callers must save them before allocating again.
+        """
+        allocated = {}
+        for prefix, n in counts.items():
+            # Compared as numbers: hand-entered SKUs may be unpadded, and numbering can pass 99999
+            highest = Product.objects.filter(
+                sku__startswith=f"{prefix}-", sku__regex=rf"^{re.escape(prefix)}-[0-9]+$",
+            ).aggregate(
+                number=models.Max(Cast(Substr('sku', len(prefix) + 2), models.BigIntegerField())),
+            )['number']
+            start = highest + 1 if highest else 1
+            allocated[prefix] = [f"{prefix}-{number:05d}" for number in range(start, start + n)]
+        return allocated
+
     @staticmethod
     def generate_unique_barcode():
-        import uuid
-        while True:
-            barcode = str(uuid.uuid4().int)[:13]
-            if not Product.objects.filter(barcode=barcode).exists():
-                return barcode
+        return Product.allocate_barcodes(1)[0]
+
+    @staticmethod
+    def allocate_barcodes(count):
+        """``count`` random 13-digit barcodes not used by any product, checked in one query per round."""
+        barcodes = set()
+        while len(barcodes) < count:
+            candidates = {str(uuid.uuid4().int)[:13] for _ in range(count - len(barcodes))}
+            candidates -= set(Product.objects.filter(barcode__in=candidates).values_list('barcode', flat=True))
+            barcodes |= candidates
+        return list(barcodes)
 
 class StockMovement(models.Model):
     """Track all stock movements with reasons"""
@@ -118,6 +150,15 @@ class StockMovement(models.Model):
     def __str__(self):
         return f"{self.movement_type} - {self.product.name} - {self.quantity}"
 
+    def event_payload(self):
+        """Compact live-dashboard event for this movement."""
+        return {
+            'product_id': str(self.product_id),
+            'movement_type': self.movement_type,
+            'delta': self.quantity,
+            'stock': self.new_stock,
+        }
+
     def save(self, *args, **kwargs):
         if not self.previous_stock:
             self.previous_stock = self.product.stock
@@ -154,7 +195,14 @@ class StockAdjustment(models.Model):
 
     def approve(self, approved_by_user):
         """Approve the stock adjustment"""
-        if not self.is_approved:
+        from .cost_layers import CostLine, add_layers, consume_layers, fallback_unit_cost
+        from .stock_ledger import lock_products
+        with transaction.atomic():
+            # Lock the product first, as checkout does, so the stock read below is current
+            # and a second approval of the same adjustment waits and then sees this one
+            self.product = lock_products([self.product_id])[self.product_id]
+            if self.is_approved or type(self).objects.filter(pk=self.pk, is_approved=True).exists():
+                return
             self.is_approved = True
             self.approved_by = approved_by_user
             self.approved_at = timezone.now()
@@ -178,6 +226,52 @@ class StockAdjustment(models.Model):
             self.product.save()
             self.save()
 
+            if self.quantity_adjusted > 0:
+                add_layers(self.user_client, [CostLine(
+                    self.product_id, self.quantity_adjusted, fallback_unit_cost(self.product), self.reference_number,
+                )])
+            elif self.quantity_adjusted < 0:
+                consume_layers(self.user_client, [CostLine(self.product_id, -self.quantity_adjusted)], products={self.product_id: self.product})
+
+class CostLayer(models.Model):
+    """Stock received in one batch at one unit cost; sales use up the oldest open layers first (FIFO)"""
+    cost_layer_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='cost_layers')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cost_layers')
+    # The GRN line that received the stock; deleting the line removes what is left of its layer
+    grn_detail = models.ForeignKey('purchases.GRNDetail', on_delete=models.CASCADE, null=True, blank=True, related_name='cost_layers')
+    quantity = models.PositiveIntegerField()
+    remaining_quantity = models.PositiveIntegerField()
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    reference_number = models.CharField(max_length=100, blank=True, null=True)
+    received_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'received_at'], name='cost_layer_fifo_idx')]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.remaining_quantity}/{self.quantity} @ {self.unit_cost}"
+
+class StockSnapshot(models.Model):
+    """A product's stock and unit cost at the end of a day, written by the ``take_stock_snapshots`` job"""
+    snapshot_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='stock_snapshots')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    snapshot_date = models.DateField()
+    # ``stock`` counts the movements created before this instant (the end of ``snapshot_date``)
+    taken_until = models.DateTimeField()
+    stock = models.IntegerField()
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('product', 'snapshot_date')
+        indexes = [models.Index(fields=['user_client', 'snapshot_date'], name='stock_snapshot_date_idx')]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.snapshot_date}: {self.stock}"
+
 class StockAlert(models.Model):
     """Stock alerts for low stock notifications"""
     ALERT_TYPES = [
@@ -199,6 +293,15 @@ class StockAlert(models.Model):
     def __str__(self):
         return f"{self.alert_type} - {self.product.name}"
 
+    def event_payload(self):
+        """Compact live-dashboard event for this alert."""
+        return {
+            'alert_id': str(self.alert_id),
+            'product_id': str(self.product_id),
+            'alert_type': self.alert_type,
+            'message': self.message,
+        }
+
     def resolve(self, resolved_by_user):
         """Resolve the stock alert"""
         self.is_active = False
@@ -299,5 +402,88 @@ class StockTransfer(models.Model):
             created_by=self.created_by
         )
 
+class PriceList(models.Model):
+    """A versioned bulk price change. Its items hold each product's old and new price.
+
+    ``version`` is assigned when the list is applied and increases per client, so
+    tills can ask for every price changed after the version they last synced.
+    """
+    CHANGE_TYPES = [
+        ('PERCENT', 'Percentage'),
+        ('AMOUNT', 'Fixed Amount'),
+        ('SET', 'Set Price'),
+    ]
+    STATUS_CHOICES = [
+        ('SCHEDULED', 'Scheduled'),
+        ('APPLIED', 'Applied'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+
+    price_list_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
+    user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='price_lists')
+    name = models.CharField(max_length=100)
+    change_type = models.CharField(max_length=10, choices=CHANGE_TYPES)
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='price_lists')
+    supplier = models.ForeignKey('registry.Supplier', on_delete=models.SET_NULL, null=True, blank=True, related_name='price_lists')
+    product_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='SCHEDULED')
+    version = models.PositiveIntegerField(null=True, blank=True)
+    effective_from = models.DateTimeField(default=timezone.now)
+    applied_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(UserClient, on_delete=models.SET_NULL, null=True, blank=True, related_name='price_lists_created')
+    created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ('user_client', 'version')
+        indexes = [models.Index(fields=['status', 'effective_from'], name='price_list_due_idx')]
 
+    def __str__(self):
+        return f"Price list {self.name} (v{self.version or '-'}, {self.status})"
+
+    @staticmethod
+    def latest_version(user_client_id):
+        return PriceList.objects.filter(user_client_id=user_client_id, status='APPLIED').aggregate(
+            version=models.Max('version'),
+        )['version'] or 0
+
+    def apply(self):
+        """Write the new prices with one UPDATE and take the client's next version. Call in a transaction."""
+        # Lock the client row so concurrent lists take distinct versions
+        list(UserClient.objects.select_for_update().filter(pk=self.user_client_id).values_list('pk', flat=True))
+        items = PriceListItem.objects.filter(price_list=self)
+        Product.objects.filter(pk__in=items.values('product_id')).update(
+            price=models.Subquery(items.filter(product_id=models.OuterRef('pk')).values('new_price')[:1]),
+            updated_at=timezone.now(),
+        )
+        self.version = self.latest_version(self.user_client_id) + 1
+        self.status = 'APPLIED'
+        self.applied_at = timezone.now()
+        self.save(update_fields=['version', 'status', 'applied_at'])
+        publish_on_commit(self.user_client_id, 'prices', {'version': self.version, 'count': self.product_count})
+
+class PriceListItem(models.Model):
+    price_list_item_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
+    user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='price_list_items')
+    price_list = models.ForeignKey(PriceList, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_list_items')
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        unique_together = ('price_list', 'product')
+
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} -> {self.new_price}"
+
+@receiver(post_save, sender=StockMovement)
+def publish_stock_movement(sender, instance, created, **kwargs):
+    # Transfers move stock between locations and leave the product total unchanged
+    if created and instance.movement_type != 'TRANSFER':
+        publish_on_commit(instance.user_client_id, 'stock', instance.event_payload())
+
+@receiver(post_save, sender=StockAlert)
+def publish_stock_alert(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(instance.user_client_id, 'alert', instance.event_payload())
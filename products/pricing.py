@@ -0,0 +1,109 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product, PriceList, PriceListItem
+
+CENT = Decimal('0.01')
+
+
+def new_price(old_price, change_type, value):
+    if change_type == 'PERCENT':
+        price = old_price * (Decimal(100) + value) / Decimal(100)
+    elif change_type == 'AMOUNT':
+        price = old_price + value
+    else:
+        price = value
+    return max(price, Decimal(0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def price_change_products(user_client, category=None, supplier=None, product_ids=None):
+    """The client's products a price change targets; every given filter must match."""
+    products = Product.objects.filter(user_client=user_client)
+    if category is not None:
+        products = products.filter(category=category)
+    if supplier is not None:
+        # Products have no supplier field, so "supplied by" means bought from them
+        products = products.filter(purchase_details__purchase_header__supplier=supplier).distinct()
+    if product_ids:
+        products = products.filter(pk__in=product_ids)
+    return products
+
+
+def create_price_list(user_client, name, change_type, value, category=None, supplier=None, product_ids=None,
+                      effective_from=None, created_by=None):
+    """Record a price change for the selected products and apply it now unless it starts later.
+
+    New prices are computed from the current prices when the list is created
+    (one SELECT and one bulk INSERT of items); applying it is a single UPDATE.
+    """
+    effective_from = effective_from or timezone.now()
+    with transaction.atomic():
+        price_list = PriceList.objects.create(
+            user_client=user_client,
+            name=name,
+            change_type=change_type,
+            value=value,
+            category=category,
+            supplier=supplier,
+            effective_from=effective_from,
+            created_by=created_by,
+        )
+        current = price_change_products(user_client, category, supplier, product_ids).values_list('product_id', 'price')
+        items = [
+            PriceListItem(
+                user_client=user_client,
+                price_list=price_list,
+                product_id=product_id,
+                old_price=price,
+                new_price=new_price(price, change_type, value),
+            )
+            for product_id, price in current.iterator()
+        ]
+        PriceListItem.objects.bulk_create(items, batch_size=1000)
+        price_list.product_count = len(items)
+        price_list.save(update_fields=['product_count'])
+        if effective_from <= timezone.now():
+            price_list.apply()
+    return price_list
+
+
+def refresh_items(price_list):
+    """Recompute a scheduled list's new prices from the products' prices now, as they may have changed since it was made."""
+    items = list(price_list.items.select_related('product').only('old_price', 'new_price', 'product__price'))
+    for item in items:
+        item.old_price = item.product.price
+        item.new_price = new_price(item.product.price, price_list.change_type, price_list.value)
+    PriceListItem.objects.bulk_update(items, ['old_price', 'new_price'], batch_size=1000)
+
+
+def apply_due_price_lists(now=None):
+    """Apply scheduled lists whose start time has passed, oldest first. Returns how many were applied."""
+    now = now or timezone.now()
+    applied = 0
+    for price_list_id in PriceList.objects.filter(status='SCHEDULED', effective_from__lte=now).order_by('effective_from').values_list('pk', flat=True):
+        with transaction.atomic():
+            price_list = PriceList.objects.select_for_update().get(pk=price_list_id)
+            if price_list.status != 'SCHEDULED':
+                continue
+            refresh_items(price_list)
+            price_list.apply()
+            applied += 1
+    return applied
+
+
+def price_feed(user_client_id, since_version):
+    """Current prices of the products repriced by lists applied after ``since_version``."""
+    changed = PriceListItem.objects.filter(
+        user_client_id=user_client_id,
+        price_list__status='APPLIED',
+        price_list__version__gt=since_version,
+    ).values('product_id')
+    return {
+        'version': PriceList.latest_version(user_client_id),
+        'prices': [
+            {'product_id': product_id, 'price': str(price)}
+            for product_id, price in Product.objects.filter(pk__in=changed).values_list('product_id', 'price').iterator()
+        ],
+    }
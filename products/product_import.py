@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cost_layers import CostLine, add_layers, fallback_unit_cost
+from .models import Category, Unit, Product, StockMovement
+from .serializers import ProductImportRowSerializer
+from .stock_ledger import sync_stock_alerts
+
+UPDATABLE_FIELDS = ['name', 'category', 'unit', 'description', 'minQuantity', 'price', 'cost', 'sku', 'barcode']
+
+
+def read_product_rows(upload, filename=''):
+    """Rows from an uploaded CSV (header row required) or JSON (a list, or ``{"products": [...]}``) file."""
+    content = upload.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if filename.lower().endswith('.json') or content.lstrip()[:1] in ('[', '{'):
+        data = json.loads(content)
+        return data['products'] if isinstance(data, dict) else data
+    return list(csv.DictReader(io.StringIO(content)))
+
+
+def validate_rows(raw_rows):
+    """Validate raw rows with one ``ProductImportRowSerializer``. Returns ``(positions, rows, errors by position)``."""
+    # One serializer instance for every row, as ListSerializer does; building one per row costs more than validating it
+    row_serializer = ProductImportRowSerializer()
+    positions, rows, errors = [], [], {}
+    for position, raw_row in enumerate(raw_rows):
+        try:
+            rows.append(row_serializer.run_validation(raw_row))
+        except ValidationError as exc:
+            errors[position] = exc.detail
+        else:
+            positions.append(position)
+    return positions, rows, errors
+
+
+def import_products(user_client, rows, chunk_size=None, create_missing=True):
+    """Create or update a client's products from validated ``ProductImportRowSerializer`` rows.
+
+    A row updates the client's product with the same SKU (or barcode) and
+    creates one otherwise. Categories and units are looked up by name for the
+    whole import at once, missing SKUs and barcodes are allocated in blocks,
+    and rows are written in chunks: each chunk is one transaction doing a bulk
+    insert, a bulk update and a bulk insert of INITIAL stock movements. Returns
+    one result per row, in order. A failed chunk is reported on its own rows.
+    """
+    chunk_size = chunk_size or getattr(settings, 'PRODUCT_IMPORT_CHUNK_SIZE', 1000)
+    results = [None] * len(rows)
+
+    categories, category_errors = _resolve_names(
+        Category, 'name', user_client, {row['category'] for row in rows}, create_missing,
+    )
+    units, unit_errors = _resolve_names(
+        Unit, 'unit_name', user_client, {row['unit'] for row in rows}, create_missing,
+    )
+    existing_by_sku = Product.objects.in_bulk({row['sku'] for row in rows if row.get('sku')}, field_name='sku')
+    existing_by_barcode = Product.objects.in_bulk({row['barcode'] for row in rows if row.get('barcode')}, field_name='barcode')
+
+    seen_skus, seen_barcodes = set(), set()
+    creates, updates = [], []
+    for index, row in enumerate(rows):
+        errors = []
+        if row['category'] in category_errors:
+            errors.append(category_errors[row['category']])
+        if row['unit'] in unit_errors:
+            errors.append(unit_errors[row['unit']])
+        sku, barcode = row.get('sku'), row.get('barcode')
+        if sku and sku in seen_skus:
+            errors.append(f"SKU {sku} is repeated in this import")
+        if barcode and barcode in seen_barcodes:
+            errors.append(f"Barcode {barcode} is repeated in this import")
+
+        product = existing_by_sku.get(sku) or existing_by_barcode.get(barcode)
+        if product is not None:
+            if product.user_client_id != user_client.pk:
+                errors.append("SKU or barcode is already used by another client's product")
+            elif barcode and existing_by_barcode.get(barcode, product) != product:
+                errors.append(f"Barcode {barcode} belongs to another product")
+            elif sku and existing_by_sku.get(sku, product) != product:
+                errors.append(f"SKU {sku} belongs to another product")
+        if errors:
+            results[index] = _result(index, row, 'error', errors=errors)
+            continue
+
+        seen_skus.add(sku)
+        seen_barcodes.add(barcode)
+        fields = {key: value for key, value in row.items() if key in UPDATABLE_FIELDS and key not in ('category', 'unit')}
+        fields['category'] = categories[row['category']]
+        fields['unit'] = units[row['unit']]
+        if product is None:
+            fields.setdefault('minQuantity', 0)
+            product = Product(user_client=user_client, stock=row.get('stock', 0), **fields)
+            creates.append((index, row, product, 'created'))
+        else:
+            for field, value in fields.items():
+                setattr(product, field, value)
+            updates.append((index, row, product, 'updated'))
+
+    _allocate_codes([product for _, _, product, _ in creates])
+
+    batch = sorted(creates + updates, key=lambda entry: entry[0])
+    for start in range(0, len(batch), chunk_size):
+        chunk = batch[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                _write_chunk(user_client, chunk)
+        except DatabaseError:
+            for index, row, _, _ in chunk:
+                results[index] = _result(index, row, 'error', errors=['Product could not be saved, retry the import'])
+            continue
+        for index, row, product, status in chunk:
+            results[index] = _result(index, row, status, product_id=str(product.pk), sku=product.sku, barcode=product.barcode)
+
+    return results
+
+
+def _result(index, row, status, **extra):
+    return {'row': index + 1, 'name': row.get('name'), 'status': status, **extra}
+
+
+def _resolve_names(model, field, user_client, names, create_missing):
+    """Map names to the client's rows, creating missing ones. Returns ``(found, errors by name)``."""
+    found = {getattr(obj, field): obj for obj in model.objects.filter(user_client=user_client, **{f'{field}__in': names})}
+    missing = names - set(found)
+    errors = {}
+    if not missing:
+        return found, errors
+    label = model._meta.verbose_name
+    if not create_missing:
+        return found, {name: f"Unknown {label} {name}" for name in missing}
+
+    # Category and unit names are unique across clients
+    taken = set(model.objects.filter(**{f'{field}__in': missing}).values_list(field, flat=True))
+    errors = {name: f"{label.capitalize()} name {name} is already used by another client" for name in taken}
+    created = model.objects.bulk_create([model(user_client=user_client, **{field: name}) for name in missing - taken])
+    found.update({getattr(obj, field): obj for obj in created})
+    return found, errors
+
+
+def _allocate_codes(products):
+    counts = {}
+    for product in products:
+        if not product.sku:
+            prefix = Product.sku_prefix(product.category)
+            counts[prefix] = counts.get(prefix, 0) + 1
+    skus = {prefix: iter(block) for prefix, block in Product.allocate_skus(counts).items()}
+    barcodes = iter(Product.allocate_barcodes(sum(1 for product in products if not product.barcode)))
+    for product in products:
+        if not product.sku:
+            product.sku = next(skus[Product.sku_prefix(product.category)])
+        if not product.barcode:
+            product.barcode = next(barcodes)
+
+
+def _write_chunk(user_client, chunk):
+    now = timezone.now()
+    created = [product for _, _, product, status in chunk if status == 'created']
+    updated = [product for _, _, product, status in chunk if status == 'updated']
+    for product in updated:
+        product.updated_at = now
+    # bulk_create bypasses Product.save, so codes were allocated up front
+    Product.objects.bulk_create(created)
+    Product.objects.bulk_update(updated, UPDATABLE_FIELDS + ['updated_at'])
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            user_client=user_client,
+            product=product,
+            movement_type='INITIAL',
+            quantity=product.stock,
+            previous_stock=0,
+            new_stock=product.stock,
+            reason='Product import',
+            created_by=user_client,
+        )
+        for product in created if product.stock
+    ])
+    # Opening stock enters the FIFO cost layers ahead of anything received later
+    add_layers(user_client, [
+        CostLine(product.pk, product.stock, fallback_unit_cost(product))
+        for product in created if product.stock
+    ], received_at=now)
+    sync_stock_alerts(created)
@@ -0,0 +1,134 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Product, ProductLocationStock, StockMovement
+from .stock_ledger import lock_products, sync_stock_alerts
+
+
+def opening_stock(previous, new):
+    """Stock before a group of movements saved at the same instant, whatever order they were saved in.
+
+    ``previous`` and ``new`` count the group's ``previous_stock`` and
+    ``new_stock`` values. In an unbroken chain every movement but the first
+    starts from the stock another one left, so exactly one previous stock is
+    left over. None when the group is not such a chain.
+    """
+    left = previous - new
+    return next(iter(left)) if sum(left.values()) == 1 else None
+
+
+def ledger_stock(user_client_id, product_ids=None):
+    """``{product_id: (expected stock, net transfers)}`` for the products that have stock movements.
+
+    Expected stock is the stock before the product's first movements (which
+    covers opening stock typed on the product form) plus one grouped sum of
+    its movements. Movements written together share a ``created_at``, so the
+    opening is worked out from all of the earliest ones by ``opening_stock``.
+    Transfers move stock between locations and leave the product total
+    unchanged, so they are left out of the expected stock; their two halves
+    should cancel out. Expected stock is None for a product with only
+    transfers, or whose earliest movements do not chain. Two queries.
+    """
+    movements = StockMovement.objects.filter(user_client_id=user_client_id)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    rows = movements.order_by().values('product_id').annotate(
+        stock=Sum('quantity', filter=~Q(movement_type='TRANSFER')),
+        transfers=Sum('quantity', filter=Q(movement_type='TRANSFER')),
+        first_at=Min('created_at', filter=~Q(movement_type='TRANSFER')),
+    )
+    totals = {row['product_id']: (row['stock'] or 0, row['transfers'] or 0) for row in rows}
+    first_at = {row['product_id']: row['first_at'] for row in rows if row['first_at']}
+
+    earliest = defaultdict(lambda: (Counter(), Counter()))
+    for product_id, created_at, previous_stock, new_stock in (
+        movements.exclude(movement_type='TRANSFER').filter(created_at__in=set(first_at.values()))
+        .values_list('product_id', 'created_at', 'previous_stock', 'new_stock')
+    ):
+        # Other products' movements can share the timestamp without being their first
+        if first_at[product_id] == created_at:
+            earliest[product_id][0][previous_stock] += 1
+            earliest[product_id][1][new_stock] += 1
+    openings = {product_id: opening_stock(*counts) for product_id, counts in earliest.items()}
+    return {
+        product_id: (openings[product_id] + stock if openings.get(product_id) is not None else None, transfers)
+        for product_id, (stock, transfers) in totals.items()
+    }
+
+
+def reconcile_stock(user_client_id, repair=False):
+    """Compare a client's stock with its movement ledger; with ``repair``, set drifted stock to the ledger's.
+
+    A few grouped reads (products, movements, location stock) cover the
+    whole client. Reported, per product:
+
+    - ``drift``: ``Product.stock`` differs from what its movements add up to;
+    - ``unbalanced_transfers``: transfer movements that do not net to zero;
+    - ``locations``: location quantities below zero, or adding up to more
+      than the product's stock. Movements do not record a location, so
+      location quantities are checked but not repaired.
+
+    Products without movements, or whose opening stock cannot be worked
+    out, are only checked against their locations. Repair locks the drifted products,
+    re-reads their movements under the lock (so a sale committed meanwhile is
+    not undone) and writes the new stock with one ``bulk_update``.
+    """
+    ledger = ledger_stock(user_client_id)
+    allocated = {
+        row['product_id']: row
+        for row in ProductLocationStock.objects.filter(user_client_id=user_client_id).order_by().values('product_id').annotate(
+            allocated=Sum('quantity'), negative=Count('pk', filter=Q(quantity__lt=0)),
+        )
+    }
+
+    checked = 0
+    drift, unbalanced_transfers, locations = [], [], []
+    for product_id, name, stock in Product.objects.filter(user_client_id=user_client_id).values_list('product_id', 'name', 'stock'):
+        checked += 1
+        expected, transfers = ledger.get(product_id, (None, 0))
+        if expected is None:
+            expected = stock
+        if stock != expected:
+            drift.append({'product_id': product_id, 'name': name, 'stock': stock, 'expected': expected, 'drift': stock - expected})
+        if transfers:
+            unbalanced_transfers.append({'product_id': product_id, 'name': name, 'net_transfers': transfers})
+        location = allocated.get(product_id)
+        if location and (location['negative'] or location['allocated'] > expected):
+            locations.append({
+                'product_id': product_id, 'name': name, 'expected': expected,
+                'allocated': location['allocated'], 'negative_locations': location['negative'],
+            })
+
+    return {
+        'products': checked,
+        'drift': drift,
+        'unbalanced_transfers': unbalanced_transfers,
+        'locations': locations,
+        'repaired': repair_drift(user_client_id, [row['product_id'] for row in drift]) if repair and drift else 0,
+    }
+
+
+def repair_drift(user_client_id, product_ids):
+    """Set the given products' stock to their movement totals; returns how many changed."""
+    with transaction.atomic():
+        products = lock_products(product_ids)
+        ledger = ledger_stock(user_client_id, list(products))
+        now = timezone.now()
+        repaired = []
+        for product_id, product in products.items():
+            expected = ledger.get(product_id, (None, 0))[0]
+            if expected is not None and product.stock != expected:
+                product.stock = expected
+                product.updated_at = now
+                repaired.append(product)
+        Product.objects.bulk_update(repaired, ['stock', 'updated_at'])
+        sync_stock_alerts(repaired)
+    return len(repaired)
+
+
+def tenant_stock_reconciliation(user_client_id, repair):
+    """``(user_client_id, result)`` for one client; module-level so process pool workers can run it."""
+    return user_client_id, reconcile_stock(user_client_id, repair)
@@ -0,0 +1,204 @@
+"""
+Stock report builders shared by the API, the async views and the report job worker.
+
+Each ``*_report`` function takes a client id plus plain parameters and returns
+a JSON-ready dict computed with database aggregates. They are registered as
+background report types in ``reports/registry.py``.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from sales.models import SalesDetail
+from .models import Product, StockAdjustment, StockAlert, StockMovement
+
+
+def money_field():
+    return DecimalField(max_digits=14, decimal_places=2)
+
+
+def unit_cost_expression(prefix=''):
+    # Weighted average cost when one has been recorded, otherwise the list cost (as the valuation action does)
+    average_cost = NullIf(F(f'{prefix}average_cost'), Value(0), output_field=money_field())
+    return Coalesce(average_cost, F(f'{prefix}cost'), output_field=money_field())
+
+
+def stock_value_expression():
+    return ExpressionWrapper(F('stock') * unit_cost_expression(), output_field=money_field())
+
+
+def catalog_version(user_client_id):
+    """Cheap fingerprint of a client's catalog and stock, used to key cached report results."""
+    products = Product.objects.filter(user_client_id=user_client_id).aggregate(
+        count=Count('pk'), updated=Max('updated_at'),
+    )
+    last_movement = StockMovement.objects.filter(user_client_id=user_client_id).aggregate(at=Max('created_at'))['at']
+    return [products['count'], products['updated'], last_movement]
+
+
+def stock_activity_version(user_client_id):
+    """``catalog_version`` plus the alert and adjustment state the stock report sections read."""
+    alerts = StockAlert.objects.filter(user_client_id=user_client_id).aggregate(
+        count=Count('pk'), active=Count('pk', filter=Q(is_active=True)), resolved=Max('resolved_at'),
+    )
+    adjustments = StockAdjustment.objects.filter(user_client_id=user_client_id).aggregate(
+        count=Count('pk'), approved=Count('pk', filter=Q(is_approved=True)),
+    )
+    return catalog_version(user_client_id) + list(alerts.values()) + list(adjustments.values())
+
+
+def valuation_aggregates():
+    return {
+        'total_quantity': Coalesce(Sum('stock'), 0),
+        'total_valuation': Coalesce(Sum(stock_value_expression()), 0, output_field=money_field()),
+    }
+
+
+def valuation_items(queryset):
+    return queryset.order_by('name').annotate(
+        unit_cost=unit_cost_expression(),
+        valuation=stock_value_expression(),
+    ).values('product_id', 'name', 'stock', 'unit_cost', 'valuation')
+
+
+def valuation_report(user_client_id):
+    queryset = Product.objects.filter(user_client_id=user_client_id)
+    return {**queryset.aggregate(**valuation_aggregates()), 'items': list(valuation_items(queryset))}
+
+
+def list_value_expression():
+    # ``Product.stock_value``: stock at list cost
+    return ExpressionWrapper(F('stock') * F('cost'), output_field=money_field())
+
+
+def stock_summary(products, top=10):
+    """Catalog totals and the top products by stock value (stock at list cost), all computed by the database."""
+    totals = products.aggregate(
+        total_products=Count('pk'),
+        total_stock_value=Coalesce(Sum(list_value_expression()), 0, output_field=money_field()),
+        low_stock_count=Count('pk', filter=Q(stock__lte=F('minQuantity'))),
+        out_of_stock_count=Count('pk', filter=Q(stock__lte=0)),
+    )
+    # Annotated under another name: ``stock_value`` is a model property
+    top_products = products.annotate(value=list_value_expression()).order_by('-value').values(
+        'product_id', 'name', 'stock', 'cost', 'value',
+    )[:top]
+    totals['top_products'] = []
+    for row in top_products:
+        row['stock_value'] = row.pop('value')
+        totals['top_products'].append(row)
+    return totals
+
+
+def movements_summary(movements):
+    totals = movements.aggregate(
+        total_movements=Count('pk'),
+        total_in=Coalesce(Sum('quantity', filter=Q(quantity__gt=0)), 0),
+        total_out=Coalesce(Sum('quantity', filter=Q(quantity__lt=0)), 0),
+    )
+    totals['total_out'] = abs(totals['total_out'])
+    totals['by_type'] = list(
+        movements.values('movement_type').annotate(count=Count('pk'), total_quantity=Sum('quantity')).order_by('movement_type')
+    )
+    return totals
+
+
+def alerts_summary(alerts):
+    totals = alerts.aggregate(
+        total_alerts=Count('pk'),
+        active_alerts=Count('pk', filter=Q(is_active=True)),
+        resolved_alerts=Count('pk', filter=Q(is_active=False)),
+    )
+    totals['by_type'] = list(
+        alerts.values('alert_type').annotate(count=Count('pk'), active_count=Count('pk', filter=Q(is_active=True))).order_by('alert_type')
+    )
+    return totals
+
+
+def adjustments_summary(adjustments):
+    totals = adjustments.aggregate(
+        total_adjustments=Count('pk'),
+        approved=Count('pk', filter=Q(is_approved=True)),
+        pending=Count('pk', filter=Q(is_approved=False)),
+        total_quantity_adjusted=Coalesce(Sum('quantity_adjusted'), 0),
+    )
+    totals['by_type'] = list(
+        adjustments.values('adjustment_type').annotate(count=Count('pk'), total_quantity=Sum('quantity_adjusted')).order_by('adjustment_type')
+    )
+    return totals
+
+
+STOCK_REPORT_SECTIONS = ('summary', 'movements', 'alerts', 'adjustments')
+
+
+def stock_report(user_client_id=None, days=30, sections=STOCK_REPORT_SECTIONS, end=None):
+    """The ``stock_report`` command's sections as data; ``user_client_id=None`` covers every client."""
+    end = end or timezone.now()
+    start = end - timedelta(days=days)
+
+    def scoped(queryset):
+        return queryset.filter(user_client_id=user_client_id) if user_client_id else queryset
+
+    report = {'period_start': start, 'period_end': end}
+    if 'summary' in sections:
+        report['summary'] = stock_summary(scoped(Product.objects.all()))
+    if 'movements' in sections:
+        report['movements'] = movements_summary(scoped(StockMovement.objects.filter(created_at__range=(start, end))))
+    if 'alerts' in sections:
+        report['alerts'] = alerts_summary(scoped(StockAlert.objects.filter(created_at__range=(start, end))))
+    if 'adjustments' in sections:
+        report['adjustments'] = adjustments_summary(scoped(StockAdjustment.objects.filter(created_at__range=(start, end))))
+    return report
+
+
+def reorder_suggestions(user_client_id, days=30, safety_days=7, top=None):
+    """Reorder quantities from average daily sales over ``days`` plus ``safety_days`` of cover."""
+    since = timezone.now() - timedelta(days=days)
+    sold = dict(
+        SalesDetail.objects.filter(user_client_id=user_client_id, created_at__gte=since)
+        .values('product_id').annotate(qty_sold=Sum('quantity')).values_list('product_id', 'qty_sold')
+    )
+    suggestions = []
+    products = Product.objects.filter(user_client_id=user_client_id).values_list('product_id', 'name', 'stock', 'minQuantity')
+    for product_id, name, stock, min_quantity in products.iterator():
+        avg_daily = float(sold.get(product_id, 0)) / max(days, 1)
+        target_stock = avg_daily * safety_days + float(min_quantity)
+        reorder_qty = max(0, int(round(target_stock - float(stock))))
+        if reorder_qty > 0:
+            suggestions.append({
+                'product_id': str(product_id),
+                'name': name,
+                'current_stock': stock,
+                'min_quantity': min_quantity,
+                'avg_daily_sales': round(avg_daily, 2),
+                'suggested_order_qty': reorder_qty,
+            })
+    suggestions.sort(key=lambda row: row['suggested_order_qty'], reverse=True)
+    if top:
+        suggestions = suggestions[:top]
+    return {'window_days': days, 'safety_days': safety_days, 'suggestions': suggestions}
+
+
+def tenant_stock_report(user_client_id, days, sections, end):
+    """``(user_client_id, report)`` for one client; module-level so process pool workers can run it."""
+    return user_client_id, stock_report(user_client_id, days, sections, end)
+
+
+def stock_report_rows(report):
+    """Flatten a stock report into ``(section, item, metric, value)`` rows for CSV output."""
+    for section in STOCK_REPORT_SECTIONS:
+        data = report.get(section)
+        if data is None:
+            continue
+        for metric, value in data.items():
+            if not isinstance(value, list):
+                yield section, '', metric, value
+                continue
+            # top_products rows are keyed by product, the by_type breakdowns by their type column
+            for row in value:
+                row = dict(row)
+                item = row.pop('product_id', None) or row.pop(f'{section[:-1]}_type', '')
+                for key, row_value in row.items():
+                    yield f'{section}.{metric}', item, key, row_value
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Category, Unit, Product, StockMovement, StockAdjustment, StockAlert, Location, ProductLocationStock, StockTransfer
+from django.conf import settings
+from django.utils import timezone
+from AsiriaPOS.metrics import serializer_timing
+from .models import Category, Unit, Product, StockMovement, StockAdjustment, StockAlert, Location, ProductLocationStock, StockTransfer, PriceList, PriceListItem
 from users.models import UserClient
 from decimal import Decimal, InvalidOperation
 
@@ -20,7 +23,7 @@ class UnitSerializer(serializers.ModelSerializer):
 
 class ProductSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
-    unit_name = serializers.CharField(source='unit.name', read_only=True)
+    unit_name = serializers.CharField(source='unit.unit_name', read_only=True)
     is_low_stock = serializers.BooleanField(read_only=True)
     is_out_of_stock = serializers.BooleanField(read_only=True)
     # stock_value = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -41,10 +44,74 @@ class ProductSerializer(serializers.ModelSerializer):
                 rep[field] = "0.00"
         return rep
 
+class ProductReadSerializer:
+    """Read-only fast path for product lists and scans.
+
+    Produces ``ProductSerializer``'s output, with ``unit_name`` filled in, from
+    ``values()`` rows that already carry the category and unit names (fetch
+    them with ``ProductReadSerializer.rows(queryset)``). It skips DRF's
+    per-field machinery and the per-row category lookup, and formats each
+    decimal once.
+    """
+    VALUES = (
+        'product_id', 'name', 'sku', 'barcode', 'description', 'minQuantity', 'price', 'cost', 'average_cost',
+        'stock', 'created_at', 'updated_at', 'user_client_id', 'category_id', 'unit_id',
+        'category__name', 'unit__unit_name',
+    )
+
+    def __init__(self, instance=None, many=False):
+        self.instance = instance
+        self.many = many
+
+    @classmethod
+    def rows(cls, queryset):
+        return queryset.values(*cls.VALUES)
+
+    @property
+    @serializer_timing
+    def data(self):
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+        return self.to_representation(self.instance)
+
+    @staticmethod
+    def to_representation(row):
+        # Keys in ProductSerializer's order
+        return {
+            'product_id': str(row['product_id']),
+            'category_name': row['category__name'],
+            'unit_name': row['unit__unit_name'],
+            'is_low_stock': row['stock'] <= row['minQuantity'],
+            'is_out_of_stock': row['stock'] <= 0,
+            'stock_value': str(row['stock'] * row['cost']),
+            'average_cost': _money(row['average_cost']),
+            'name': row['name'],
+            'sku': row['sku'],
+            'barcode': row['barcode'],
+            'description': row['description'],
+            'minQuantity': row['minQuantity'],
+            'price': _money(row['price']),
+            'cost': _money(row['cost']),
+            'stock': row['stock'],
+            'created_at': _datetime(row['created_at']),
+            'updated_at': _datetime(row['updated_at']),
+            'user_client': row['user_client_id'],
+            'category': row['category_id'],
+            'unit': row['unit_id'],
+        }
+
+def _money(value):
+    return '0.00' if value is None else f'{value:.2f}'
+
+def _datetime(value):
+    # Same ISO 8601 form as DRF's DateTimeField
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
 class StockMovementSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     movement_type_display = serializers.CharField(source='get_movement_type_display', read_only=True)
-    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.storename', read_only=True)
     
     class Meta:
         model = StockMovement
@@ -54,8 +121,8 @@ class StockMovementSerializer(serializers.ModelSerializer):
 class StockAdjustmentSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     adjustment_type_display = serializers.CharField(source='get_adjustment_type_display', read_only=True)
-    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
-    approved_by_username = serializers.CharField(source='approved_by.username', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.storename', read_only=True)
+    approved_by_username = serializers.CharField(source='approved_by.storename', read_only=True)
     
     class Meta:
         model = StockAdjustment
@@ -65,7 +132,7 @@ class StockAdjustmentSerializer(serializers.ModelSerializer):
 class StockAlertSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     alert_type_display = serializers.CharField(source='get_alert_type_display', read_only=True)
-    resolved_by_username = serializers.CharField(source='resolved_by.username', read_only=True)
+    resolved_by_username = serializers.CharField(source='resolved_by.storename', read_only=True)
     
     class Meta:
         model = StockAlert
@@ -75,7 +142,7 @@ class StockAlertSerializer(serializers.ModelSerializer):
 class ProductStockSummarySerializer(serializers.ModelSerializer):
     """Serializer for product stock summary with movement history"""
     category_name = serializers.CharField(source='category.name', read_only=True)
-    unit_name = serializers.CharField(source='unit.name', read_only=True)
+    unit_name = serializers.CharField(source='unit.unit_name', read_only=True)
     is_low_stock = serializers.BooleanField(read_only=True)
     is_out_of_stock = serializers.BooleanField(read_only=True)
     stock_value = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -87,7 +154,7 @@ class ProductStockSummarySerializer(serializers.ModelSerializer):
     
     def get_recent_movements(self, obj):
         """Get recent stock movements for the product"""
-        movements = obj.stock_movements.order_by('-created_at')[:10]
+        movements = obj.stock_movements.select_related('product', 'created_by').order_by('-created_at')[:10]
         return StockMovementSerializer(movements, many=True).data
 
 class LocationSerializer(serializers.ModelSerializer):
@@ -104,4 +171,72 @@ class StockTransferSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockTransfer
         fields = '__all__'
-        read_only_fields = ['transfer_id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['transfer_id', 'created_at']
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """One imported product. Category and unit are given by name; blank SKU/barcode are generated."""
+    name = serializers.CharField(max_length=100)
+    category = serializers.CharField(max_length=100)
+    unit = serializers.CharField(max_length=50)
+    sku = serializers.CharField(max_length=20, required=False, allow_blank=True)
+    barcode = serializers.CharField(max_length=20, required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    minQuantity = serializers.IntegerField(required=False, min_value=0)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, min_value=0)
+    cost = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, min_value=0)
+    stock = serializers.IntegerField(required=False, min_value=0, help_text='Opening stock for new products; ignored on update')
+
+    def to_internal_value(self, data):
+        # CSV rows carry every column; treat empty cells as not supplied
+        if hasattr(data, 'items'):
+            data = {key: value for key, value in data.items() if value not in ('', None)}
+        return super().to_internal_value(data)
+
+class ProductImportSerializer(serializers.Serializer):
+    # Each row is validated on its own so one bad row does not reject the whole import
+    products = serializers.ListField(
+        child=serializers.DictField(),
+        required=False,
+        allow_empty=False,
+        max_length=getattr(settings, 'PRODUCT_IMPORT_MAX_ROWS', 50000),
+    )
+    file = serializers.FileField(required=False, help_text='CSV or JSON file of products, instead of the products list')
+    create_missing = serializers.BooleanField(default=True, help_text='Create categories and units that do not exist yet')
+
+    def validate(self, attrs):
+        if not attrs.get('products') and not attrs.get('file'):
+            raise serializers.ValidationError('Send a products list or a file')
+        return attrs
+
+class PriceListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceList
+        fields = '__all__'
+        read_only_fields = [
+            'price_list_id', 'user_client', 'product_count', 'status', 'version', 'applied_at', 'created_by', 'created_at',
+        ]
+
+class PriceListCreateSerializer(serializers.Serializer):
+    """A price change for a category, the products bought from a supplier, or a list of products."""
+    name = serializers.CharField(max_length=100)
+    change_type = serializers.ChoiceField(choices=PriceList.CHANGE_TYPES, help_text='PERCENT and AMOUNT change the current price (negative values lower it); SET replaces it')
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+    category = serializers.UUIDField(required=False)
+    supplier = serializers.UUIDField(required=False)
+    products = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    effective_from = serializers.DateTimeField(required=False, help_text='Apply at this time instead of now')
+
+    def validate(self, attrs):
+        if not any(attrs.get(key) for key in ('category', 'supplier', 'products')):
+            raise serializers.ValidationError('Choose the products with category, supplier or products')
+        if attrs['change_type'] == 'SET' and attrs['value'] < 0:
+            raise serializers.ValidationError({'value': 'A price cannot be negative'})
+        return attrs
+
+class PriceListItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    sku = serializers.CharField(source='product.sku', read_only=True)
+
+    class Meta:
+        model = PriceListItem
+        fields = ['price_list_item_id', 'product', 'product_name', 'sku', 'old_price', 'new_price']
@@ -0,0 +1,141 @@
+"""
+Stock as of a past date, from daily snapshots plus the movements since.
+
+``take_stock_snapshots`` records every product's stock at the end of a day.
+``stock_as_of`` starts from the latest snapshot on or before the requested
+day and adds the movements after it. When the day is nearer to now than to
+that snapshot (or there is none), it starts from current stock and takes
+back the movements since instead. Either way it reads a few grouped
+aggregates over a bounded window of movements, never the whole ledger.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+from .reports import unit_cost_expression
+
+CENTS = Decimal('0.01')
+BATCH_SIZE = 1000
+
+
+def end_of_day(day):
+    """The aware instant a local date ends; snapshots count the movements created before it."""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), timezone.get_current_timezone())
+
+
+def _movement_totals(user_client_id, since=None, until=None):
+    # Transfers move stock between locations and leave the product total unchanged
+    movements = StockMovement.objects.filter(user_client_id=user_client_id).exclude(movement_type='TRANSFER')
+    if since:
+        movements = movements.filter(created_at__gte=since)
+    if until:
+        movements = movements.filter(created_at__lt=until)
+    return dict(movements.order_by().values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+
+
+def _stock_rows(user_client_id, day, rebuild=False):
+    """``(snapshot_date, rows)``: each product's stock and unit cost at the end of ``day``, and the snapshot used.
+
+    Rows also carry ``current_unit_cost``. With ``rebuild``, snapshots of
+    ``day`` itself are ignored so the day can be worked out again.
+    """
+    until = end_of_day(day)
+    products = list(
+        Product.objects.filter(user_client_id=user_client_id).order_by('name')
+        .values('product_id', 'name', 'sku', 'stock', current_unit_cost=unit_cost_expression())
+    )
+    snapshots = StockSnapshot.objects.filter(user_client_id=user_client_id)
+    snapshot_date = snapshots.filter(
+        **{'snapshot_date__lt' if rebuild else 'snapshot_date__lte': day}
+    ).aggregate(latest=Max('snapshot_date'))['latest']
+
+    base = {}
+    if snapshot_date and until - end_of_day(snapshot_date) <= timezone.now() - until:
+        base = {
+            row['product_id']: row
+            for row in snapshots.filter(snapshot_date=snapshot_date).values('product_id', 'stock', 'unit_cost', 'taken_until')
+        }
+    if not base:
+        snapshot_date = None
+    forward = _movement_totals(user_client_id, since=next(iter(base.values()))['taken_until'], until=until) if base else {}
+    backward = _movement_totals(user_client_id, since=until) if len(base) < len(products) else {}
+
+    rows = []
+    for product in products:
+        snapshot = base.get(product['product_id'])
+        if snapshot:
+            stock = snapshot['stock'] + forward.get(product['product_id'], 0)
+            unit_cost = snapshot['unit_cost']
+        else:
+            stock = product['stock'] - backward.get(product['product_id'], 0)
+            unit_cost = product['current_unit_cost']
+        rows.append({
+            'product_id': product['product_id'],
+            'name': product['name'],
+            'sku': product['sku'],
+            'stock': stock,
+            'unit_cost': unit_cost,
+            'valuation': (stock * unit_cost).quantize(CENTS),
+            'current_unit_cost': product['current_unit_cost'],
+        })
+    return snapshot_date, rows
+
+
+def stock_as_of(user_client_id, day):
+    """Each product's stock and valuation at the end of ``day``, with totals.
+
+    Stock is valued at the unit cost recorded in the snapshot it starts from,
+    or at today's unit cost when it starts from current stock.
+    """
+    snapshot_date, rows = _stock_rows(user_client_id, day)
+    for row in rows:
+        del row['current_unit_cost']
+    return {
+        'date': day.isoformat(),
+        'snapshot_date': snapshot_date.isoformat() if snapshot_date else None,
+        'total_quantity': sum(row['stock'] for row in rows),
+        'total_valuation': sum((row['valuation'] for row in rows), Decimal('0')),
+        'items': rows,
+    }
+
+
+def snapshots_version(user_client_id):
+    """Cheap fingerprint of a client's snapshots, for keying cached as-of results."""
+    snapshots = StockSnapshot.objects.filter(user_client_id=user_client_id).aggregate(count=Count('pk'), taken=Max('created_at'))
+    return [snapshots['count'], snapshots['taken']]
+
+
+def take_stock_snapshots(day, user_client_id=None):
+    """Snapshot every product's stock at the end of ``day``, for one client or all; returns the snapshots written.
+
+    Each client's day is worked out from its previous snapshot, so a nightly
+    run only reads that day's movements. Snapshots record the unit cost
+    products have when the job runs. Re-running a day replaces its snapshots.
+    """
+    if user_client_id:
+        clients = [user_client_id]
+    else:
+        clients = Product.objects.order_by().values_list('user_client_id', flat=True).distinct()
+    until = end_of_day(day)
+    written = 0
+    for client_id in clients:
+        _, rows = _stock_rows(client_id, day, rebuild=True)
+        with transaction.atomic():
+            StockSnapshot.objects.filter(user_client_id=client_id, snapshot_date=day).delete()
+            StockSnapshot.objects.bulk_create([
+                StockSnapshot(
+                    user_client_id=client_id,
+                    product_id=row['product_id'],
+                    snapshot_date=day,
+                    taken_until=until,
+                    stock=row['stock'],
+                    unit_cost=row['current_unit_cost'],
+                )
+                for row in rows
+            ], batch_size=BATCH_SIZE)
+        written += len(rows)
+    return written
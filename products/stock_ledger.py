@@ -0,0 +1,106 @@
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from django.utils import timezone
+
+from AsiriaPOS.events import publish_on_commit
+from .models import Product, StockMovement, StockAlert
+
+
+class StockLine(NamedTuple):
+    """One signed stock change; positive for additions, negative for reductions."""
+    product_id: UUID
+    quantity: int
+    reference_number: Optional[str] = None
+    reason: Optional[str] = None
+
+
+def lock_products(product_ids):
+    """Lock the given products for the rest of the transaction and return them keyed by id."""
+    return Product.objects.select_for_update().in_bulk(set(product_ids))
+
+
+def apply_stock_movements(user_client, movement_type, lines, created_by=None, products=None, update_fields=()):
+    """Apply many stock changes with one bulk UPDATE and one bulk INSERT of movements.
+
+    This is the set-based counterpart of the per-row post_save signals: each line
+    still gets its own StockMovement with previous/new stock, but products are
+    written once however many lines touch them. Pass ``products`` when the caller
+    already holds them locked; otherwise they are locked here. ``update_fields``
+    names other product fields the caller changed on ``products`` (such as
+    ``average_cost``) to write in the same UPDATE. Must be called inside a
+    transaction. Returns the touched products keyed by id.
+    """
+    lines = list(lines)
+    if not lines:
+        return {}
+    if products is None:
+        products = lock_products(line.product_id for line in lines)
+
+    movements = []
+    touched = {}
+    for line in lines:
+        product = products[line.product_id]
+        previous_stock = product.stock
+        product.stock = previous_stock + line.quantity
+        touched[product.pk] = product
+        movements.append(StockMovement(
+            user_client=user_client,
+            product=product,
+            movement_type=movement_type,
+            quantity=line.quantity,
+            previous_stock=previous_stock,
+            new_stock=product.stock,
+            reference_number=line.reference_number,
+            reason=line.reason,
+            created_by=created_by or user_client,
+        ))
+
+    now = timezone.now()
+    for product in touched.values():
+        product.updated_at = now
+    Product.objects.bulk_update(list(touched.values()), ['stock', 'updated_at', *update_fields])
+    StockMovement.objects.bulk_create(movements)
+    # bulk_create skips post_save, so announce the movements here
+    for movement in movements:
+        publish_on_commit(user_client.pk, 'stock', movement.event_payload())
+    sync_stock_alerts(touched.values())
+    return touched
+
+
+def sync_stock_alerts(products):
+    """Raise missing LOW_STOCK / OUT_OF_STOCK alerts for the given products in one query pair."""
+    wanted = []
+    for product in products:
+        if product.is_low_stock:
+            wanted.append((product, 'LOW_STOCK'))
+        if product.is_out_of_stock:
+            wanted.append((product, 'OUT_OF_STOCK'))
+    if not wanted:
+        return []
+
+    existing = set(StockAlert.objects.filter(
+        product__in=[product for product, _ in wanted],
+        alert_type__in=['LOW_STOCK', 'OUT_OF_STOCK'],
+        is_active=True,
+    ).values_list('product_id', 'alert_type'))
+
+    alerts = []
+    for product, alert_type in wanted:
+        if (product.pk, alert_type) in existing:
+            continue
+        if alert_type == 'LOW_STOCK':
+            message = f"Product {product.name} is running low on stock. Current stock: {product.stock}, Minimum: {product.minQuantity}"
+        else:
+            message = f"Product {product.name} is out of stock!"
+        alerts.append(StockAlert(
+            user_client_id=product.user_client_id,
+            product=product,
+            alert_type=alert_type,
+            message=message,
+            is_active=True,
+        ))
+    alerts = StockAlert.objects.bulk_create(alerts)
+    for alert in alerts:
+        publish_on_commit(alert.user_client_id, 'alert', alert.event_payload())
+    return alerts
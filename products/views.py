@@ -2,61 +2,80 @@ from django.shortcuts import render
 from drf_yasg.utils import swagger_auto_schema
 
 # Create your views here.
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, mixins, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Sum, Q, Count
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Category, Unit, Product, StockMovement, StockAdjustment, StockAlert, Location, ProductLocationStock, StockTransfer
+from datetime import date, datetime, timedelta
+from .models import Category, Unit, Product, StockMovement, StockAdjustment, StockAlert, Location, ProductLocationStock, StockTransfer, PriceList
 from .serializers import (
     CategorySerializer, UnitSerializer, ProductSerializer, 
     StockMovementSerializer, StockAdjustmentSerializer, StockAlertSerializer,
-    ProductStockSummarySerializer, LocationSerializer, ProductLocationStockSerializer, StockTransferSerializer
+    ProductStockSummarySerializer, LocationSerializer, ProductLocationStockSerializer, StockTransferSerializer,
+    ProductImportSerializer, ProductReadSerializer, PriceListSerializer, PriceListCreateSerializer, PriceListItemSerializer,
 )
+from .product_import import import_products, read_product_rows, validate_rows
+from .pricing import create_price_list, price_feed
+from .snapshots import stock_as_of
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from sales.models import SalesDetail
+from AsiriaPOS.mixins import ExportMixin, SwaggerTagMixin
+from authentication.permissions import IsOwner, IsManager, IsEmployee
+from rest_framework.permissions import IsAuthenticated
+from registry.models import Supplier
+from drf_yasg import openapi
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client']
     search_fields = ['name', 'description']
 
-class UnitViewSet(viewsets.ModelViewSet):
+class UnitViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Unit.objects.all()
     serializer_class = UnitSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client']
     search_fields = ['unit_name', 'description']
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.select_related('category', 'unit')
     serializer_class = ProductSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client', 'category', 'unit']
     search_fields = ['name', 'sku', 'barcode', 'description']
 
+    def list(self, request, *args, **kwargs):
+        # Lists are read through ProductReadSerializer; ProductSerializer handles writes and detail
+        rows = ProductReadSerializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(ProductReadSerializer(page, many=True).data)
+        return Response(ProductReadSerializer(rows, many=True).data)
+
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
         """Get products with low stock"""
         from django.db import models
-        products = Product.objects.filter(stock__lte=models.F('minQuantity'))
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        products = ProductReadSerializer.rows(Product.objects.filter(stock__lte=models.F('minQuantity')))
+        return Response(ProductReadSerializer(products, many=True).data)
 
     @action(detail=False, methods=['get'])
     def out_of_stock(self, request):
         """Get products that are out of stock"""
-        products = Product.objects.filter(stock__lte=0)
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        products = ProductReadSerializer.rows(Product.objects.filter(stock__lte=0))
+        return Response(ProductReadSerializer(products, many=True).data)
 
     @action(detail=False, methods=['get'])
     def stock_summary(self, request):
         """Get stock summary with movement history"""
-        products = Product.objects.all()
+        products = Product.objects.select_related('category', 'unit')
         serializer = ProductStockSummarySerializer(products, many=True)
         return Response(serializer.data)
 
@@ -81,11 +100,63 @@ class ProductViewSet(viewsets.ModelViewSet):
             'items': items
         })
 
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('date', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True, description='Day to report on (YYYY-MM-DD)'),
+    ])
+    @action(detail=False, methods=['get'])
+    def stock_as_of(self, request):
+        """Stock and valuation at the end of ``date``, from the nearest daily snapshot plus the movements since"""
+        try:
+            day = date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({'detail': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        if day > timezone.localdate():
+            return Response({'detail': 'date must not be in the future'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stock_as_of(request.user.pk, day))
+
+    @swagger_auto_schema(request_body=ProductImportSerializer)
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """Create or update many products from a JSON list or an uploaded CSV/JSON file.
+
+        Rows are matched to the caller's products by SKU, then barcode. Categories and
+        units are given by name (missing ones are created unless create_missing=false),
+        and blank SKUs/barcodes are generated. The response has one result per row.
+        """
+        serializer = ProductImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        raw_rows = serializer.validated_data.get('products')
+        if raw_rows is None:
+            upload = serializer.validated_data['file']
+            try:
+                raw_rows = read_product_rows(upload, upload.name)
+            except (ValueError, KeyError, UnicodeDecodeError) as exc:
+                return Response({'detail': f'Could not read the file: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+            max_rows = ProductImportSerializer().fields['products'].max_length
+            if len(raw_rows) > max_rows:
+                return Response({'detail': f'At most {max_rows} products per import'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(raw_rows)
+        valid_positions, valid_rows, row_errors = validate_rows(raw_rows)
+        for position, errors in row_errors.items():
+            name = raw_rows[position].get('name') if isinstance(raw_rows[position], dict) else None
+            results[position] = {'row': position + 1, 'name': name, 'status': 'error', 'errors': errors}
+
+        imported = import_products(request.user, valid_rows, create_missing=serializer.validated_data['create_missing'])
+        for position, result in zip(valid_positions, imported):
+            results[position] = {**result, 'row': position + 1}
+
+        summary = {key: 0 for key in ('created', 'updated', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+        return Response({'summary': summary, 'results': results}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'])
     def stock_history(self, request, pk=None):
         """Get stock movement history for a specific product"""
         product = self.get_object()
-        movements = product.stock_movements.order_by('-created_at')
+        movements = product.stock_movements.select_related('product', 'created_by').order_by('-created_at')
         serializer = StockMovementSerializer(movements, many=True)
         return Response(serializer.data)
 
@@ -136,12 +207,10 @@ class ProductViewSet(viewsets.ModelViewSet):
         code = request.query_params.get('code')
         if not code:
             return Response({'detail': 'code is required'}, status=status.HTTP_400_BAD_REQUEST)
-        try:
-            product = Product.objects.get(Q(barcode=code) | Q(sku=code))
-        except Product.DoesNotExist:
+        product = ProductReadSerializer.rows(Product.objects.filter(Q(barcode=code) | Q(sku=code))).first()
+        if product is None:
             return Response({'detail': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = self.get_serializer(product)
-        return Response(serializer.data)
+        return Response(ProductReadSerializer(product).data)
 
     @action(detail=False, methods=['get'])
     def reorder_suggestions(self, request):
@@ -197,11 +266,17 @@ class ProductViewSet(viewsets.ModelViewSet):
             'suggestions': suggestions,
         })
 
-class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = StockMovement.objects.all()
+class StockMovementViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = StockMovement.objects.select_related('product', 'created_by')
     serializer_class = StockMovementSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['user_client', 'product', 'movement_type']
+    filterset_fields = {
+        'user_client': ['exact'],
+        'product': ['exact'],
+        'movement_type': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
     search_fields = ['reference_number', 'reason']
     ordering_fields = ['created_at', 'quantity']
     ordering = ['-created_at']
@@ -233,9 +308,10 @@ class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
         
         return Response(summary)
 
-class StockAdjustmentViewSet(viewsets.ModelViewSet):
-    queryset = StockAdjustment.objects.all()
+class StockAdjustmentViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = StockAdjustment.objects.select_related('product', 'created_by', 'approved_by')
     serializer_class = StockAdjustmentSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client', 'product', 'adjustment_type', 'is_approved']
     search_fields = ['reference_number', 'reason']
@@ -262,13 +338,14 @@ class StockAdjustmentViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending(self, request):
         """Get pending stock adjustments"""
-        adjustments = StockAdjustment.objects.filter(is_approved=False)
+        adjustments = self.get_queryset().filter(is_approved=False)
         serializer = self.get_serializer(adjustments, many=True)
         return Response(serializer.data)
 
-class StockAlertViewSet(viewsets.ModelViewSet):
-    queryset = StockAlert.objects.all()
+class StockAlertViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = StockAlert.objects.select_related('product', 'resolved_by')
     serializer_class = StockAlertSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client', 'product', 'alert_type', 'is_active']
     search_fields = ['message']
@@ -295,7 +372,7 @@ class StockAlertViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get active stock alerts"""
-        alerts = StockAlert.objects.filter(is_active=True)
+        alerts = self.get_queryset().filter(is_active=True)
         serializer = self.get_serializer(alerts, many=True)
         return Response(serializer.data)
 
@@ -317,23 +394,26 @@ class StockAlertViewSet(viewsets.ModelViewSet):
         
         return Response(summary)
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client']
     search_fields = ['name', 'code']
 
-class ProductLocationStockViewSet(viewsets.ModelViewSet):
+class ProductLocationStockViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = ProductLocationStock.objects.all()
     serializer_class = ProductLocationStockSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client', 'product', 'location']
     search_fields = []
 
-class StockTransferViewSet(viewsets.ModelViewSet):
+class StockTransferViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = StockTransfer.objects.all()
     serializer_class = StockTransferSerializer
+    query_budgets = {'list': 2}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['user_client', 'product', 'from_location', 'to_location']
 
@@ -342,3 +422,84 @@ class StockTransferViewSet(viewsets.ModelViewSet):
         transfer = self.get_object()
         transfer.apply()
         return Response(self.get_serializer(transfer).data)
+
+class PriceListViewSet(SwaggerTagMixin, mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Bulk price changes. A list is applied when created, or by ``manage.py apply_price_lists`` once its start time passes.
+
+    Tills keep the last price version they synced and call ``feed`` with it to
+    get only the prices that changed since.
+    """
+    serializer_class = PriceListSerializer
+    query_budgets = {'list': 4}
+    permission_classes = [IsAuthenticated, IsOwner | IsManager]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'change_type', 'category', 'supplier']
+    swagger_tag = "Price Lists"
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return PriceList.objects.none()
+        return PriceList.objects.filter(user_client=self.request.user)
+
+    def get_permissions(self):
+        # Every till reads the feed; only owners and managers change prices
+        if self.action == 'feed':
+            return [IsAuthenticated(), (IsOwner | IsManager | IsEmployee)()]
+        return super().get_permissions()
+
+    @swagger_auto_schema(request_body=PriceListCreateSerializer, responses={201: PriceListSerializer})
+    def create(self, request, *args, **kwargs):
+        serializer = PriceListCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        category = supplier = None
+        if data.get('category'):
+            category = Category.objects.filter(user_client=request.user, pk=data['category']).first()
+            if category is None:
+                return Response({'category': 'Category not found'}, status=status.HTTP_400_BAD_REQUEST)
+        if data.get('supplier'):
+            supplier = Supplier.objects.filter(user_client=request.user, pk=data['supplier']).first()
+            if supplier is None:
+                return Response({'supplier': 'Supplier not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+        price_list = create_price_list(
+            request.user,
+            data['name'],
+            data['change_type'],
+            data['value'],
+            category=category,
+            supplier=supplier,
+            product_ids=data.get('products'),
+            effective_from=data.get('effective_from'),
+            created_by=request.user,
+        )
+        return Response(PriceListSerializer(price_list).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a list that has not been applied yet"""
+        updated = PriceList.objects.filter(pk=self.get_object().pk, status='SCHEDULED').update(status='CANCELLED')
+        if not updated:
+            return Response({'error': 'Only scheduled price lists can be cancelled'}, status=status.HTTP_409_CONFLICT)
+        return Response(PriceListSerializer(self.get_object()).data)
+
+    @action(detail=True, methods=['get'])
+    def items(self, request, pk=None):
+        """Old and new price of each product in the list"""
+        items = self.get_object().items.select_related('product').order_by('product__name')
+        page = self.paginate_queryset(items)
+        if page is not None:
+            return self.get_paginated_response(PriceListItemSerializer(page, many=True).data)
+        return Response(PriceListItemSerializer(items, many=True).data)
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Last price version the till synced (default 0)'),
+    ])
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """Current price of every product changed by a list applied after version ``since``"""
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response({'detail': 'since must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(price_feed(request.user.pk, since))
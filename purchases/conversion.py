@@ -0,0 +1,98 @@
+import uuid
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from registry.models import PaymentOption
+from .line_diff import CENTS
+from .models import PurchaseHeader, PurchaseDetail, PurchaseOrderHeader, PurchaseOrderDetail
+
+
+def default_payment_option(user_client):
+    return (
+        PaymentOption.objects.filter(user_client=user_client, name__iexact='Cash').first()
+        or PaymentOption.objects.filter(user_client=user_client).first()
+    )
+
+
+def convert_purchase_orders(user_client, po_header_ids, payment_option, invoice_number=None):
+    """Convert a client's purchase orders into purchases. Must be called inside a transaction.
+
+    The orders are locked (in id order, so concurrent batches cannot deadlock)
+    and stay locked until the caller's transaction ends. However many orders
+    and lines there are, the work is one aggregate for the totals, one insert
+    of headers, one read and one insert of lines, and one update marking the
+    orders converted. ``invoice_number`` is only used when converting a single
+    order; otherwise each purchase gets a generated one.
+
+    Returns one result per requested id, in request order, with ``status``
+    ``converted``, ``already_converted`` or ``not_found``.
+    """
+    orders = {
+        order.pk: order
+        for order in PurchaseOrderHeader.objects.select_for_update()
+        .filter(user_client=user_client, pk__in=set(po_header_ids)).order_by('pk')
+    }
+    to_convert = [order for order in orders.values() if not order.converted_purchase_id]
+
+    purchases = {}
+    if to_convert:
+        amount = ExpressionWrapper(F('quantity') * F('price_per_unit'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        totals = dict(
+            PurchaseOrderDetail.objects.filter(po_header__in=to_convert)
+            .values('po_header').annotate(total=Sum(amount)).values_list('po_header', 'total')
+        )
+        for order in to_convert:
+            total = (totals.get(order.pk) or Decimal('0')).quantize(CENTS)
+            purchases[order.pk] = PurchaseHeader(
+                user_client=user_client,
+                supplier_id=order.supplier_id,
+                payment_option=payment_option,
+                order_number=f"PU-{uuid.uuid4().hex[:8].upper()}",
+                invoice_number=(len(to_convert) == 1 and invoice_number) or f"INV-{uuid.uuid4().hex[:8].upper()}",
+                subtotal=total,
+                total_cost=total,
+                remaining_balance=total,
+            )
+        PurchaseHeader.objects.bulk_create(purchases.values())
+
+        lines = (
+            PurchaseOrderDetail.objects.filter(po_header__in=to_convert)
+            .order_by('created_at')
+            .values('po_header', 'po_detail_id', 'product', 'unit', 'quantity', 'price_per_unit')
+        )
+        PurchaseDetail.objects.bulk_create([
+            PurchaseDetail(
+                purchase_header=purchases[line['po_header']],
+                po_detail_id=line['po_detail_id'],
+                user_client=user_client,
+                product_id=line['product'],
+                unit_id=line['unit'],
+                quantity=line['quantity'],
+                price_per_unit=line['price_per_unit'],
+                discount=0,
+            )
+            for line in lines
+        ], batch_size=1000)
+
+        for order in to_convert:
+            order.converted_purchase = purchases[order.pk]
+        PurchaseOrderHeader.objects.bulk_update(to_convert, ['converted_purchase'])
+
+    results = []
+    for po_header_id in po_header_ids:
+        order = orders.get(po_header_id)
+        if order is None:
+            results.append({'po_header_id': str(po_header_id), 'status': 'not_found'})
+        elif order.pk not in purchases:
+            results.append({'po_header_id': str(po_header_id), 'status': 'already_converted', 'purchase_header_id': str(order.converted_purchase_id)})
+        else:
+            purchase = purchases[order.pk]
+            results.append({
+                'po_header_id': str(po_header_id),
+                'status': 'converted',
+                'purchase_header_id': str(purchase.purchase_header_id),
+                'order_number': purchase.order_number,
+                'invoice_number': purchase.invoice_number,
+            })
+    return results
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from products.cost_layers import CostLine, add_layers
+from products.stock_ledger import StockLine, apply_stock_movements, lock_products
+from .line_diff import CENTS
+from .models import GRNDetail, PurchaseDetail, PurchaseOrderDetail
+
+
+def weighted_average_costs(products, lines):
+    """New ``average_cost`` per product id after receiving ``lines`` of ``GRNDetail``.
+
+    Lines are grouped per product first, so receiving a product on several
+    lines gives the same cost as receiving them one after the other (the
+    per-line ``increase_product_stock_on_grn`` signal's formula). Stock on hand
+    is valued at its average cost, or at ``cost`` while there is none.
+    """
+    incoming = defaultdict(lambda: [0, Decimal('0')])
+    for line in lines:
+        totals = incoming[line.product_id]
+        totals[0] += line.quantity
+        totals[1] += line.quantity * Decimal(line.price_per_unit)
+
+    costs = {}
+    for product_id, (quantity, value) in incoming.items():
+        product = products[product_id]
+        current_cost = Decimal(product.average_cost or product.cost)
+        on_hand_value = product.stock * current_cost
+        costs[product_id] = ((on_hand_value + value) / max(product.stock + quantity, 1)).quantize(CENTS, rounding=ROUND_HALF_UP)
+    return costs
+
+
+def post_grn_lines(grn_header, lines):
+    """Receive unsaved ``GRNDetail`` lines into ``grn_header``: save them, add stock and update average costs.
+
+    The set-based counterpart of creating the lines one by one. The products
+    are locked and read once, and the new costs are worked out together. There
+    is one insert of lines, one UPDATE of the products' stock and cost, and one
+    insert of PURCHASE movements (one per line, as the signal writes), plus
+    one insert of a FIFO cost layer per line. Lines with a ``purchase_detail``
+    are added to its received counters. Must be called inside a transaction.
+    """
+    lines = list(lines)
+    if not lines:
+        return []
+    products = lock_products(line.product_id for line in lines)
+    for product_id, cost in weighted_average_costs(products, lines).items():
+        products[product_id].average_cost = cost
+
+    # bulk_create skips increase_product_stock_on_grn; the stock ledger below does its work
+    lines = GRNDetail.objects.bulk_create(lines)
+    reason = f"GRN from {grn_header.supplier.name}"
+    apply_stock_movements(
+        grn_header.user_client,
+        'PURCHASE',
+        [StockLine(line.product_id, line.quantity, grn_header.grn_number, reason) for line in lines],
+        products=products,
+        update_fields=['average_cost'],
+    )
+    add_layers(grn_header.user_client, [
+        CostLine(line.product_id, line.quantity, line.price_per_unit, grn_header.grn_number, line.pk) for line in lines
+    ])
+    received = defaultdict(int)
+    for line in lines:
+        if line.purchase_detail_id:
+            received[line.purchase_detail_id] += line.quantity
+    record_receipts(received)
+    return lines
+
+
+def record_receipts(quantities):
+    """Add received quantities to purchase lines and the order lines they were converted from.
+
+    ``quantities`` maps ``purchase_detail_id`` to the quantity received, or a
+    negative quantity to take a receipt back; counters never go below zero.
+    The purchase lines and then the order lines are locked and read once each
+    and written with one ``bulk_update`` each. Must be called inside a
+    transaction.
+    """
+    quantities = {line_id: quantity for line_id, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    lines = list(
+        PurchaseDetail.objects.select_for_update().filter(pk__in=quantities)
+        .order_by('pk').only('pk', 'po_detail', 'received_quantity')
+    )
+    order_quantities = defaultdict(int)
+    for line in lines:
+        line.received_quantity = max(line.received_quantity + quantities[line.pk], 0)
+        if line.po_detail_id:
+            order_quantities[line.po_detail_id] += quantities[line.pk]
+    PurchaseDetail.objects.bulk_update(lines, ['received_quantity'])
+
+    if order_quantities:
+        order_lines = list(
+            PurchaseOrderDetail.objects.select_for_update().filter(pk__in=order_quantities)
+            .order_by('pk').only('pk', 'received_quantity')
+        )
+        for line in order_lines:
+            line.received_quantity = max(line.received_quantity + order_quantities[line.pk], 0)
+        PurchaseOrderDetail.objects.bulk_update(order_lines, ['received_quantity'])
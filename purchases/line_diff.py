@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+from products.models import Product, Unit
+
+CENTS = Decimal('0.01')
+
+
+class LineChangeError(ValueError):
+    """The submitted lines cannot be applied; ``errors`` lists every problem found."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def apply_line_changes(header, items, model, header_field, id_field, fields, user_client):
+    """Apply a full-update ``details`` payload to a header's lines with set-based writes.
+
+    Each item deletes a line (``delete`` with its id), updates one (its id) or
+    adds one (no id; ``product_id`` and ``unit_id`` required). Every line,
+    product and unit the payload refers to is fetched up front, and all of it is
+    validated before anything is written; a bad payload raises
+    ``LineChangeError``. The changes are then one ``DELETE ... IN``, one
+    ``bulk_update`` and one ``bulk_create``. ``fields`` are the value fields
+    copied from each item. Line ids that do not belong to ``header`` are
+    ignored for deletes and rejected for updates.
+    """
+    deletes = {item[id_field] for item in items if item.get('delete') and item.get(id_field)}
+    changes = [item for item in items if not item.get('delete')]
+    update_ids = [item[id_field] for item in changes if item.get(id_field)]
+
+    lines = model.objects.filter(**{header_field: header}).in_bulk(deletes | set(update_ids))
+    products = Product.objects.filter(user_client=user_client).in_bulk(
+        {item['product_id'] for item in changes if item.get('product_id')}
+    )
+    units = Unit.objects.in_bulk({item['unit_id'] for item in changes if item.get('unit_id')})
+
+    label = model._meta.verbose_name.capitalize()
+    errors = []
+    for line_id in update_ids:
+        if line_id not in lines:
+            errors.append(f"{label} not found: {line_id}")
+        elif line_id in deletes:
+            errors.append(f"{label} is both updated and deleted: {line_id}")
+    if len(set(update_ids)) < len(update_ids):
+        errors.append(f"{label} updated more than once")
+    for item in changes:
+        if item.get('product_id') and item['product_id'] not in products:
+            errors.append(f"Invalid product_id: {item['product_id']}")
+        if item.get('unit_id') and item['unit_id'] not in units:
+            errors.append(f"Invalid unit_id: {item['unit_id']}")
+        if not item.get(id_field) and not (item.get('product_id') and item.get('unit_id')):
+            errors.append('product_id and unit_id required for new detail')
+    if errors:
+        raise LineChangeError(list(dict.fromkeys(errors)))
+
+    now = timezone.now()
+    updated, created = [], []
+    for item in changes:
+        values = {field: item[field] for field in fields if field in item}
+        if item.get('product_id'):
+            values['product'] = products[item['product_id']]
+        if item.get('unit_id'):
+            values['unit'] = units[item['unit_id']]
+        if item.get(id_field):
+            line = lines[item[id_field]]
+            for field, value in values.items():
+                setattr(line, field, value)
+            # bulk_update skips auto_now
+            line.updated_at = now
+            updated.append(line)
+        else:
+            created.append(model(user_client=user_client, **{header_field: header}, **values))
+
+    if deletes:
+        model.objects.filter(**{header_field: header}, pk__in=deletes).delete()
+    if updated:
+        model.objects.bulk_update(updated, [*fields, 'product', 'unit', 'updated_at'])
+    if created:
+        model.objects.bulk_create(created)
+
+
+def lines_total(queryset, discount_field=None):
+    """Sum of ``quantity * price_per_unit`` (less ``discount_field``) over the lines, as a Decimal, in one query."""
+    amount = F('quantity') * F('price_per_unit')
+    if discount_field:
+        amount = amount - F(discount_field)
+    total = queryset.aggregate(
+        total=Sum(ExpressionWrapper(amount, output_field=DecimalField(max_digits=14, decimal_places=2)))
+    )['total']
+    return (total or Decimal('0')).quantize(CENTS)
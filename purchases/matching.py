@@ -0,0 +1,127 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, Sum
+
+from .line_diff import CENTS
+from .models import PurchaseDetail, PurchaseOrderDetail
+
+OUTSTANDING_FIELDS = (
+    'po_detail_id', 'po_header_id', 'po_header__order_number', 'po_header__expected_date',
+    'po_header__supplier_id', 'po_header__supplier__name', 'product_id', 'product__name', 'unit_id',
+    'quantity', 'received_quantity', 'outstanding_quantity', 'price_per_unit',
+)
+
+
+def outstanding_order_lines(user_client, supplier_id=None):
+    """A client's purchase order lines that have not been fully received, oldest order first.
+
+    Read straight from the lines' ``received_quantity`` counters, so no GRN
+    history is aggregated. Each row is annotated with ``outstanding_quantity``.
+    """
+    queryset = PurchaseOrderDetail.objects.filter(user_client=user_client, received_quantity__lt=F('quantity'))
+    if supplier_id:
+        queryset = queryset.filter(po_header__supplier_id=supplier_id)
+    return queryset.annotate(
+        outstanding_quantity=ExpressionWrapper(F('quantity') - F('received_quantity'), output_field=IntegerField()),
+    ).order_by('po_header__created_at', 'created_at', 'pk')
+
+
+def outstanding_totals(queryset):
+    """Line count, units and value still outstanding over ``outstanding_order_lines`` rows, in one query."""
+    value = ExpressionWrapper(F('outstanding_quantity') * F('price_per_unit'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    totals = queryset.order_by().aggregate(lines=Count('pk'), quantity=Sum('outstanding_quantity'), value=Sum(value))
+    return {
+        'lines': totals['lines'],
+        'outstanding_quantity': totals['quantity'] or 0,
+        'outstanding_value': (totals['value'] or Decimal('0')).quantize(CENTS),
+    }
+
+
+def _line_status(ordered, invoiced, received, order_price, invoice_prices):
+    if invoiced is None:
+        return 'not_invoiced'
+    if received > ordered:
+        return 'over_received'
+    if invoiced != ordered:
+        return 'quantity_mismatch'
+    if any(price != order_price for price in invoice_prices):
+        return 'price_mismatch'
+    if received < ordered:
+        return 'outstanding'
+    return 'matched'
+
+
+def three_way_match(order):
+    """Match a purchase order's lines against its purchase (the invoice) and the GRNs received on it.
+
+    Quantities received come from the order lines' counters. Each order line
+    gets a ``status``: ``not_invoiced`` (the order is not converted yet, or the
+    line was removed from the purchase), ``over_received``,
+    ``quantity_mismatch`` (invoiced differs from ordered), ``price_mismatch``,
+    ``outstanding`` (not all received yet) or ``matched``. Purchase lines
+    added after conversion come last as ``not_ordered``. Two queries.
+    """
+    order_lines = order.po_details.order_by('created_at').values(
+        'po_detail_id', 'product_id', 'product__name', 'unit_id', 'quantity', 'price_per_unit', 'received_quantity',
+    )
+    invoiced = defaultdict(lambda: {'quantity': 0, 'prices': set()})
+    invoice_only = []
+    if order.converted_purchase_id:
+        invoice_lines = PurchaseDetail.objects.filter(purchase_header_id=order.converted_purchase_id).order_by('created_at').values(
+            'purchase_detail_id', 'po_detail_id', 'product_id', 'product__name', 'unit_id',
+            'quantity', 'price_per_unit', 'received_quantity',
+        )
+        for line in invoice_lines:
+            if line['po_detail_id'] is None:
+                invoice_only.append(line)
+                continue
+            invoiced[line['po_detail_id']]['quantity'] += line['quantity']
+            invoiced[line['po_detail_id']]['prices'].add(line['price_per_unit'])
+
+    rows = []
+    for line in order_lines:
+        invoice = invoiced.get(line['po_detail_id'])
+        rows.append({
+            'po_detail_id': line['po_detail_id'],
+            'product_id': line['product_id'],
+            'product_name': line['product__name'],
+            'unit_id': line['unit_id'],
+            'ordered_quantity': line['quantity'],
+            'invoiced_quantity': invoice['quantity'] if invoice else 0,
+            'received_quantity': line['received_quantity'],
+            'outstanding_quantity': max(line['quantity'] - line['received_quantity'], 0),
+            'order_price': line['price_per_unit'],
+            'invoice_prices': sorted(invoice['prices']) if invoice else [],
+            'status': _line_status(
+                line['quantity'], invoice and invoice['quantity'], line['received_quantity'],
+                line['price_per_unit'], invoice['prices'] if invoice else (),
+            ),
+        })
+    for line in invoice_only:
+        rows.append({
+            'po_detail_id': None,
+            'purchase_detail_id': line['purchase_detail_id'],
+            'product_id': line['product_id'],
+            'product_name': line['product__name'],
+            'unit_id': line['unit_id'],
+            'ordered_quantity': 0,
+            'invoiced_quantity': line['quantity'],
+            'received_quantity': line['received_quantity'],
+            'outstanding_quantity': max(line['quantity'] - line['received_quantity'], 0),
+            'order_price': None,
+            'invoice_prices': [line['price_per_unit']],
+            'status': 'not_ordered',
+        })
+
+    return {
+        'po_header_id': order.po_header_id,
+        'order_number': order.order_number,
+        'purchase_header_id': order.converted_purchase_id,
+        'matched': all(row['status'] == 'matched' for row in rows),
+        'ordered_quantity': sum(row['ordered_quantity'] for row in rows),
+        'invoiced_quantity': sum(row['invoiced_quantity'] for row in rows),
+        'received_quantity': sum(row['received_quantity'] for row in rows),
+        'outstanding_quantity': sum(row['outstanding_quantity'] for row in rows),
+        'lines': rows,
+    }
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:36
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def link_existing_lines(apps, schema_editor):
+    """Link existing lines to the lines they were copied from and fill in the received counters.
+
+    Conversion and GRN generation copied lines without keeping a reference, so
+    purchase lines are matched to the order lines of the PO converted into
+    their purchase, and GRN lines to the lines of their GRN's purchase, on
+    product and unit, in creation order. GRN lines fill the matching purchase
+    lines in turn, each up to its quantity; anything received beyond them all
+    goes to the last one.
+    """
+    PurchaseOrderDetail = apps.get_model('purchases', 'PurchaseOrderDetail')
+    PurchaseDetail = apps.get_model('purchases', 'PurchaseDetail')
+    GRNDetail = apps.get_model('purchases', 'GRNDetail')
+
+    order_lines = defaultdict(list)
+    for pk, purchase_header_id, product_id, unit_id in (
+        PurchaseOrderDetail.objects.filter(po_header__converted_purchase__isnull=False)
+        .order_by('created_at').values_list('pk', 'po_header__converted_purchase', 'product', 'unit')
+    ):
+        order_lines[purchase_header_id, product_id, unit_id].append(pk)
+    purchase_lines = defaultdict(list)
+    linked = []
+    for line in PurchaseDetail.objects.order_by('created_at').only('pk', 'purchase_header', 'product', 'unit', 'quantity').iterator():
+        key = (line.purchase_header_id, line.product_id, line.unit_id)
+        purchase_lines[key].append([line.pk, line.quantity])
+        if order_lines.get(key):
+            line.po_detail_id = order_lines[key].pop(0)
+            linked.append(line)
+    PurchaseDetail.objects.bulk_update(linked, ['po_detail'], batch_size=BATCH_SIZE)
+
+    linked = []
+    for line in GRNDetail.objects.order_by('created_at').only('pk', 'grn_header__purchase_header', 'product', 'unit', 'quantity').select_related('grn_header').iterator():
+        candidates = purchase_lines.get((line.grn_header.purchase_header_id, line.product_id, line.unit_id))
+        if candidates:
+            while len(candidates) > 1 and candidates[0][1] <= 0:
+                candidates.pop(0)
+            line.purchase_detail_id, outstanding = candidates[0]
+            candidates[0][1] = outstanding - line.quantity
+            linked.append(line)
+    GRNDetail.objects.bulk_update(linked, ['purchase_detail'], batch_size=BATCH_SIZE)
+
+    received = GRNDetail.objects.filter(purchase_detail__isnull=False).values('purchase_detail').annotate(total=Sum('quantity'))
+    lines = [PurchaseDetail(pk=row['purchase_detail'], received_quantity=row['total']) for row in received]
+    PurchaseDetail.objects.bulk_update(lines, ['received_quantity'], batch_size=BATCH_SIZE)
+    received = PurchaseDetail.objects.filter(po_detail__isnull=False).values('po_detail').annotate(total=Sum('received_quantity'))
+    lines = [PurchaseOrderDetail(pk=row['po_detail'], received_quantity=row['total']) for row in received]
+    PurchaseOrderDetail.objects.bulk_update(lines, ['received_quantity'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0010_merge_20251205_1520'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grndetail',
+            name='purchase_detail',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='grn_details', to='purchases.purchasedetail'),
+        ),
+        migrations.AddField(
+            model_name='purchasedetail',
+            name='po_detail',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_details', to='purchases.purchaseorderdetail'),
+        ),
+        migrations.AddField(
+            model_name='purchasedetail',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchaseorderdetail',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(link_existing_lines, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from products.cost_layers import CostLine, add_layers
 from products.models import Product, Unit, StockMovement
 from users.models import UserClient
 from registry.models import Supplier, PaymentOption
@@ -41,7 +42,10 @@ class PurchaseDetail(models.Model):
     purchase_header = models.ForeignKey(PurchaseHeader, on_delete=models.CASCADE, related_name='purchase_details')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='purchase_details')
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='purchase_details')
+    po_detail = models.ForeignKey('PurchaseOrderDetail', on_delete=models.SET_NULL, null=True, blank=True, related_name='purchase_details')
     quantity = models.PositiveIntegerField()
+    # Total received on GRNs so far, kept up to date as GRN lines are posted and deleted
+    received_quantity = models.PositiveIntegerField(default=0)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -93,6 +97,8 @@ class PurchaseOrderDetail(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='po_details')
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='po_details')
     quantity = models.PositiveIntegerField()
+    # Total received against the purchase lines converted from this one
+    received_quantity = models.PositiveIntegerField(default=0)
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -119,6 +125,7 @@ class GRNDetail(models.Model):
     grn_detail_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
     user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='grn_details')
     grn_header = models.ForeignKey(GRNHeader, on_delete=models.CASCADE, related_name='grn_details')
+    purchase_detail = models.ForeignKey(PurchaseDetail, on_delete=models.SET_NULL, null=True, blank=True, related_name='grn_details')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='grn_details')
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='grn_details')
     quantity = models.PositiveIntegerField()
@@ -208,6 +215,13 @@ def increase_product_stock_on_grn(sender, instance, created, **kwargs):
             reason=f"GRN from {instance.grn_header.supplier.name}",
             created_by=instance.user_client
         )
+        add_layers(instance.user_client, [CostLine(
+            product.pk, instance.quantity, instance.price_per_unit, instance.grn_header.grn_number, instance.pk,
+        )])
+        if instance.purchase_detail_id:
+            from .grn_posting import record_receipts
+            with transaction.atomic():
+                record_receipts({instance.purchase_detail_id: instance.quantity})
 
 @receiver(post_delete, sender=GRNDetail)
 def decrease_product_stock_on_grn_delete(sender, instance, **kwargs):
@@ -226,3 +240,7 @@ def decrease_product_stock_on_grn_delete(sender, instance, **kwargs):
         reason="GRN detail deleted - stock reversal",
         created_by=instance.user_client
     )
+    if instance.purchase_detail_id:
+        from .grn_posting import record_receipts
+        with transaction.atomic():
+            record_receipts({instance.purchase_detail_id: -instance.quantity})
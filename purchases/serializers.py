@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import PurchaseHeader, PurchaseDetail, Payment, PurchaseOrderHeader, PurchaseOrderDetail, GRNHeader, GRNDetail
 from registry.models import Supplier, PaymentOption
@@ -23,8 +24,24 @@ class PurchaseOrderConvertSerializer(serializers.Serializer):
     invoice_number = serializers.CharField(required=False, allow_blank=True)
 
 
+class PurchaseOrderBatchConvertSerializer(serializers.Serializer):
+    po_header_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'PO_CONVERT_BATCH_MAX_SIZE', 500),
+    )
+    payment_option_id = serializers.UUIDField(required=False)
+
+
+class GRNLineSerializer(serializers.Serializer):
+    purchase_detail_id = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
 class GenerateGRNSerializer(serializers.Serializer):
     grn_number = serializers.CharField(required=True)
+    # Receive only these quantities; without lines, everything still outstanding is received
+    lines = GRNLineSerializer(many=True, required=False, allow_empty=False)
     
 class PurchaseHeaderSerializer(serializers.ModelSerializer):
     supplier_name = serializers.SerializerMethodField()
@@ -41,6 +58,8 @@ class PurchaseDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = PurchaseDetail
         fields = '__all__'
+        # Kept up to date by conversion and GRN posting
+        read_only_fields = ('po_detail', 'received_quantity')
 
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -62,6 +81,8 @@ class PurchaseOrderDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = PurchaseOrderDetail
         fields = '__all__'
+        # Kept up to date by GRN posting
+        read_only_fields = ('received_quantity',)
 
 class GRNHeaderSerializer(serializers.ModelSerializer):
     class Meta:
@@ -134,11 +155,24 @@ class PurchaseFullUpdateDetailSerializer(serializers.Serializer):
     purchase_detail_id = serializers.UUIDField(required=False)
     product_id = serializers.UUIDField(required=False)
     unit_id = serializers.UUIDField(required=False)
-    quantity = serializers.IntegerField(min_value=1)
-    price_per_unit = serializers.DecimalField(max_digits=12, decimal_places=2)
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    price_per_unit = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
     discount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=0)
     delete = serializers.BooleanField(required=False, default=False)
 
+    def validate(self, data):
+        if data.get('delete'):
+            # Only purchase_detail_id is required for delete
+            if not data.get('purchase_detail_id'):
+                raise serializers.ValidationError({'purchase_detail_id': 'This field is required for deletion.'})
+            return data
+        # For non-delete, require quantity and price_per_unit
+        if 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': ['This field is required.']})
+        if 'price_per_unit' not in data:
+            raise serializers.ValidationError({'price_per_unit': ['This field is required.']})
+        return data
+
 class PurchaseFullUpdateSerializer(serializers.Serializer):
     payment_option_id = serializers.UUIDField(required=False)
     invoice_number = serializers.CharField(required=False, allow_blank=True)
@@ -9,10 +9,14 @@ from rest_framework import status
 from rest_framework.views import APIView
 from django.db import transaction
 from .models import PurchaseHeader, PurchaseDetail, Payment, PurchaseOrderHeader, PurchaseOrderDetail, GRNHeader, GRNDetail
+from .conversion import convert_purchase_orders, default_payment_option
+from .grn_posting import post_grn_lines
+from .line_diff import LineChangeError, apply_line_changes, lines_total
+from .matching import OUTSTANDING_FIELDS, outstanding_order_lines, outstanding_totals, three_way_match
 from .serializers import (
     PurchaseHeaderSerializer, PurchaseDetailSerializer, PaymentSerializer,
     PurchaseOrderHeaderSerializer, PurchaseOrderDetailSerializer, GRNHeaderSerializer, GRNDetailSerializer,
-    PurchaseOrderCreateSerializer, PurchaseOrderConvertSerializer, GenerateGRNSerializer,
+    PurchaseOrderCreateSerializer, PurchaseOrderConvertSerializer, PurchaseOrderBatchConvertSerializer, GenerateGRNSerializer,
     PurchaseOrderHeaderFullSerializer, PurchaseHeaderFullSerializer,
     PurchaseOrderFullUpdateSerializer, PurchaseFullUpdateSerializer
 )
@@ -20,14 +24,24 @@ from registry.models import Supplier, PaymentOption
 from products.models import Product, Unit
 from users.models import UserClient
 import uuid
+from collections import defaultdict
 from Domain.models import AuditLog
 from authentication.permissions import IsOwner, IsManager, IsEmployee
 from rest_framework.permissions import IsAuthenticated
+from django_filters.rest_framework import DjangoFilterBackend
+from AsiriaPOS.mixins import ExportMixin
 
 @swagger_auto_schema(tags=["Purchases"]) 
-class PurchaseHeaderViewSet(viewsets.ModelViewSet):
-    queryset = PurchaseHeader.objects.all()
+class PurchaseHeaderViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = PurchaseHeader.objects.select_related('supplier')
     serializer_class = PurchaseHeaderSerializer
+    query_budgets = {'list': 3}
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'user_client': ['exact'],
+        'supplier': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -44,19 +58,22 @@ class PurchaseHeaderViewSet(viewsets.ModelViewSet):
         return response
     permission_classes = [IsAuthenticated, IsManager]  # Allow all roles to access this view
 
-class PurchaseDetailViewSet(viewsets.ModelViewSet):
+class PurchaseDetailViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = PurchaseDetail.objects.all()
     serializer_class = PurchaseDetailSerializer
+    query_budgets = {'list': 3}
     permission_classes = [IsAuthenticated, IsManager]  # Allow all roles to access this view
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    query_budgets = {'list': 2}
 
 @swagger_auto_schema(tags=["Purchase Orders"]) 
-class PurchaseOrderHeaderViewSet(viewsets.ModelViewSet):
-    queryset = PurchaseOrderHeader.objects.all()
+class PurchaseOrderHeaderViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = PurchaseOrderHeader.objects.select_related('supplier')
     serializer_class = PurchaseOrderHeaderSerializer
+    query_budgets = {'list': 2}
 
     def perform_create(self, serializer):
         instance = serializer.save()
@@ -85,9 +102,10 @@ class PurchaseOrderHeaderViewSet(viewsets.ModelViewSet):
         return response
 
 @swagger_auto_schema(tags=["Purchase Orders"]) 
-class PurchaseOrderDetailViewSet(viewsets.ModelViewSet):
+class PurchaseOrderDetailViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = PurchaseOrderDetail.objects.all()
     serializer_class = PurchaseOrderDetailSerializer
+    query_budgets = {'list': 2}
 
 
 class PurchaseOrderCreateAPIView(APIView):
@@ -106,7 +124,22 @@ class PurchaseOrderCreateAPIView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         data = serializer.validated_data
         user_client: UserClient = request.user
-        supplier = Supplier.objects.get(pk=data['supplier_id'])
+        supplier = Supplier.objects.filter(user_client=user_client, pk=data['supplier_id']).first()
+        if supplier is None:
+            return Response({'error': 'Invalid supplier_id'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Resolve every line's product and unit in two queries, whatever the number of lines
+        items = data['items']
+        products = Product.objects.filter(user_client=user_client).in_bulk({item['product_id'] for item in items})
+        units = Unit.objects.in_bulk({item['unit_id'] for item in items})
+        errors = []
+        for item in items:
+            if item['product_id'] not in products:
+                errors.append(f"Invalid product_id: {item['product_id']}")
+            if item['unit_id'] not in units:
+                errors.append(f"Invalid unit_id: {item['unit_id']}")
+        if errors:
+            return Response({'error': 'Unknown products or units', 'items': list(dict.fromkeys(errors))}, status=status.HTTP_400_BAD_REQUEST)
 
         order_number = f"PO-{uuid.uuid4().hex[:8].upper()}"
         po_header = PurchaseOrderHeader.objects.create(
@@ -117,17 +150,17 @@ class PurchaseOrderCreateAPIView(APIView):
             notes=data.get('notes') or ''
         )
 
-        for item in data['items']:
-            product = Product.objects.get(pk=item['product_id'])
-            unit = Unit.objects.get(pk=item['unit_id'])
-            PurchaseOrderDetail.objects.create(
+        PurchaseOrderDetail.objects.bulk_create([
+            PurchaseOrderDetail(
                 user_client=user_client,
                 po_header=po_header,
-                product=product,
-                unit=unit,
+                product=products[item['product_id']],
+                unit=units[item['unit_id']],
                 quantity=item['quantity'],
                 price_per_unit=item['price_per_unit'],
             )
+            for item in items
+        ], batch_size=1000)
 
         return Response({
             'po_header_id': str(po_header.po_header_id),
@@ -145,7 +178,7 @@ class PurchaseOrderRetrieveHeaderAPIView(APIView):
     )
     def get(self, request, po_header_id):
         try:
-            po = PurchaseOrderHeader.objects.get(pk=po_header_id)
+            po = PurchaseOrderHeader.objects.select_related('supplier').get(pk=po_header_id)
         except PurchaseOrderHeader.DoesNotExist:
             return Response({'error': 'PO not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response(PurchaseOrderHeaderSerializer(po).data, status=status.HTTP_200_OK)
@@ -161,7 +194,7 @@ class PurchaseOrderRetrieveFullAPIView(APIView):
     )
     def get(self, request, po_header_id):
         try:
-            po = PurchaseOrderHeader.objects.get(pk=po_header_id)
+            po = PurchaseOrderHeader.objects.select_related('supplier').get(pk=po_header_id)
         except PurchaseOrderHeader.DoesNotExist:
             return Response({'error': 'PO not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response(PurchaseOrderHeaderFullSerializer(po).data, status=status.HTTP_200_OK)
@@ -192,39 +225,14 @@ class PurchaseOrderRetrieveFullAPIView(APIView):
         po.save()
 
         user_client: UserClient = request.user
-        # Process detail operations
-        for item in data.get('details', []):
-            if item.get('delete'):
-                # Delete by id
-                if item.get('po_detail_id'):
-                    PurchaseOrderDetail.objects.filter(pk=item['po_detail_id'], po_header=po).delete()
-                continue
-            # Upsert: by id if provided, else create
-            if item.get('po_detail_id'):
-                try:
-                    pod = PurchaseOrderDetail.objects.get(pk=item['po_detail_id'], po_header=po)
-                except PurchaseOrderDetail.DoesNotExist:
-                    return Response({'error': f"PO detail not found: {item['po_detail_id']}"}, status=status.HTTP_400_BAD_REQUEST)
-                if item.get('product_id'):
-                    pod.product = Product.objects.get(pk=item['product_id'])
-                if item.get('unit_id'):
-                    pod.unit = Unit.objects.get(pk=item['unit_id'])
-                pod.quantity = item['quantity']
-                pod.price_per_unit = item['price_per_unit']
-                pod.save()
-            else:
-                product = Product.objects.get(pk=item['product_id']) if item.get('product_id') else None
-                unit = Unit.objects.get(pk=item['unit_id']) if item.get('unit_id') else None
-                if not product or not unit:
-                    return Response({'error': 'product_id and unit_id required for new detail'}, status=status.HTTP_400_BAD_REQUEST)
-                PurchaseOrderDetail.objects.create(
-                    user_client=user_client,
-                    po_header=po,
-                    product=product,
-                    unit=unit,
-                    quantity=item['quantity'],
-                    price_per_unit=item['price_per_unit'],
-                )
+        try:
+            apply_line_changes(
+                po, data.get('details', []), model=PurchaseOrderDetail, header_field='po_header',
+                id_field='po_detail_id', fields=['quantity', 'price_per_unit'], user_client=user_client,
+            )
+        except LineChangeError as exc:
+            transaction.set_rollback(True)
+            return Response({'error': 'Invalid details', 'details': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(PurchaseOrderHeaderFullSerializer(po).data, status=status.HTTP_200_OK)
 
@@ -245,70 +253,68 @@ class PurchaseOrderConvertAPIView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         data = serializer.validated_data
 
-        try:
-            with transaction.atomic():
-                po = PurchaseOrderHeader.objects.select_for_update().get(pk=po_header_id)
-                # Prevent duplicate conversions
-                if po.converted_purchase_id:
-                    return Response(
-                        {
-                            'error': 'PO already converted',
-                            'purchase_header_id': str(po.converted_purchase_id),
-                        },
-                        status=status.HTTP_409_CONFLICT,
-                    )
-        except PurchaseOrderHeader.DoesNotExist:
-            return Response({'error': 'PO not found'}, status=status.HTTP_404_NOT_FOUND)
-
         user_client: UserClient = request.user
-        payment_option = None
         if data.get('payment_option_id'):
             try:
                 payment_option = PaymentOption.objects.get(pk=data['payment_option_id'])
             except PaymentOption.DoesNotExist:
                 return Response({'error': 'Invalid payment_option_id'}, status=status.HTTP_400_BAD_REQUEST)
         else:
-            payment_option = PaymentOption.objects.filter(user_client=user_client, name__iexact='Cash').first() or PaymentOption.objects.filter(user_client=user_client).first()
+            payment_option = default_payment_option(user_client)
 
-        subtotal = 0
-        for d in po.po_details.all():
-            subtotal += float(d.quantity) * float(d.price_per_unit)
-        total_cost = subtotal
-        remaining_balance = total_cost
+        # The PO stays locked until this request's transaction commits
+        result, = convert_purchase_orders(user_client, [po_header_id], payment_option, data.get('invoice_number'))
+        if result['status'] == 'not_found':
+            return Response({'error': 'PO not found'}, status=status.HTTP_404_NOT_FOUND)
+        if result['status'] == 'already_converted':
+            # Prevent duplicate conversions
+            return Response(
+                {
+                    'error': 'PO already converted',
+                    'purchase_header_id': result['purchase_header_id'],
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
 
-        order_number = f"PU-{uuid.uuid4().hex[:8].upper()}"
-        invoice_number = data.get('invoice_number') or f"INV-{uuid.uuid4().hex[:8].upper()}"
-        purchase_header = PurchaseHeader.objects.create(
-            user_client=user_client,
-            supplier=po.supplier,
-            payment_option=payment_option,
-            order_number=order_number,
-            invoice_number=invoice_number,
-            subtotal=subtotal,
-            total_cost=total_cost,
-            remaining_balance=remaining_balance,
-        )
+        return Response({
+            'purchase_header_id': result['purchase_header_id'],
+            'order_number': result['order_number'],
+            'invoice_number': result['invoice_number'],
+        }, status=status.HTTP_201_CREATED)
 
-        for d in po.po_details.all():
-            PurchaseDetail.objects.create(
-                purchase_header=purchase_header,
-                user_client=user_client,
-                product=d.product,
-                unit=d.unit,
-                quantity=d.quantity,
-                price_per_unit=d.price_per_unit,
-                discount=0,
-            )
 
-        # Mark PO as converted to this Purchase
-        po.converted_purchase = purchase_header
-        po.save(update_fields=['converted_purchase'])
+class PurchaseOrderBatchConvertAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Convert many POs to Purchases in one transaction (e.g. a weekly restocking run). "
+                              "Each PO gets its own Purchase with a generated invoice number; the response has one "
+                              "result per PO, in request order.",
+        request_body=PurchaseOrderBatchConvertSerializer,
+        responses={200: openapi.Response(description="Per-PO results"), 400: openapi.Response(description="Validation error")},
+        tags=['Purchase Orders']
+    )
+    @transaction.atomic
+    def post(self, request):
+        serializer = PurchaseOrderBatchConvertSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        user_client: UserClient = request.user
+        if data.get('payment_option_id'):
+            try:
+                payment_option = PaymentOption.objects.get(pk=data['payment_option_id'])
+            except PaymentOption.DoesNotExist:
+                return Response({'error': 'Invalid payment_option_id'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            payment_option = default_payment_option(user_client)
 
+        results = convert_purchase_orders(user_client, data['po_header_ids'], payment_option)
         return Response({
-            'purchase_header_id': str(purchase_header.purchase_header_id),
-            'order_number': purchase_header.order_number,
-            'invoice_number': purchase_header.invoice_number,
-        }, status=status.HTTP_201_CREATED)
+            'converted': sum(1 for result in results if result['status'] == 'converted'),
+            'results': results,
+        }, status=status.HTTP_200_OK)
 
 
 class PurchaseRetrieveHeaderAPIView(APIView):
@@ -321,7 +327,7 @@ class PurchaseRetrieveHeaderAPIView(APIView):
     )
     def get(self, request, purchase_header_id):
         try:
-            purchase = PurchaseHeader.objects.get(pk=purchase_header_id)
+            purchase = PurchaseHeader.objects.select_related('supplier').get(pk=purchase_header_id)
         except PurchaseHeader.DoesNotExist:
             return Response({'error': 'Purchase not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response(PurchaseHeaderSerializer(purchase).data, status=status.HTTP_200_OK)
@@ -337,7 +343,7 @@ class PurchaseRetrieveFullAPIView(APIView):
     )
     def get(self, request, purchase_header_id):
         try:
-            purchase = PurchaseHeader.objects.get(pk=purchase_header_id)
+            purchase = PurchaseHeader.objects.select_related('supplier').get(pk=purchase_header_id)
         except PurchaseHeader.DoesNotExist:
             return Response({'error': 'Purchase not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response(PurchaseHeaderFullSerializer(purchase).data, status=status.HTTP_200_OK)
@@ -369,48 +375,19 @@ class PurchaseRetrieveFullAPIView(APIView):
                 return Response({'error': 'Invalid payment_option_id'}, status=status.HTTP_400_BAD_REQUEST)
         if 'invoice_number' in data:
             purchase.invoice_number = data['invoice_number']
-        purchase.save()
 
-        # Process detail operations
-        subtotal = 0
-        for item in data.get('details', []):
-            if item.get('delete'):
-                if item.get('purchase_detail_id'):
-                    PurchaseDetail.objects.filter(pk=item['purchase_detail_id'], purchase_header=purchase).delete()
-                continue
-            if item.get('purchase_detail_id'):
-                try:
-                    pd = PurchaseDetail.objects.get(pk=item['purchase_detail_id'], purchase_header=purchase)
-                except PurchaseDetail.DoesNotExist:
-                    return Response({'error': f"Purchase detail not found: {item['purchase_detail_id']}"}, status=status.HTTP_400_BAD_REQUEST)
-                if item.get('product_id'):
-                    pd.product = Product.objects.get(pk=item['product_id'])
-                if item.get('unit_id'):
-                    pd.unit = Unit.objects.get(pk=item['unit_id'])
-                pd.quantity = item['quantity']
-                pd.price_per_unit = item['price_per_unit']
-                pd.discount = item.get('discount', pd.discount)
-                pd.save()
-                subtotal += float(pd.quantity) * float(pd.price_per_unit) - float(pd.discount or 0)
-            else:
-                product = Product.objects.get(pk=item['product_id']) if item.get('product_id') else None
-                unit = Unit.objects.get(pk=item['unit_id']) if item.get('unit_id') else None
-                if not product or not unit:
-                    return Response({'error': 'product_id and unit_id required for new detail'}, status=status.HTTP_400_BAD_REQUEST)
-                pd = PurchaseDetail.objects.create(
-                    purchase_header=purchase,
-                    user_client=user_client,
-                    product=product,
-                    unit=unit,
-                    quantity=item['quantity'],
-                    price_per_unit=item['price_per_unit'],
-                    discount=item.get('discount', 0),
-                )
-                subtotal += float(pd.quantity) * float(pd.price_per_unit) - float(pd.discount or 0)
+        try:
+            apply_line_changes(
+                purchase, data.get('details', []), model=PurchaseDetail, header_field='purchase_header',
+                id_field='purchase_detail_id', fields=['quantity', 'price_per_unit', 'discount'], user_client=user_client,
+            )
+        except LineChangeError as exc:
+            transaction.set_rollback(True)
+            return Response({'error': 'Invalid details', 'details': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
 
         # Recompute totals (business rules may vary)
-        purchase.subtotal = subtotal
-        purchase.total_cost = subtotal
+        purchase.subtotal = lines_total(purchase.purchase_details.all(), discount_field='discount')
+        purchase.total_cost = purchase.subtotal
         # Keep remaining_balance logic simple: equals total_cost unless payments applied elsewhere
         purchase.remaining_balance = purchase.total_cost
         purchase.save()
@@ -422,9 +399,16 @@ class PurchaseGenerateGRNAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Generate a GRN from a Purchase header (no auto-generation).",
+        operation_description="Generate a GRN from a Purchase header (no auto-generation). Pass `lines` "
+                              "(purchase_detail_id + quantity) to receive part of a delivery; without them "
+                              "everything still outstanding on the purchase is received.",
         request_body=GenerateGRNSerializer,
-        responses={201: openapi.Response(description="GRN created"), 404: openapi.Response(description="Purchase not found")},
+        responses={
+            201: openapi.Response(description="GRN created"),
+            400: openapi.Response(description="Invalid lines"),
+            404: openapi.Response(description="Purchase not found"),
+            409: openapi.Response(description="Nothing left to receive"),
+        },
         tags=['GRNs']
     )
     @transaction.atomic
@@ -435,10 +419,30 @@ class PurchaseGenerateGRNAPIView(APIView):
         data = serializer.validated_data
 
         try:
-            purchase = PurchaseHeader.objects.get(pk=purchase_header_id)
+            purchase = PurchaseHeader.objects.select_related('supplier').get(pk=purchase_header_id)
         except PurchaseHeader.DoesNotExist:
             return Response({'error': 'Purchase not found'}, status=status.HTTP_404_NOT_FOUND)
 
+        # Locked so concurrent GRNs cannot both receive the same outstanding quantity
+        details = {line.pk: line for line in purchase.purchase_details.select_for_update().order_by('created_at')}
+        outstanding = {pk: max(line.quantity - line.received_quantity, 0) for pk, line in details.items()}
+        if 'lines' in data:
+            receive = defaultdict(int)
+            for line in data['lines']:
+                receive[line['purchase_detail_id']] += line['quantity']
+            errors = []
+            for purchase_detail_id, quantity in receive.items():
+                if purchase_detail_id not in details:
+                    errors.append(f"Purchase detail not found: {purchase_detail_id}")
+                elif quantity > outstanding[purchase_detail_id]:
+                    errors.append(f"Only {outstanding[purchase_detail_id]} outstanding on purchase detail {purchase_detail_id}")
+            if errors:
+                return Response({'error': 'Invalid lines', 'lines': errors}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            receive = {pk: quantity for pk, quantity in outstanding.items() if quantity}
+            if not receive:
+                return Response({'error': 'Nothing left to receive'}, status=status.HTTP_409_CONFLICT)
+
         user_client: UserClient = request.user
         grn_header = GRNHeader.objects.create(
             user_client=user_client,
@@ -449,25 +453,83 @@ class PurchaseGenerateGRNAPIView(APIView):
             notes=f"GRN for purchase {purchase.order_number}"
         )
 
-        for pd in purchase.purchase_details.all():
-            GRNDetail.objects.create(
+        post_grn_lines(grn_header, [
+            GRNDetail(
                 user_client=user_client,
                 grn_header=grn_header,
-                product=pd.product,
-                unit=pd.unit,
-                quantity=pd.quantity,
-                price_per_unit=pd.price_per_unit,
+                purchase_detail_id=purchase_detail_id,
+                product_id=details[purchase_detail_id].product_id,
+                unit_id=details[purchase_detail_id].unit_id,
+                quantity=quantity,
+                price_per_unit=details[purchase_detail_id].price_per_unit,
             )
+            for purchase_detail_id, quantity in receive.items()
+        ])
 
         return Response({
             'grn_header_id': str(grn_header.grn_header_id),
             'grn_number': grn_header.grn_number,
+            'received_quantity': sum(receive.values()),
+            'outstanding_quantity': sum(outstanding.values()) - sum(receive.values()),
         }, status=status.HTTP_201_CREATED)
 
+
+class PurchaseOrderMatchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Three-way match of a PO against its Purchase (invoice) and the GRNs received on it, "
+                              "line by line, with what is still outstanding.",
+        responses={200: openapi.Response(description="OK"), 404: openapi.Response(description="PO not found")},
+        tags=['Purchase Orders']
+    )
+    def get(self, request, po_header_id):
+        try:
+            po = PurchaseOrderHeader.objects.get(pk=po_header_id, user_client=request.user)
+        except PurchaseOrderHeader.DoesNotExist:
+            return Response({'error': 'PO not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(three_way_match(po), status=status.HTTP_200_OK)
+
+
+class PurchaseOrderOutstandingAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    default_limit = 100
+    max_limit = 1000
+
+    @swagger_auto_schema(
+        operation_description="PO lines not yet fully received, oldest order first, with totals. "
+                              "Query params: `supplier_id`, `limit` (max 1000), `offset`.",
+        responses={200: openapi.Response(description="OK"), 400: openapi.Response(description="Invalid limit, offset or supplier_id")},
+        tags=['Purchase Orders']
+    )
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            limit = offset = -1
+        if limit < 0 or offset < 0:
+            return Response({'error': 'limit and offset must be non-negative integers'}, status=status.HTTP_400_BAD_REQUEST)
+        supplier_id = request.query_params.get('supplier_id')
+        if supplier_id:
+            try:
+                supplier_id = uuid.UUID(supplier_id)
+            except ValueError:
+                return Response({'error': 'supplier_id must be a UUID'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = outstanding_order_lines(request.user, supplier_id)
+        return Response({
+            **outstanding_totals(queryset),
+            'limit': limit,
+            'offset': offset,
+            'results': list(queryset.values(*OUTSTANDING_FIELDS)[offset:offset + limit]),
+        }, status=status.HTTP_200_OK)
+
 @swagger_auto_schema(tags=["GRNs"])
-class GRNHeaderViewSet(viewsets.ModelViewSet):
+class GRNHeaderViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = GRNHeader.objects.all()
     serializer_class = GRNHeaderSerializer
+    query_budgets = {'list': 2}
 
     def perform_create(self, serializer):
         instance = serializer.save()
@@ -496,7 +558,8 @@ class GRNHeaderViewSet(viewsets.ModelViewSet):
         return response
 
 @swagger_auto_schema(tags=["GRNs"])
-class GRNDetailViewSet(viewsets.ModelViewSet):
+class GRNDetailViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = GRNDetail.objects.all()
     serializer_class = GRNDetailSerializer
+    query_budgets = {'list': 3}
     permission_classes = [IsAuthenticated, IsManager]  # Allow all roles to access this view
\ No newline at end of file
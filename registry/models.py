@@ -95,4 +95,4 @@ class BusinessProfile(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.store_name} ({self.user.username})"
+        return f"{self.store_name} ({self.user.storename})"
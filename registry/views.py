@@ -8,33 +8,51 @@ from rest_framework.response import Response
 from .models import Customer, Supplier, PaymentOption, ExpenseCategory, Expense, BusinessProfile, AnonymousProfile
 from .serializers import CustomerSerializer, SupplierSerializer, PaymentOptionSerializer, ExpenseCategorySerializer, ExpenseSerializer, BusinessProfileSerializer, AnonymousProfileSerializer
 from users.models import UserClient
+from django_filters.rest_framework import DjangoFilterBackend
+from AsiriaPOS.mixins import ExportMixin
 
 @swagger_auto_schema(tags=["Registry"])
 # Create your views here.
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    query_budgets = {'list': 2}
     permission_classes = [IsAuthenticated]
     
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
+    query_budgets = {'list': 2}
     permission_classes = [IsAuthenticated]  
 
-class PaymentOptionViewSet(viewsets.ModelViewSet):
+class PaymentOptionViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = PaymentOption.objects.all()
     serializer_class = PaymentOptionSerializer
+    query_budgets = {'list': 2}
     permission_classes = [IsAuthenticated]
 
-class ExpenseCategoryViewSet(viewsets.ModelViewSet):
+class ExpenseCategoryViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = ExpenseCategory.objects.all()
     serializer_class = ExpenseCategorySerializer
+    query_budgets = {'list': 2}
     permission_classes = [IsAuthenticated]
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()    
     serializer_class = ExpenseSerializer
+    query_budgets = {'list': 2}
     permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'user_client': ['exact'],
+        'expense_category': ['exact'],
+        'payment_option': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
+    export_fields = [
+        'expense_id', 'user_client', 'expense_category', 'expense_category__name', 'payment_option',
+        'payment_option__name', 'name', 'amount', 'description', 'created_at', 'updated_at',
+    ]
 
 class BusinessProfile(viewsets.ModelViewSet):
     queryset = BusinessProfile.objects.all()
@@ -42,9 +60,10 @@ class BusinessProfile(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
-class AnonymousProfileViewSet(viewsets.ModelViewSet):
+class AnonymousProfileViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = AnonymousProfile.objects.all()
     serializer_class = AnonymousProfileSerializer
+    query_budgets = {'list': 2}
     permission_classes = [IsAuthenticated]
 
 
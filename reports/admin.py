@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ReportJob
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['job_id', 'user_client', 'report_type', 'status', 'created_at', 'started_at', 'finished_at', 'worker']
+    list_filter = ['report_type', 'status', 'created_at']
+    search_fields = ['job_id']
+    readonly_fields = ['params_hash', 'data_version', 'result', 'error']
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from AsiriaPOS.parallel import django_process_pool
+from reports.worker import claim_jobs, execute_job, purge_expired_jobs, requeue_stale_jobs, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued report jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Worker processes; 0 runs jobs in this process (default: 2)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.worker = worker_name()
+        self.processed = 0
+
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale running jobs'))
+
+        if workers <= 0:
+            self.run_loop(options, batch_size=1, pool=None)
+        else:
+            with django_process_pool(workers) as pool:
+                self.run_loop(options, batch_size=workers, pool=pool)
+
+        purged = purge_expired_jobs()
+        self.stdout.write(self.style.SUCCESS(f'Processed {self.processed} report jobs, purged {purged} expired'))
+
+    def run_loop(self, options, batch_size, pool):
+        try:
+            while True:
+                job_ids = claim_jobs(batch_size, worker=self.worker)
+                if not job_ids:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+                if pool is None:
+                    results = [execute_job(job_id) for job_id in job_ids]
+                else:
+                    results = pool.map(execute_job, job_ids)
+                for job_id, status in results:
+                    self.processed += 1
+                    self.stdout.write(f'Job {job_id}: {status}')
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping')
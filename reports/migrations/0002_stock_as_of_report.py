@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='report_type',
+            field=models.CharField(choices=[('stock', 'Stock Report'), ('valuation', 'Valuation'), ('reorder_suggestions', 'Reorder Suggestions'), ('margin', 'Margin Report'), ('stock_as_of', 'Stock As Of Date')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,67 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from users.models import UserClient
+
+
+class ReportJob(models.Model):
+    """A queued report run. Finished jobs double as the result cache for identical requests."""
+    REPORT_TYPE_CHOICES = [
+        ('stock', 'Stock Report'),
+        ('valuation', 'Valuation'),
+        ('reorder_suggestions', 'Reorder Suggestions'),
+        ('margin', 'Margin Report'),
+        ('stock_as_of', 'Stock As Of Date'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
+    user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='report_jobs')
+    report_type = models.CharField(max_length=30, choices=REPORT_TYPE_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64)
+    data_version = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user_client', 'report_type', 'params_hash', 'data_version'], name='report_job_cache_idx'),
+            models.Index(fields=['status', 'created_at'], name='report_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} job {self.job_id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('DONE', 'FAILED')
+
+    @classmethod
+    def find_reusable(cls, user_client, report_type, params_hash, data_version):
+        """Latest job for the same report, parameters and data that is queued, running or done within the TTL."""
+        fresh_since = timezone.now() - getattr(settings, 'REPORT_JOB_RESULT_TTL', timedelta(hours=24))
+        return cls.objects.filter(
+            user_client=user_client,
+            report_type=report_type,
+            params_hash=params_hash,
+            data_version=data_version,
+            status__in=['PENDING', 'RUNNING', 'DONE'],
+            created_at__gte=fresh_since,
+        ).order_by('-created_at').first()
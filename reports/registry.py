@@ -0,0 +1,148 @@
+"""
+Report types the job runner knows how to build.
+
+Each entry normalizes the request parameters (raising ``ValueError`` on bad
+input), runs the report for one client, and fingerprints the data it reads.
+A finished job is reused for any later request with the same type, normalized
+parameters and data fingerprint, so repeat requests cost a few aggregate queries.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.timezone import localdate
+
+from products.reports import (
+    STOCK_REPORT_SECTIONS, catalog_version, reorder_suggestions, stock_activity_version, stock_report,
+    valuation_report,
+)
+from products.snapshots import snapshots_version, stock_as_of
+from sales.reports import margin_report, sales_version
+
+MAX_REPORT_DAYS = 366
+
+# ``rows`` names the list in the result that the CSV download exports (None: JSON only)
+ReportSpec = namedtuple('ReportSpec', ['normalize', 'run', 'version', 'rows'])
+
+
+def _int(params, name, default, minimum=0, maximum=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValueError(f"{name} must be between {minimum} and {maximum}" if maximum else f"{name} must be at least {minimum}")
+    return value
+
+
+def _date(params, name, default):
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be YYYY-MM-DD")
+
+
+def _stock_params(params):
+    sections = params.get('sections') or list(STOCK_REPORT_SECTIONS)
+    if isinstance(sections, str):
+        sections = sections.split(',')
+    unknown = set(sections) - set(STOCK_REPORT_SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+    return {
+        'days': _int(params, 'days', 30, minimum=1, maximum=MAX_REPORT_DAYS),
+        'sections': [section for section in STOCK_REPORT_SECTIONS if section in sections],
+    }
+
+
+def _reorder_params(params):
+    return {
+        'days': _int(params, 'days', 30, minimum=1, maximum=MAX_REPORT_DAYS),
+        'safety_days': _int(params, 'safety_days', 7),
+        'top': _int(params, 'top', None, minimum=1),
+    }
+
+
+def _margin_params(params):
+    end = _date(params, 'to', localdate())
+    start = _date(params, 'from', end - timedelta(days=29))
+    if start > end:
+        raise ValueError("from must not be after to")
+    if (end - start).days >= MAX_REPORT_DAYS:
+        raise ValueError(f"The range may cover at most {MAX_REPORT_DAYS} days")
+    return {'from': start.isoformat(), 'to': end.isoformat(), 'top': _int(params, 'top', None, minimum=1)}
+
+
+def _margin_run(user_client_id, params):
+    start, end = date.fromisoformat(params['from']), date.fromisoformat(params['to'])
+    return margin_report(user_client_id, start, end, params['top'])
+
+
+def _margin_version(user_client_id, params):
+    start, end = date.fromisoformat(params['from']), date.fromisoformat(params['to'])
+    # Costs are stored on the sale lines, so only the lines matter
+    return sales_version(user_client_id, start, end)
+
+
+def _stock_as_of_params(params):
+    day = _date(params, 'date', localdate() - timedelta(days=1))
+    if day > localdate():
+        raise ValueError("date must not be in the future")
+    return {'date': day.isoformat()}
+
+
+REPORTS = {
+    # Windowed reports end "now", so their fingerprint also rolls over daily
+    'stock': ReportSpec(
+        normalize=_stock_params,
+        run=lambda user_client_id, params: stock_report(user_client_id, params['days'], params['sections']),
+        version=lambda user_client_id, params: stock_activity_version(user_client_id) + [localdate()],
+        rows=None,
+    ),
+    'valuation': ReportSpec(
+        normalize=lambda params: {},
+        run=lambda user_client_id, params: valuation_report(user_client_id),
+        version=lambda user_client_id, params: catalog_version(user_client_id),
+        rows='items',
+    ),
+    'reorder_suggestions': ReportSpec(
+        normalize=_reorder_params,
+        run=lambda user_client_id, params: reorder_suggestions(user_client_id, **params),
+        version=lambda user_client_id, params: (
+            catalog_version(user_client_id)
+            + sales_version(user_client_id, localdate() - timedelta(days=params['days']), localdate())
+            + [localdate()]
+        ),
+        rows='suggestions',
+    ),
+    'margin': ReportSpec(normalize=_margin_params, run=_margin_run, version=_margin_version, rows='items'),
+    'stock_as_of': ReportSpec(
+        normalize=_stock_as_of_params,
+        run=lambda user_client_id, params: stock_as_of(user_client_id, date.fromisoformat(params['date'])),
+        version=lambda user_client_id, params: catalog_version(user_client_id) + snapshots_version(user_client_id),
+        rows='items',
+    ),
+}
+
+
+def fingerprint(value):
+    return hashlib.sha256(json.dumps(value, cls=DjangoJSONEncoder, sort_keys=True).encode()).hexdigest()
+
+
+def prepare(report_type, user_client_id, params):
+    """``(params, params_hash, data_version)`` for a request; raises ``ValueError`` on bad input."""
+    spec = REPORTS[report_type]
+    params = spec.normalize(params or {})
+    return params, fingerprint(params), fingerprint(spec.version(user_client_id, params))
+
+
+def run(report_type, user_client_id, params):
+    return REPORTS[report_type].run(user_client_id, params)
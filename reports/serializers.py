@@ -0,0 +1,18 @@
+from rest_framework import serializers
+from .models import ReportJob
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        exclude = ['result', 'params_hash', 'data_version']
+        read_only_fields = ['job_id', 'user_client', 'status', 'error', 'worker', 'created_at', 'started_at', 'finished_at']
+
+class ReportJobDetailSerializer(ReportJobSerializer):
+    class Meta(ReportJobSerializer.Meta):
+        exclude = ['params_hash', 'data_version']
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPE_CHOICES)
+    params = serializers.DictField(required=False, default=dict)
+    refresh = serializers.BooleanField(required=False, default=False, help_text='Run again even if a cached result exists')
@@ -0,0 +1,99 @@
+import csv
+import json
+from io import StringIO
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from AsiriaPOS.mixins import SwaggerTagMixin
+from authentication.permissions import IsOwner, IsManager, IsEmployee
+from . import registry
+from .models import ReportJob
+from .serializers import ReportJobSerializer, ReportJobDetailSerializer, ReportJobCreateSerializer
+
+
+class ReportJobViewSet(SwaggerTagMixin, mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Queue heavy reports for ``manage.py run_report_jobs`` and poll or download their results.
+
+    Creating a job for a report whose parameters and underlying data match an
+    earlier job returns that job instead: finished results come back at once
+    (200), queued or running ones are shared (202).
+    """
+    serializer_class = ReportJobSerializer
+    query_budgets = {'list': 5}
+    permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
+    swagger_tag = "Reports"
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ReportJob.objects.none()
+        return ReportJob.objects.filter(user_client=self.request.user)
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return ReportJobCreateSerializer
+        if self.action == 'retrieve':
+            return ReportJobDetailSerializer
+        return ReportJobSerializer
+
+    @swagger_auto_schema(request_body=ReportJobCreateSerializer, responses={200: ReportJobDetailSerializer, 202: ReportJobSerializer})
+    def create(self, request, *args, **kwargs):
+        serializer = ReportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report_type = serializer.validated_data['report_type']
+        try:
+            params, params_hash, data_version = registry.prepare(report_type, request.user.pk, serializer.validated_data['params'])
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = None
+        if not serializer.validated_data['refresh']:
+            job = ReportJob.find_reusable(request.user, report_type, params_hash, data_version)
+        if job is None:
+            job = ReportJob.objects.create(
+                user_client=request.user,
+                report_type=report_type,
+                params=params,
+                params_hash=params_hash,
+                data_version=data_version,
+            )
+        if job.status == 'DONE':
+            return Response(ReportJobDetailSerializer(job).data, status=status.HTTP_200_OK)
+        return Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('export', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['json', 'csv'], description='Download format (default json)'),
+    ])
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """The finished result as a JSON file, or its rows as CSV."""
+        job = self.get_object()
+        if job.status != 'DONE':
+            return Response({"error": f"Report job is {job.status.lower()}"}, status=status.HTTP_409_CONFLICT)
+
+        filename = f"{job.report_type}-{job.created_at:%Y%m%d%H%M%S}"
+        export = request.query_params.get('export', 'json')
+        if export == 'json':
+            response = HttpResponse(json.dumps(job.result, cls=DjangoJSONEncoder), content_type='application/json')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.json"'
+            return response
+        if export != 'csv':
+            return Response({"error": "export must be 'json' or 'csv'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows_key = registry.REPORTS[job.report_type].rows
+        if rows_key is None:
+            return Response({"error": "This report is only available as JSON"}, status=status.HTTP_400_BAD_REQUEST)
+        rows = job.result.get(rows_key) or []
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]) if rows else [], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+        response = HttpResponse(buffer.getvalue(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
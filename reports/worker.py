@@ -0,0 +1,73 @@
+"""
+Claiming and running queued report jobs; driven by ``manage.py run_report_jobs``.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import registry
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_jobs(limit, worker=None):
+    """Mark up to ``limit`` pending jobs RUNNING and return their ids, oldest first.
+
+    The status check is part of the UPDATE, so two runners polling the same
+    queue can never claim the same job.
+    """
+    worker = worker or worker_name()
+    claimed = []
+    candidates = ReportJob.objects.filter(status='PENDING').order_by('created_at').values_list('pk', flat=True)
+    for job_id in candidates[:limit * 2]:
+        if ReportJob.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING', started_at=timezone.now(), worker=worker,
+        ):
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def requeue_stale_jobs():
+    """Put RUNNING jobs whose runner died (older than ``REPORT_JOB_TIMEOUT``) back in the queue."""
+    cutoff = timezone.now() - getattr(settings, 'REPORT_JOB_TIMEOUT', timedelta(minutes=30))
+    return ReportJob.objects.filter(status='RUNNING', started_at__lt=cutoff).update(
+        status='PENDING', started_at=None, worker='',
+    )
+
+
+def execute_job(job_id):
+    """Build a claimed job's report and store the result. Runs inside a pool process."""
+    close_old_connections()
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        result = registry.run(job.report_type, job.user_client_id, job.params)
+    except Exception as exc:
+        logger.exception("Report job %s failed", job_id)
+        job.status = 'FAILED'
+        job.error = f"{type(exc).__name__}: {exc}"
+    else:
+        job.status = 'DONE'
+        job.result = result
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return str(job_id), job.status
+
+
+def purge_expired_jobs():
+    """Delete finished jobs older than ``REPORT_JOB_RESULT_TTL``; they can no longer be reused."""
+    cutoff = timezone.now() - getattr(settings, 'REPORT_JOB_RESULT_TTL', timedelta(hours=24))
+    deleted, _ = ReportJob.objects.filter(status__in=['DONE', 'FAILED'], finished_at__lt=cutoff).delete()
+    return deleted
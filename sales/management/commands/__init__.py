@@ -0,0 +1 @@
+# Commands package for sales app
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sales.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout idempotency keys'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired idempotency keys'))
@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from sales.sales_counters import rebuild_sales_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily sales counters from the sales table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to rebuild (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--days', type=int, default=1, help='Number of days to rebuild, ending at --date')
+        parser.add_argument('--user-client', help='Only rebuild this tenant')
+
+    def handle(self, *args, **options):
+        try:
+            end = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('--date must be YYYY-MM-DD')
+
+        for offset in range(options['days'] - 1, -1, -1):
+            sales_date = end - timedelta(days=offset)
+            rows = rebuild_sales_counters(sales_date, user_client_id=options['user_client'])
+            self.stdout.write(f'{sales_date}: {len(rows)} counters')
+        self.stdout.write(self.style.SUCCESS('Sales counters rebuilt'))
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from sales.models import CashSession
+from sales.session_totals import find_session_drift, recompute_session_totals, repair_session
+
+
+class Command(BaseCommand):
+    help = 'Recompute cash session totals from raw payments and refunds and report (or repair) drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', help='Only check this session id')
+        parser.add_argument('--days', type=int, default=2, help='Check sessions opened in the last N days (default 2)')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--repair', action='store_true', help='Overwrite drifting totals with the recomputed values')
+
+    def handle(self, *args, **options):
+        sessions = CashSession.objects.order_by('opened_at')
+        if options['session']:
+            sessions = sessions.filter(pk=options['session'])
+        else:
+            sessions = sessions.filter(opened_at__gte=timezone.now() - timedelta(days=options['days']))
+
+        checked = drifted = 0
+        batch_size = options['batch_size']
+        session_ids = list(sessions.values_list('pk', flat=True))
+        for start in range(0, len(session_ids), batch_size):
+            batch_ids = session_ids[start:start + batch_size]
+            with transaction.atomic():
+                # Lock the batch so payments landing mid-check cannot be double counted by a repair
+                batch = list(CashSession.objects.select_for_update().filter(pk__in=batch_ids))
+                actual = recompute_session_totals(batch_ids)
+                drift = find_session_drift(batch, actual)
+                checked += len(batch)
+                drifted += len(drift)
+                for session, fields in drift.items():
+                    detail = ', '.join(f'{field}: stored {stored}, actual {value}' for field, (stored, value) in fields.items())
+                    self.stdout.write(self.style.WARNING(f'Session {session.session_id}: {detail}'))
+                if options['repair']:
+                    for session in drift:
+                        repair_session(session, actual[session.pk])
+
+        action = 'repaired' if options['repair'] else 'drifting'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} sessions, {drifted} {action}'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0012_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesheader',
+            name='client_sale_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesheader',
+            name='sold_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salesheader',
+            unique_together={('user_client', 'client_sale_id')},
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:47
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+BATCH_SIZE = 1000
+PAYMENT_TOTAL_FIELDS = {
+    'CASH': 'cash_total',
+    'CARD': 'card_total',
+    'MOBILE': 'mobile_total',
+    'BANK': 'bank_total',
+    'OTHER': 'other_total',
+}
+
+
+def fill_payment_totals(apps, schema_editor):
+    """Total the payments sessions had already taken, which the new counters never saw, with one grouped query."""
+    CashSession = apps.get_model('sales', 'CashSession')
+    SalesPayment = apps.get_model('sales', 'SalesPayment')
+    sessions = {}
+    for row in (
+        SalesPayment.objects.filter(session__isnull=False).order_by()
+        .values('session_id', 'method').annotate(amount=Sum('amount'), count=Count('pk'))
+    ):
+        session = sessions.get(row['session_id'])
+        if session is None:
+            session = sessions[row['session_id']] = CashSession(
+                pk=row['session_id'], payment_count=0, **{field: Decimal('0') for field in PAYMENT_TOTAL_FIELDS.values()},
+            )
+        field = PAYMENT_TOTAL_FIELDS[row['method']]
+        setattr(session, field, getattr(session, field) + row['amount'])
+        session.payment_count += row['count']
+    CashSession.objects.bulk_update(sessions.values(), [*PAYMENT_TOTAL_FIELDS.values(), 'payment_count'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0013_salesheader_client_sale_id_sold_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashsession',
+            name='bank_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='card_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='cash_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='mobile_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='other_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='payment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_payment_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:49
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+BATCH_SIZE = 1000
+REFUND_TOTAL_FIELDS = {
+    'CASH': 'cash_refunds',
+    'CARD': 'card_refunds',
+    'MOBILE': 'mobile_refunds',
+    'STORE_CREDIT': 'store_credit_refunds',
+}
+
+
+def fill_refund_totals(apps, schema_editor):
+    """Total the approved refunds already paid out of each session, with one grouped query.
+
+    Like the counters, this only counts refunds linked to a session; refunds
+    written before ``session`` was added are not linked to one.
+    """
+    CashSession = apps.get_model('sales', 'CashSession')
+    SalesRefund = apps.get_model('sales', 'SalesRefund')
+    sessions = {}
+    for row in (
+        SalesRefund.objects.filter(session__isnull=False, is_approved=True).order_by()
+        .values('session_id', 'method').annotate(amount=Sum('amount'), count=Count('pk'))
+    ):
+        session = sessions.get(row['session_id'])
+        if session is None:
+            session = sessions[row['session_id']] = CashSession(
+                pk=row['session_id'], refund_count=0, **{field: Decimal('0') for field in REFUND_TOTAL_FIELDS.values()},
+            )
+        field = REFUND_TOTAL_FIELDS[row['method']]
+        setattr(session, field, getattr(session, field) + row['amount'])
+        session.refund_count += row['count']
+    CashSession.objects.bulk_update(sessions.values(), [*REFUND_TOTAL_FIELDS.values(), 'refund_count'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0014_cashsession_payment_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashsession',
+            name='card_refunds',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='cash_refunds',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='cash_variance',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='expected_cash',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='mobile_refunds',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='refund_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='store_credit_refunds',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='salesrefund',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='refunds', to='sales.cashsession'),
+        ),
+        migrations.RunPython(fill_refund_totals, migrations.RunPython.noop),
+    ]
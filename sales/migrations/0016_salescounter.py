@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:50
+
+import django.db.models.deletion
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def seed_todays_counters(apps, schema_editor):
+    """Count today's sales so far, as ``rebuild_sales_counters`` would.
+
+    Dashboards read only the counters, which are otherwise bumped from the
+    next sale on. Earlier days are left to the ``rebuild_sales_counters``
+    command.
+    """
+    SalesHeader = apps.get_model('sales', 'SalesHeader')
+    SalesCounter = apps.get_model('sales', 'SalesCounter')
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, time.min), timezone.get_current_timezone())
+    end = start + timedelta(days=1)
+    headers = SalesHeader.objects.filter(
+        Q(sold_at__gte=start, sold_at__lt=end) | Q(sold_at__isnull=True, created_at__gte=start, created_at__lt=end)
+    )
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for header in headers.values('user_client_id', 'terminal_id', 'sold_at', 'created_at', 'total_price').iterator():
+        sold_at = timezone.localtime(header['sold_at'] or header['created_at'])
+        bucket = totals[(header['user_client_id'], sold_at.hour, header['terminal_id'] or '')]
+        bucket[0] += header['total_price']
+        bucket[1] += 1
+    SalesCounter.objects.bulk_create([
+        SalesCounter(
+            user_client_id=user_client_id, sales_date=today, hour=hour,
+            terminal_id=terminal_id, total_amount=total, sale_count=count,
+        )
+        for (user_client_id, hour, terminal_id), (total, count) in totals.items()
+    ], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registry', '0005_customer_consent_timestamp_and_more'),
+        ('sales', '0015_cashsession_refund_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesCounter',
+            fields=[
+                ('counter_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('sales_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('terminal_id', models.CharField(blank=True, default='', max_length=64)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sale_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='salesheader',
+            index=models.Index(fields=['user_client', 'created_at'], name='sales_sales_user_cl_f18e5c_idx'),
+        ),
+        migrations.AddField(
+            model_name='salescounter',
+            name='user_client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_counters', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salescounter',
+            unique_together={('user_client', 'sales_date', 'hour', 'terminal_id')},
+        ),
+        migrations.RunPython(seed_todays_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:40
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+
+
+def cost_existing_lines(apps, schema_editor):
+    """Store a cost on lines sold before cost layers, at the product's average cost (else list cost) as the margin report did."""
+    SalesDetail = apps.get_model('sales', 'SalesDetail')
+    Product = apps.get_model('products', 'Product')
+    money = DecimalField(max_digits=14, decimal_places=2)
+    unit_cost = Product.objects.filter(pk=OuterRef('product_id')).annotate(
+        unit_cost=Coalesce(NullIf(F('average_cost'), Value(0)), F('cost'), output_field=money),
+    ).values('unit_cost')[:1]
+    SalesDetail.objects.filter(cost_of_goods__isnull=True).update(
+        cost_of_goods=ExpressionWrapper(F('quantity') * Subquery(unit_cost), output_field=money),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_cost_layers'),
+        ('sales', '0016_salescounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesdetail',
+            name='cost_of_goods',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.RunPython(cost_existing_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registry', '0005_customer_consent_timestamp_and_more'),
+        ('sales', '0017_salesdetail_cost_of_goods'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesheader',
+            index=models.Index(fields=['user_client', 'sold_at'], name='sales_sales_user_cl_2175f5_idx'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 import uuid
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from users.models import UserClient
+from products.cost_layers import CENTS, CostLine, add_layers, consume_layers, fallback_unit_cost
 from products.models import Product, Unit, Category, StockMovement, StockAlert
 from registry.models import Customer, PaymentOption
 from django.db.models.signals import post_save, post_delete
@@ -8,6 +12,7 @@ from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from Domain.models import AuditLog 
+from AsiriaPOS.events import publish_on_commit
 
 class SalesHeader(models.Model):
     sales_header_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
@@ -32,6 +37,9 @@ class SalesHeader(models.Model):
     ]
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHODS, default='CASH')
     terminal_id = models.CharField(max_length=64, blank=True, null=True)
+    # Offline uploads: till-generated sale id (deduplicates replays) and when the sale happened at the till
+    client_sale_id = models.UUIDField(blank=True, null=True)
+    sold_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     STATUS_CHOICES = [
@@ -41,8 +49,21 @@ class SalesHeader(models.Model):
     ]
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
 
+    class Meta:
+        unique_together = ('user_client', 'client_sale_id')
+        indexes = [models.Index(fields=['user_client', 'created_at']), models.Index(fields=['user_client', 'sold_at'])]
+
     def __str__(self):
-        return f"Sale Header {self.order_number} by {self.user_client.username}"
+        return f"Sale Header {self.order_number} by {self.user_client.storename}"
+
+    @classmethod
+    def apply_payments(cls, payments, sign=1):
+        """Draw the headers' remaining balance down by the given payments (one UPDATE per header)."""
+        totals = defaultdict(Decimal)
+        for payment in payments:
+            totals[payment.sales_header_id] += Decimal(payment.amount)
+        for sales_header_id, amount in totals.items():
+            cls.objects.filter(pk=sales_header_id).update(remaining_balance=F('remaining_balance') - sign * amount)
 
 class SalesDetail(models.Model):
     sales_detail_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
@@ -52,6 +73,8 @@ class SalesDetail(models.Model):
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     price_per_unit = models.DecimalField(max_digits=10, decimal_places=2)
+    # Cost of the units sold, taken FIFO from the cost layers when the line is written
+    cost_of_goods = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -183,6 +206,7 @@ class SalesRefund(models.Model):
     refund_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
     user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE)
     sales_header = models.ForeignKey(SalesHeader, on_delete=models.CASCADE, related_name='refunds')
+    session = models.ForeignKey('CashSession', on_delete=models.SET_NULL, related_name='refunds', null=True, blank=True)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     method = models.CharField(max_length=20, choices=REFUND_METHODS)
     reference = models.CharField(max_length=255, blank=True, null=True)
@@ -194,6 +218,16 @@ class SalesRefund(models.Model):
     def __str__(self):
         return f"Refund {self.refund_id} - {self.amount}"
 
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = SalesRefund.objects.filter(pk=self.pk).only('session_id', 'method', 'amount', 'is_approved').first()
+        super().save(*args, **kwargs)
+        # Approval (or an edit of an approved refund) moves session totals; creates and deletes go through the signals
+        if previous is not None:
+            CashSession.add_refunds([previous], sign=-1)
+            CashSession.add_refunds([self])
+
     def approve(self, approver):
         if self.is_approved:
             raise ValidationError('Refund already approved')
@@ -226,17 +260,113 @@ class CashSession(models.Model):
     status = models.CharField(max_length=10, choices=SESSION_STATUS, default='OPEN')
     opened_at = models.DateTimeField(auto_now_add=True)
     closed_at = models.DateTimeField(null=True, blank=True)
+    # Running totals of SalesPayment rows in this session, kept in step as payments are written
+    cash_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    card_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    mobile_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    bank_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    other_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+    # Approved SalesRefund rows paid out of this session
+    cash_refunds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    card_refunds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    mobile_refunds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    store_credit_refunds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refund_count = models.IntegerField(default=0)
+    # Frozen on close: opening float + cash taken - cash refunded, and counted minus expected
+    expected_cash = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    cash_variance = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    PAYMENT_TOTAL_FIELDS = {
+        'CASH': 'cash_total',
+        'CARD': 'card_total',
+        'MOBILE': 'mobile_total',
+        'BANK': 'bank_total',
+        'OTHER': 'other_total',
+    }
+    REFUND_TOTAL_FIELDS = {
+        'CASH': 'cash_refunds',
+        'CARD': 'card_refunds',
+        'MOBILE': 'mobile_refunds',
+        'STORE_CREDIT': 'store_credit_refunds',
+    }
+    TOTAL_FIELDS = [*PAYMENT_TOTAL_FIELDS.values(), 'payment_count', *REFUND_TOTAL_FIELDS.values(), 'refund_count']
 
     def __str__(self):
         return f"Session {self.session_id} - {self.status}"
 
+    @classmethod
+    def add_payments(cls, payments, sign=1):
+        """Fold payments into their sessions' per-method totals (one UPDATE per session).
+
+        Use ``sign=-1`` to take payments back out, e.g. when they are deleted.
+        """
+        by_session = defaultdict(list)
+        for payment in payments:
+            if payment.session_id:
+                by_session[payment.session_id].append(payment)
+        for session_id, session_payments in by_session.items():
+            totals = defaultdict(Decimal)
+            for payment in session_payments:
+                totals[cls.PAYMENT_TOTAL_FIELDS[payment.method]] += Decimal(payment.amount)
+            updates = {field: F(field) + sign * amount for field, amount in totals.items()}
+            updates['payment_count'] = F('payment_count') + sign * len(session_payments)
+            cls.objects.filter(pk=session_id).update(**updates)
+
+    @classmethod
+    def add_refunds(cls, refunds, sign=1):
+        """Fold approved refunds into their sessions' per-method refund totals (one UPDATE per session)."""
+        by_session = defaultdict(list)
+        for refund in refunds:
+            if refund.session_id and refund.is_approved:
+                by_session[refund.session_id].append(refund)
+        for session_id, session_refunds in by_session.items():
+            totals = defaultdict(Decimal)
+            for refund in session_refunds:
+                totals[cls.REFUND_TOTAL_FIELDS[refund.method]] += Decimal(refund.amount)
+            updates = {field: F(field) + sign * amount for field, amount in totals.items()}
+            updates['refund_count'] = F('refund_count') + sign * len(session_refunds)
+            cls.objects.filter(pk=session_id).update(**updates)
+
+    @property
+    def expected_cash_in_drawer(self):
+        return self.opening_float + self.cash_total - self.cash_refunds
+
+    def report(self, counted_cash=None):
+        """X/Z report built from the running totals; no payment rows are read."""
+        expected = self.expected_cash if self.expected_cash is not None else self.expected_cash_in_drawer
+        if counted_cash is None and self.status == 'CLOSED':
+            counted_cash = self.closing_total
+        payments = {method: getattr(self, field) for method, field in self.PAYMENT_TOTAL_FIELDS.items()}
+        refunds = {method: getattr(self, field) for method, field in self.REFUND_TOTAL_FIELDS.items()}
+        return {
+            'session_id': str(self.session_id),
+            'status': self.status,
+            'opened_at': self.opened_at,
+            'closed_at': self.closed_at,
+            'opening_float': self.opening_float,
+            'payments': payments,
+            'payment_count': self.payment_count,
+            'gross_takings': sum(payments.values(), Decimal('0')),
+            'refunds': refunds,
+            'refund_count': self.refund_count,
+            'total_refunds': sum(refunds.values(), Decimal('0')),
+            'expected_cash': expected,
+            'counted_cash': counted_cash,
+            'cash_variance': None if counted_cash is None else Decimal(counted_cash) - expected,
+        }
+
     def close(self, closed_by_user, closing_total_amount):
         if self.status == 'CLOSED':
             raise ValidationError('Session already closed')
+        # Totals are maintained with UPDATEs, so read them fresh before freezing the expected cash
+        self.refresh_from_db(fields=self.TOTAL_FIELDS)
         self.status = 'CLOSED'
         self.closed_by = closed_by_user
         self.closed_at = timezone.now()
-        self.closing_total = closing_total_amount
+        self.closing_total = Decimal(str(closing_total_amount))
+        self.expected_cash = self.expected_cash_in_drawer
+        self.cash_variance = self.closing_total - self.expected_cash
         self.save()
 
 class SalesPayment(models.Model):
@@ -260,6 +390,128 @@ class SalesPayment(models.Model):
     def __str__(self):
         return f"Payment {self.sales_payment_id} - {self.method} - {self.amount}"
 
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = SalesPayment.objects.filter(pk=self.pk).only('sales_header_id', 'session_id', 'method', 'amount').first()
+        super().save(*args, **kwargs)
+        # Edits move the amount between totals; creates and deletes are handled by the signals below
+        if previous is not None:
+            CashSession.add_payments([previous], sign=-1)
+            SalesHeader.apply_payments([previous], sign=-1)
+            CashSession.add_payments([self])
+            SalesHeader.apply_payments([self])
+
+class SalesCounter(models.Model):
+    """Running sales total per tenant, day, hour and terminal, bumped as sales are written.
+
+    Dashboards read these few rows instead of aggregating SalesHeader; the
+    ``rebuild_sales_counters`` command recomputes them from the sales table.
+    """
+    counter_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
+    user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='sales_counters')
+    sales_date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    terminal_id = models.CharField(max_length=64, blank=True, default='')
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sale_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user_client', 'sales_date', 'hour', 'terminal_id')
+
+    def __str__(self):
+        return f"{self.sales_date} {self.hour:02d}:00 {self.terminal_id or '-'}: {self.total_amount}"
+
+    @classmethod
+    def bucket(cls, header):
+        # Offline uploads count when they were sold at the till, not when they were synced
+        sold_at = timezone.localtime(header.sold_at or header.created_at)
+        return (header.user_client_id, sold_at.date(), sold_at.hour, header.terminal_id or '')
+
+    @classmethod
+    def record_sales(cls, headers, sign=1):
+        """Add saved headers to their counters: one UPDATE per bucket, inserting buckets on first use."""
+        totals = defaultdict(lambda: [Decimal('0'), 0])
+        for header in headers:
+            bucket = totals[cls.bucket(header)]
+            bucket[0] += Decimal(header.total_price)
+            bucket[1] += 1
+        for (user_client_id, sales_date, hour, terminal_id), (amount, count) in totals.items():
+            key = dict(user_client_id=user_client_id, sales_date=sales_date, hour=hour, terminal_id=terminal_id)
+            updates = dict(total_amount=F('total_amount') + sign * amount, sale_count=F('sale_count') + sign * count, updated_at=timezone.now())
+            if cls.objects.filter(**key).update(**updates):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(**key, total_amount=sign * amount, sale_count=sign * count)
+            except IntegrityError:
+                # Another checkout created the bucket first
+                cls.objects.filter(**key).update(**updates)
+        if totals:
+            from .sales_counters import invalidate_sales_cache
+            for user_client_id, sales_date in {(key[0], key[1]) for key in totals}:
+                transaction.on_commit(lambda u=user_client_id, d=sales_date: invalidate_sales_cache(u, d))
+            for (user_client_id, sales_date, hour, terminal_id), (amount, count) in totals.items():
+                publish_on_commit(user_client_id, 'sales', {
+                    'date': sales_date.isoformat(),
+                    'hour': hour,
+                    'terminal_id': terminal_id,
+                    'amount': float(sign * amount),
+                    'count': sign * count,
+                })
+
+class IdempotencyKey(models.Model):
+    """Response stored against a client-supplied Idempotency-Key so retried requests replay it."""
+    idempotency_key_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, unique=True)
+    user_client = models.ForeignKey(UserClient, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_path = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user_client', 'key')
+
+    def __str__(self):
+        return f"Idempotency key {self.key} ({self.request_path})"
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+@receiver(post_save, sender=SalesPayment)
+def add_payment_to_totals(sender, instance, created, **kwargs):
+    if created:
+        CashSession.add_payments([instance])
+        SalesHeader.apply_payments([instance])
+
+@receiver(post_delete, sender=SalesPayment)
+def remove_payment_from_totals(sender, instance, **kwargs):
+    CashSession.add_payments([instance], sign=-1)
+    SalesHeader.apply_payments([instance], sign=-1)
+
+@receiver(post_save, sender=SalesHeader)
+def add_sale_to_counters(sender, instance, created, **kwargs):
+    if created:
+        SalesCounter.record_sales([instance])
+
+@receiver(post_delete, sender=SalesHeader)
+def remove_sale_from_counters(sender, instance, **kwargs):
+    SalesCounter.record_sales([instance], sign=-1)
+
+@receiver(post_save, sender=SalesRefund)
+def add_refund_to_totals(sender, instance, created, **kwargs):
+    if created:
+        CashSession.add_refunds([instance])
+
+@receiver(post_delete, sender=SalesRefund)
+def remove_refund_from_totals(sender, instance, **kwargs):
+    CashSession.add_refunds([instance], sign=-1)
+
 @receiver(post_save, sender=SalesDetail)
 def decrease_product_stock_on_sale(sender, instance, created, **kwargs):
     if created:
@@ -280,6 +532,10 @@ def decrease_product_stock_on_sale(sender, instance, created, **kwargs):
             reason=f"Sale to {instance.sales_header.customer.name}",
             created_by=instance.user_client
         )
+        if instance.cost_of_goods is None:
+            with transaction.atomic():
+                instance.cost_of_goods = consume_layers(instance.user_client, [CostLine(product.pk, instance.quantity)], products={product.pk: product})[0]
+                SalesDetail.objects.filter(pk=instance.pk).update(cost_of_goods=instance.cost_of_goods)
         
         # Check for low stock alerts
         if product.is_low_stock:
@@ -324,6 +580,12 @@ def increase_product_stock_on_sale_delete(sender, instance, **kwargs):
         reason="Sale detail deleted - stock reversal",
         created_by=instance.user_client
     )
+    # Put the units back at what they cost when sold
+    if instance.cost_of_goods is not None and instance.quantity:
+        unit_cost = instance.cost_of_goods / instance.quantity
+    else:
+        unit_cost = fallback_unit_cost(product)
+    add_layers(instance.user_client, [CostLine(product.pk, instance.quantity, unit_cost.quantize(CENTS), f"REVERSAL-{instance.sales_header.order_number}")])
 
 @receiver(post_save, sender=SalesReturn)
 def increase_stock_on_return(sender, instance, created, **kwargs):
@@ -343,6 +605,12 @@ def increase_stock_on_return(sender, instance, created, **kwargs):
             reason=f"Return: {instance.get_reason_display()}",
             created_by=instance.user_client
         )
+        # Returned units go back at what the sale's lines of the product cost
+        sold = SalesDetail.objects.filter(
+            sales_header=instance.sales_header, product=product, cost_of_goods__isnull=False,
+        ).aggregate(quantity=Sum('quantity'), cost=Sum('cost_of_goods'))
+        unit_cost = sold['cost'] / sold['quantity'] if sold['quantity'] else fallback_unit_cost(product)
+        add_layers(instance.user_client, [CostLine(product.pk, instance.quantity, unit_cost.quantize(CENTS), instance.sales_header.order_number)])
         AuditLog.objects.create(
             user=None,
             action='REFUND',
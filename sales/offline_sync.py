@@ -0,0 +1,269 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils.crypto import get_random_string
+
+from products.models import Product, Unit
+from products.cost_layers import CostLine, consume_layers
+from products.stock_ledger import StockLine, apply_stock_movements, lock_products
+from registry.models import Customer, PaymentOption, AnonymousProfile
+from .models import SalesHeader, SalesDetail, Receipt, SalesPayment, CashSession, SalesCounter
+from .utils.token_hash import hash_token
+
+
+def ingest_offline_sales(user_client, sales, chunk_size=None):
+    """Write a batch of validated offline sales and return one result per sale, in order.
+
+    ``sales`` are validated ``OfflineSaleSerializer`` payloads. Sales already
+    uploaded (same ``client_sale_id``) are reported as duplicates, references are
+    resolved for the whole batch at once, and the remaining sales are written in
+    chunks: each chunk is one transaction doing bulk inserts of headers, lines,
+    receipts, payments and stock movements. A failed chunk is reported on its own
+    sales without undoing chunks that already committed.
+    """
+    chunk_size = chunk_size or getattr(settings, 'OFFLINE_SALES_CHUNK_SIZE', 100)
+    results = [None] * len(sales)
+
+    already_uploaded = dict(
+        SalesHeader.objects.filter(
+            user_client=user_client,
+            client_sale_id__in=[sale['client_sale_id'] for sale in sales],
+        ).values_list('client_sale_id', 'order_number')
+    )
+    seen = set()
+    pending = []
+    for index, sale in enumerate(sales):
+        client_sale_id = sale['client_sale_id']
+        if client_sale_id in already_uploaded:
+            results[index] = _result(sale, 'duplicate', order_number=already_uploaded[client_sale_id])
+        elif client_sale_id in seen:
+            results[index] = _result(sale, 'error', errors=['client_sale_id is repeated in this batch'])
+        else:
+            seen.add(client_sale_id)
+            pending.append(index)
+
+    refs = _resolve_references(user_client, [sales[index] for index in pending])
+    valid = []
+    for index in pending:
+        errors = _reference_errors(sales[index], refs)
+        if errors:
+            results[index] = _result(sales[index], 'error', errors=errors)
+        else:
+            valid.append(index)
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = [(index, sales[index]) for index in valid[start:start + chunk_size]]
+        try:
+            with transaction.atomic():
+                written = _write_chunk(user_client, chunk, refs)
+        except DatabaseError:
+            for index, sale in chunk:
+                results[index] = _result(sale, 'error', errors=['Sale could not be saved, retry the upload'])
+            continue
+        for index, result in written.items():
+            results[index] = result
+
+    return results
+
+
+def _result(sale, status, **extra):
+    return {'client_sale_id': str(sale['client_sale_id']), 'status': status, **extra}
+
+
+def _resolve_references(user_client, sales):
+    product_ids = {item['product_id'] for sale in sales for item in sale['items']}
+    unit_ids = {item['unit_id'] for sale in sales for item in sale['items'] if item.get('unit_id')}
+    payment_option_ids = {sale['payment_option_id'] for sale in sales if sale.get('payment_option_id')}
+    session_ids = {sale['session_id'] for sale in sales if sale.get('session_id')}
+    return {
+        'products': Product.objects.filter(user_client=user_client).in_bulk(product_ids) if product_ids else {},
+        'units': Unit.objects.in_bulk(unit_ids) if unit_ids else {},
+        'payment_options': PaymentOption.objects.filter(user_client=user_client).in_bulk(payment_option_ids) if payment_option_ids else {},
+        'default_payment_option': PaymentOption.objects.filter(user_client=user_client).first(),
+        'sessions': CashSession.objects.filter(user_client=user_client).in_bulk(session_ids) if session_ids else {},
+    }
+
+
+def _reference_errors(sale, refs):
+    errors = []
+    for item in sale['items']:
+        if item['product_id'] not in refs['products']:
+            errors.append(f"Invalid product_id: {item['product_id']}")
+        if item.get('unit_id') and item['unit_id'] not in refs['units']:
+            errors.append(f"Invalid unit_id: {item['unit_id']}")
+    if sale.get('payment_option_id'):
+        if sale['payment_option_id'] not in refs['payment_options']:
+            errors.append("Invalid payment_option_id")
+    elif refs['default_payment_option'] is None:
+        errors.append("No payment option configured for this client")
+    if sale.get('session_id') and sale['session_id'] not in refs['sessions']:
+        errors.append("Invalid session_id")
+    return errors
+
+
+def _customer_resolver(user_client, sales):
+    """Find-or-create (phone-lite) customers for a chunk with one lookup and one bulk insert."""
+    phones = {sale['phone'] for sale in sales if sale.get('phone')}
+    emails = {sale['email'] for sale in sales if sale.get('email')}
+    by_phone, by_email = {}, {}
+    if phones or emails:
+        for customer in Customer.objects.filter(user_client=user_client).filter(Q(phone__in=phones) | Q(email__in=emails)):
+            if customer.phone:
+                by_phone[customer.phone] = customer
+            if customer.email:
+                by_email[customer.email] = customer
+
+    created = []
+    for sale in sales:
+        phone, email = sale.get('phone'), sale.get('email')
+        if not (phone or email):
+            continue
+        if (phone and phone in by_phone) or (email and email in by_email):
+            continue
+        customer = Customer(
+            user_client=user_client,
+            name=phone or email or "Walk-in",
+            email=email,
+            phone=phone,
+            address="",
+        )
+        created.append(customer)
+        if phone:
+            by_phone[phone] = customer
+        if email:
+            by_email[email] = customer
+    Customer.objects.bulk_create(created)
+
+    def resolve(sale):
+        phone, email = sale.get('phone'), sale.get('email')
+        return (by_phone.get(phone) if phone else None) or (by_email.get(email) if email else None)
+    return resolve
+
+
+def _write_chunk(user_client, chunk, refs):
+    locked = lock_products(item['product_id'] for _, sale in chunk for item in sale['items'])
+    available = {product_id: product.stock for product_id, product in locked.items()}
+
+    results = {}
+    accepted = []
+    for index, sale in chunk:
+        needed = defaultdict(int)
+        for item in sale['items']:
+            needed[item['product_id']] += item['qty']
+        short = [product_id for product_id, qty in needed.items() if available[product_id] < qty]
+        if short:
+            results[index] = _result(sale, 'error', errors=[
+                f"Insufficient stock for {locked[product_id].name}. Available: {available[product_id]}, Requested: {needed[product_id]}"
+                for product_id in short
+            ])
+            continue
+        for product_id, qty in needed.items():
+            available[product_id] -= qty
+        accepted.append((index, sale))
+
+    customer_for = _customer_resolver(user_client, [sale for _, sale in accepted])
+    profiles, headers, details, receipts, payments, stock_lines = [], [], [], [], [], []
+    for index, sale in accepted:
+        customer = customer_for(sale)
+        payment_option = refs['payment_options'].get(sale.get('payment_option_id')) or refs['default_payment_option']
+
+        lines = []
+        subtotal = Decimal('0')
+        for item in sale['items']:
+            product = locked[item['product_id']]
+            price = item.get('price') or product.price
+            subtotal += price * item['qty']
+            lines.append((product, item.get('unit_id') or product.unit_id, item['qty'], price))
+        total_price = subtotal  # extend later with taxes/discounts
+        sale_payments = sale.get('payments') or []
+        amount_paid = sum((p['amount'] for p in sale_payments), Decimal('0'))
+
+        header = SalesHeader(
+            user_client=user_client,
+            customer=customer,
+            payment_option=payment_option,
+            order_number=f"SO-{uuid.uuid4().hex[:8].upper()}",
+            subtotal=subtotal,
+            total_price=total_price,
+            remaining_balance=total_price - amount_paid,
+            payment_method=sale['payment_method'],
+            terminal_id=sale.get('terminal_id'),
+            client_sale_id=sale['client_sale_id'],
+            sold_at=sale['sold_at'],
+            mpesa_token_hash=hash_token(sale['mpesa_token']) if sale.get('mpesa_token') else None,
+            card_token_hash=hash_token(sale['card_token']) if sale.get('card_token') else None,
+            credit_account_code=sale.get('credit_account_code') or None,
+        )
+        if not customer:
+            profile = AnonymousProfile(user_client=user_client)
+            profiles.append(profile)
+            header.anonymous_customer_id = profile.anonymous_customer_id
+        headers.append(header)
+
+        reason = f"Sale to {customer.name}" if customer else "Sale to walk-in customer"
+        for product, unit_id, qty, price in lines:
+            details.append(SalesDetail(
+                sales_header=header,
+                user_client=user_client,
+                product=product,
+                unit_id=unit_id,
+                quantity=qty,
+                price_per_unit=price,
+            ))
+            stock_lines.append(StockLine(product.pk, -qty, header.order_number, reason))
+
+        for p in sale_payments:
+            payments.append(SalesPayment(
+                user_client=user_client,
+                sales_header=header,
+                session_id=sale.get('session_id'),
+                method=p['method'],
+                amount=p['amount'],
+                reference=p.get('reference'),
+            ))
+
+        receipt = Receipt(
+            user_client=user_client,
+            customer=customer,
+            payment_option=payment_option,
+            sales_header=header,
+            receipt_number=f"RC-{uuid.uuid4().hex[:8].upper()}",
+            link_token=get_random_string(10).upper(),
+            total_amount=total_price,
+            amount_paid=amount_paid,
+            narration="",
+            payment_method=sale['payment_method'],
+            anonymous_customer_id=header.anonymous_customer_id,
+            mpesa_token_hash=header.mpesa_token_hash,
+            card_token_hash=header.card_token_hash,
+            credit_account_code=header.credit_account_code,
+        )
+        receipts.append(receipt)
+        results[index] = _result(
+            sale, 'created',
+            order_number=header.order_number,
+            receipt_number=receipt.receipt_number,
+            receipt_id=str(receipt.receipt_id),
+            short_token=receipt.link_token,
+            total_price=float(total_price),
+        )
+
+    # Products are locked above, so their cost layers are taken after them, as checkout does
+    costs = consume_layers(user_client, [CostLine(detail.product_id, detail.quantity) for detail in details], products=locked)
+    for detail, cost_of_goods in zip(details, costs):
+        detail.cost_of_goods = cost_of_goods
+
+    AnonymousProfile.objects.bulk_create(profiles)
+    SalesHeader.objects.bulk_create(headers)
+    SalesCounter.record_sales(headers)
+    SalesDetail.objects.bulk_create(details)
+    Receipt.objects.bulk_create(receipts)
+    SalesPayment.objects.bulk_create(payments)
+    # Balances are netted above; bulk_create skips the signals that keep session totals
+    CashSession.add_payments(payments)
+    apply_stock_movements(user_client, 'SALE', stock_lines, products=locked)
+    return results
@@ -0,0 +1,72 @@
+"""
+Sales report builders shared by the async views and the report job worker.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.reports import money_field
+from .models import SalesDetail
+
+
+def day_bounds(start, end):
+    """Aware datetimes covering the local dates ``start``..``end`` inclusive, for index-friendly range filters."""
+    tz = timezone.get_current_timezone()
+    since = timezone.make_aware(datetime.combine(start, time.min), tz)
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    return since, until
+
+
+def sales_version(user_client_id, start, end):
+    """Cheap fingerprint of a client's sales lines in a period, used to key cached report results."""
+    since, until = day_bounds(start, end)
+    lines = SalesDetail.objects.filter(user_client_id=user_client_id, created_at__gte=since, created_at__lt=until)
+    version = lines.aggregate(count=Count('pk'), last=Max('updated_at'))
+    return [version['count'], version['last']]
+
+
+def margin_querysets(user_client_id, start, end, top=None):
+    """``(lines, totals, rows)`` for the margin report: the filtered lines, aggregate kwargs and per-product rows.
+
+    Cost is the cost of goods each line stored when it was sold, so no product costs are read.
+    """
+    since, until = day_bounds(start, end)
+    lines = SalesDetail.objects.filter(user_client_id=user_client_id, created_at__gte=since, created_at__lt=until)
+    revenue = Sum(ExpressionWrapper(F('quantity') * F('price_per_unit'), output_field=money_field()))
+    cost = Sum('cost_of_goods', output_field=money_field())
+    totals = {
+        'revenue': Coalesce(revenue, 0, output_field=money_field()),
+        'cost': Coalesce(cost, 0, output_field=money_field()),
+    }
+    rows = (
+        lines.values('product_id', 'product__name')
+        .annotate(quantity_sold=Sum('quantity'), line_count=Count('pk'), revenue=revenue, cost=cost)
+        .annotate(margin=ExpressionWrapper(F('revenue') - F('cost'), output_field=money_field()))
+        .order_by('-margin')
+    )
+    if top:
+        rows = rows[:top]
+    return lines, totals, rows
+
+
+def margin_row(row):
+    row['name'] = row.pop('product__name')
+    row['margin_pct'] = round(float(row['margin'] / row['revenue'] * 100), 2) if row['revenue'] else None
+    return row
+
+
+def margin_result(start, end, totals, items):
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        **totals,
+        'margin': totals['revenue'] - totals['cost'],
+        'items': items,
+    }
+
+
+def margin_report(user_client_id, start, end, top=None):
+    lines, totals, rows = margin_querysets(user_client_id, start, end, top)
+    return margin_result(start, end, lines.aggregate(**totals), [margin_row(row) for row in rows])
@@ -0,0 +1,117 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SalesCounter, SalesHeader
+
+
+def _cache_key(user_client_id, sales_date):
+    return f"sales-counters:{user_client_id}:{sales_date.isoformat()}"
+
+
+def invalidate_sales_cache(user_client_id, sales_date):
+    cache.delete(_cache_key(user_client_id, sales_date))
+
+
+def _counter_rows_queryset(user_client_id, sales_date):
+    return (
+        SalesCounter.objects.filter(user_client_id=user_client_id, sales_date=sales_date)
+        .values_list('hour', 'terminal_id', 'total_amount', 'sale_count')
+    )
+
+
+def daily_counter_rows(user_client_id, sales_date):
+    """The tenant's counter rows for a day as ``(hour, terminal_id, total, count)``, served from cache when warm."""
+    key = _cache_key(user_client_id, sales_date)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(_counter_rows_queryset(user_client_id, sales_date))
+        cache.set(key, rows, getattr(settings, 'SALES_COUNTER_CACHE_TTL', 60))
+    return rows
+
+
+async def adaily_counter_rows(user_client_id, sales_date):
+    """Async twin of ``daily_counter_rows`` using the async cache and ORM APIs."""
+    key = _cache_key(user_client_id, sales_date)
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = [row async for row in _counter_rows_queryset(user_client_id, sales_date)]
+        await cache.aset(key, rows, getattr(settings, 'SALES_COUNTER_CACHE_TTL', 60))
+    return rows
+
+
+def summarize_counter_rows(rows, sales_date, breakdown=None):
+    """Total sales for a tenant's day, optionally broken down by ``'terminal'`` or ``'hour'``."""
+    summary = {
+        'date': sales_date.isoformat(),
+        'total_sales': float(sum((row[2] for row in rows), Decimal('0'))),
+        'sale_count': sum(row[3] for row in rows),
+    }
+    if breakdown:
+        buckets = defaultdict(lambda: [Decimal('0'), 0])
+        for hour, terminal_id, total, count in rows:
+            bucket = buckets[terminal_id if breakdown == 'terminal' else hour]
+            bucket[0] += total
+            bucket[1] += count
+        key_name = 'terminal_id' if breakdown == 'terminal' else 'hour'
+        summary['breakdown'] = [
+            {key_name: key, 'total_sales': float(total), 'sale_count': count}
+            for key, (total, count) in sorted(buckets.items())
+        ]
+    return summary
+
+
+def daily_sales_summary(user_client_id, sales_date, breakdown=None):
+    return summarize_counter_rows(daily_counter_rows(user_client_id, sales_date), sales_date, breakdown)
+
+
+async def adaily_sales_summary(user_client_id, sales_date, breakdown=None):
+    return summarize_counter_rows(await adaily_counter_rows(user_client_id, sales_date), sales_date, breakdown)
+
+
+def rebuild_sales_counters(sales_date, user_client_id=None):
+    """Recompute one day's counters from SalesHeader with a range scan. Returns the rows written.
+
+    Sales are counted on the day they were sold: ``sold_at`` for offline
+    uploads, ``created_at`` otherwise, as ``SalesCounter.bucket`` does. Sales
+    written while the day is being rebuilt can be missed, so prefer running
+    it for past days or outside trading hours.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(sales_date, time.min), tz)
+    end = start + timedelta(days=1)
+    headers = SalesHeader.objects.filter(
+        Q(sold_at__gte=start, sold_at__lt=end) | Q(sold_at__isnull=True, created_at__gte=start, created_at__lt=end)
+    )
+    counters = SalesCounter.objects.filter(sales_date=sales_date)
+    if user_client_id:
+        headers = headers.filter(user_client_id=user_client_id)
+        counters = counters.filter(user_client_id=user_client_id)
+
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    # Hours are bucketed in Python so the grouping does not depend on database timezone support
+    for header in headers.values('user_client_id', 'terminal_id', 'sold_at', 'created_at', 'total_price').iterator():
+        sold_at = timezone.localtime(header['sold_at'] or header['created_at'])
+        bucket = totals[(header['user_client_id'], sold_at.hour, header['terminal_id'] or '')]
+        bucket[0] += header['total_price']
+        bucket[1] += 1
+
+    with transaction.atomic():
+        touched = set(counters.values_list('user_client_id', flat=True))
+        counters.delete()
+        rebuilt = SalesCounter.objects.bulk_create([
+            SalesCounter(
+                user_client_id=tenant_id, sales_date=sales_date, hour=hour,
+                terminal_id=terminal_id, total_amount=total, sale_count=count,
+            )
+            for (tenant_id, hour, terminal_id), (total, count) in totals.items()
+        ])
+    for tenant_id in touched | {key[0] for key in totals}:
+        invalidate_sales_cache(tenant_id, sales_date)
+    return rebuilt
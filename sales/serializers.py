@@ -20,7 +20,7 @@ class SalesDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = SalesDetail
         fields = '__all__'
-        read_only_fields = ['sales_detail_id', 'created_at', 'updated_at']
+        read_only_fields = ['sales_detail_id', 'cost_of_goods', 'created_at', 'updated_at']
 
 class ReceiptSerializer(serializers.ModelSerializer):
     user_client = serializers.PrimaryKeyRelatedField(queryset=UserClient.objects.all())
@@ -37,7 +37,12 @@ class CashSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = CashSession
         fields = '__all__'
-        read_only_fields = ['session_id', 'opened_at', 'closed_at', 'status']
+        read_only_fields = [
+            'session_id', 'opened_at', 'closed_at', 'status',
+            'cash_total', 'card_total', 'mobile_total', 'bank_total', 'other_total', 'payment_count',
+            'cash_refunds', 'card_refunds', 'mobile_refunds', 'store_credit_refunds', 'refund_count',
+            'expected_cash', 'cash_variance',
+        ]
 
 class SalesPaymentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -45,6 +50,21 @@ class SalesPaymentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['sales_payment_id', 'created_at']
 
+class SplitPaymentItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=SalesPayment.PAYMENT_METHODS)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    reference = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+class SplitPaymentSerializer(serializers.Serializer):
+    sales_header = serializers.PrimaryKeyRelatedField(queryset=SalesHeader.objects.all())
+    session = serializers.PrimaryKeyRelatedField(queryset=CashSession.objects.all(), required=False, allow_null=True)
+    payments = SplitPaymentItemSerializer(many=True, allow_empty=False)
+
+    def validate_session(self, value):
+        if value is not None and value.status != 'OPEN':
+            raise serializers.ValidationError('Payments can only be added to an open session')
+        return value
+
 class SalesReturnSerializer(serializers.ModelSerializer):
     class Meta:
         model = SalesReturn
@@ -57,6 +77,14 @@ class SalesRefundSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['refund_id', 'created_at']
 
+    def validate_session(self, value):
+        if value is not None and value.status != 'OPEN':
+            raise serializers.ValidationError('Refunds can only be paid out of an open session')
+        return value
+
+class CashSessionCloseSerializer(serializers.Serializer):
+    closing_total = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+
 class SalesReservationSerializer(serializers.ModelSerializer):
     class Meta:
         model = SalesReservation
@@ -0,0 +1,63 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from .models import CashSession, SalesPayment, SalesRefund
+
+
+def recompute_session_totals(session_ids):
+    """Rebuild the running totals of the given sessions from their raw payment and refund rows.
+
+    Returns ``{session_id: {field: value}}`` covering every field in
+    ``CashSession.TOTAL_FIELDS``, using two grouped queries for the whole set.
+    """
+    session_ids = list(session_ids)
+    totals = {session_id: {field: Decimal('0') for field in CashSession.TOTAL_FIELDS} for session_id in session_ids}
+    for session_id in session_ids:
+        totals[session_id]['payment_count'] = 0
+        totals[session_id]['refund_count'] = 0
+
+    payment_rows = (
+        SalesPayment.objects.filter(session_id__in=session_ids)
+        .values('session_id', 'method')
+        .annotate(amount=Sum('amount'), count=Count('pk'))
+    )
+    for row in payment_rows:
+        session = totals[row['session_id']]
+        session[CashSession.PAYMENT_TOTAL_FIELDS[row['method']]] += row['amount']
+        session['payment_count'] += row['count']
+
+    refund_rows = (
+        SalesRefund.objects.filter(session_id__in=session_ids, is_approved=True)
+        .values('session_id', 'method')
+        .annotate(amount=Sum('amount'), count=Count('pk'))
+    )
+    for row in refund_rows:
+        session = totals[row['session_id']]
+        session[CashSession.REFUND_TOTAL_FIELDS[row['method']]] += row['amount']
+        session['refund_count'] += row['count']
+    return totals
+
+
+def find_session_drift(sessions, actual):
+    """Compare stored totals with recomputed ones; returns ``{session: {field: (stored, actual)}}`` for mismatches."""
+    drift = defaultdict(dict)
+    for session in sessions:
+        for field, value in actual[session.pk].items():
+            stored = getattr(session, field)
+            if stored != value:
+                drift[session][field] = (stored, value)
+    return dict(drift)
+
+
+def repair_session(session, actual):
+    """Overwrite a session's totals with recomputed values, re-deriving the frozen close figures."""
+    for field, value in actual.items():
+        setattr(session, field, value)
+    update_fields = list(actual)
+    if session.status == 'CLOSED':
+        session.expected_cash = session.expected_cash_in_drawer
+        session.cash_variance = session.closing_total - session.expected_cash
+        update_fields += ['expected_cash', 'cash_variance']
+    session.save(update_fields=update_fields)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from sales.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def request_fingerprint(request) -> str:
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    data = f"{request.method}|{request.path}|{body}".encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def _replay(record, fingerprint):
+    if record.request_hash != fingerprint:
+        return Response(
+            {"error": f"{IDEMPOTENCY_HEADER} was already used with a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.response_status is None:
+        return Response(
+            {"error": "A request with this Idempotency-Key is still being processed"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response(record.response_body, status=record.response_status, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(view_method):
+    """Short-circuit retried requests that carry an ``Idempotency-Key`` header.
+
+    The first request claims ``(user_client, key)`` and stores its successful
+    response; retries within ``IDEMPOTENCY_KEY_TTL`` replay that response after a
+    single indexed lookup. Apply it inside ``transaction.atomic`` so the claim is
+    rolled back together with the work it guards.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": f"{IDEMPOTENCY_HEADER} must be at most 255 characters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_client = request.user
+        fingerprint = request_fingerprint(request)
+        record = IdempotencyKey.objects.filter(user_client=user_client, key=key).first()
+        if record is not None:
+            if not record.is_expired:
+                return _replay(record, fingerprint)
+            record.delete()
+
+        ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user_client=user_client,
+                    key=key,
+                    request_path=request.path,
+                    request_hash=fingerprint,
+                    expires_at=timezone.now() + ttl,
+                )
+        except IntegrityError:
+            # A concurrent retry claimed the key first; the locking read waits for it to commit.
+            record = IdempotencyKey.objects.select_for_update().filter(user_client=user_client, key=key).first()
+            if record is None:
+                return Response(
+                    {"error": "A request with this Idempotency-Key is still being processed"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return _replay(record, fingerprint)
+
+        response = view_method(self, request, *args, **kwargs)
+        if status.is_success(response.status_code):
+            record.response_status = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['response_status', 'response_body'])
+        else:
+            # Failed attempts must not pin the key; the client may fix the payload and retry.
+            record.delete()
+        return response
+
+    return wrapper
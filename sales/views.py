@@ -1,24 +1,44 @@
 from django.shortcuts import render
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
 # Create your views here.
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend
 from .models import SalesHeader, SalesDetail, Receipt, CashSession, SalesPayment, SalesReturn, SalesRefund, SalesReservation
-from .serializers import SalesHeaderSerializer, SalesDetailSerializer, ReceiptSerializer, CashSessionSerializer, SalesPaymentSerializer, SalesReturnSerializer, SalesRefundSerializer, SalesReservationSerializer
+from .serializers import SalesHeaderSerializer, SalesDetailSerializer, ReceiptSerializer, CashSessionSerializer, SalesPaymentSerializer, SalesReturnSerializer, SalesRefundSerializer, SalesReservationSerializer, SplitPaymentSerializer, CashSessionCloseSerializer
 from authentication.permissions import IsOwner, IsManager, IsEmployee, CanApproveRefunds, CanVoidTransactions, CanOverridePrices
 from rest_framework.permissions import IsAuthenticated
-from AsiriaPOS.mixins import SwaggerTagMixin
+from AsiriaPOS.mixins import SwaggerTagMixin, ExportMixin
 from Domain.models import AuditLog
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, Sum
 from django.utils import timezone
+from products.reports import money_field
 
-class SalesHeaderViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
+class SalesHeaderViewSet(SwaggerTagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = SalesHeader.objects.all()
     serializer_class = SalesHeaderSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'user_client': ['exact'],
+        'customer': ['exact'],
+        'status': ['exact'],
+        'terminal_id': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
+    # Payment token hashes stay out of exports
+    export_fields = [
+        'sales_header_id', 'order_number', 'user_client', 'customer', 'payment_option', 'payment_method',
+        'subtotal', 'total_price', 'remaining_balance', 'status', 'terminal_id', 'sold_at', 'created_at',
+    ]
 
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
@@ -42,11 +62,23 @@ class SalesHeaderViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
         SalesReservation.objects.filter(sales_header=header, is_active=True).update(is_active=False)
         return Response(self.get_serializer(header).data)
 
-class SalesDetailViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
+class SalesDetailViewSet(SwaggerTagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = SalesDetail.objects.all()
     serializer_class = SalesDetailSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'user_client': ['exact'],
+        'sales_header': ['exact'],
+        'product': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
+    export_fields = [
+        'sales_detail_id', 'sales_header', 'user_client', 'product', 'product__name', 'unit',
+        'quantity', 'price_per_unit', 'created_at',
+    ]
 
     def destroy(self, request, *args, **kwargs):
         self.permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee, CanVoidTransactions]
@@ -64,7 +96,7 @@ class SalesDetailViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def margin_report(self, request):
-        """Sales margin report using product average cost, filterable by date range."""
+        """Sales margin report from the cost of goods stored on each line, filterable by date range."""
         qs = self.get_queryset()
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -73,34 +105,27 @@ class SalesDetailViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
         if end_date:
             qs = qs.filter(created_at__date__lte=end_date)
 
+        revenue = Sum(ExpressionWrapper(F('quantity') * F('price_per_unit'), output_field=money_field()))
+        rows = qs.values('product_id', 'product__name').annotate(
+            quantity_sold=Sum('quantity'), revenue=revenue, cogs=Sum('cost_of_goods', output_field=money_field()),
+        ).order_by('product__name')
+
         total_revenue = 0.0
         total_cogs = 0.0
-        by_product = {}
-
-        for d in qs.select_related('product'):
-            revenue = float(d.price_per_unit) * d.quantity
-            cost_unit = float(getattr(d.product, 'average_cost', 0) or float(d.product.cost))
-            cogs = cost_unit * d.quantity
-            total_revenue += revenue
-            total_cogs += cogs
-            key = str(d.product.product_id)
-            if key not in by_product:
-                by_product[key] = {
-                    'product_id': key,
-                    'name': d.product.name,
-                    'quantity': 0,
-                    'revenue': 0.0,
-                    'cogs': 0.0,
-                }
-            by_product[key]['quantity'] += d.quantity
-            by_product[key]['revenue'] += revenue
-            by_product[key]['cogs'] += cogs
-
         items = []
-        for v in by_product.values():
-            v['margin'] = v['revenue'] - v['cogs']
-            v['margin_percent'] = (v['margin'] / v['revenue'] * 100.0) if v['revenue'] else 0.0
-            items.append(v)
+        for row in rows:
+            item = {
+                'product_id': str(row['product_id']),
+                'name': row['product__name'],
+                'quantity': row['quantity_sold'],
+                'revenue': float(row['revenue'] or 0),
+                'cogs': float(row['cogs'] or 0),
+            }
+            item['margin'] = item['revenue'] - item['cogs']
+            item['margin_percent'] = (item['margin'] / item['revenue'] * 100.0) if item['revenue'] else 0.0
+            total_revenue += item['revenue']
+            total_cogs += item['cogs']
+            items.append(item)
 
         return Response({
             'total_revenue': total_revenue,
@@ -140,11 +165,18 @@ class SalesDetailViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
         )
         return Response({'detail': 'Reserved'}, status=status.HTTP_201_CREATED)
 
-class ReceiptViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
+class ReceiptViewSet(SwaggerTagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Receipt.objects.all()
     serializer_class = ReceiptSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
+    # Payment token hashes and the receipt link token stay out of exports
+    export_fields = [
+        'receipt_id', 'receipt_number', 'user_client', 'customer', 'payment_option', 'sales_header',
+        'total_amount', 'amount_paid', 'anonymous_customer_id', 'credit_account_code', 'payment_method',
+        'payment_date', 'narration', 'created_at',
+    ]
 
     def perform_create(self, serializer):
         instance = serializer.save()
@@ -172,48 +204,90 @@ class ReceiptViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
         )
         return response
 
-class CashSessionViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
+class CashSessionViewSet(SwaggerTagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = CashSession.objects.all()
     serializer_class = CashSessionSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
 
+    @swagger_auto_schema(request_body=CashSessionCloseSerializer)
     @action(detail=True, methods=['post'])
     def close(self, request, pk=None):
-        session = self.get_object()
-        closing_total = request.data.get('closing_total', 0)
-        session.close(request.user, closing_total)
+        serializer = CashSessionCloseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            session = CashSession.objects.select_for_update().get(pk=self.get_object().pk)
+            if session.status == 'CLOSED':
+                return Response({"error": "Session already closed"}, status=status.HTTP_400_BAD_REQUEST)
+            session.close(request.user, serializer.validated_data['closing_total'])
         return Response(self.get_serializer(session).data)
 
-class SalesPaymentViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('counted_cash', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, description='Cash counted in the drawer so far'),
+    ])
+    @action(detail=True, methods=['get'], url_path='x-report')
+    def x_report(self, request, pk=None):
+        """Mid-shift report: running totals and expected cash, without closing the session."""
+        session = self.get_object()
+        counted_cash = request.query_params.get('counted_cash')
+        if counted_cash is not None:
+            try:
+                counted_cash = Decimal(counted_cash)
+            except InvalidOperation:
+                return Response({"error": "counted_cash must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(session.report(counted_cash=counted_cash))
+
+    @action(detail=True, methods=['get'], url_path='z-report')
+    def z_report(self, request, pk=None):
+        """End-of-shift report for a closed session: expected vs counted cash as frozen at close."""
+        session = self.get_object()
+        if session.status != 'CLOSED':
+            return Response({"error": "Z-report is only available once the session is closed"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(session.report())
+
+class SalesPaymentViewSet(SwaggerTagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = SalesPayment.objects.all()
     serializer_class = SalesPaymentSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
 
+    @swagger_auto_schema(request_body=SplitPaymentSerializer)
     @action(detail=False, methods=['post'])
     def split(self, request):
-        """Create multiple payments for a sale (split payments)."""
-        sales_header_id = request.data.get('sales_header')
-        payments = request.data.get('payments', [])
-        session_id = request.data.get('session')
-
-        created = []
-        for p in payments:
-            sp = SalesPayment.objects.create(
-                user_client=request.user,
-                sales_header_id=sales_header_id,
-                session_id=session_id,
-                method=p['method'],
-                amount=p['amount'],
-                reference=p.get('reference')
-            )
-            created.append(SalesPaymentSerializer(sp).data)
-        return Response(created, status=status.HTTP_201_CREATED)
-
-class SalesReturnViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
+        """Create multiple payments for a sale (split payments) in one insert.
+
+        The sale's remaining balance and the session's per-method totals are
+        updated in the same transaction.
+        """
+        serializer = SplitPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        header = data['sales_header']
+        session = data.get('session')
+
+        with transaction.atomic():
+            payments = SalesPayment.objects.bulk_create([
+                SalesPayment(
+                    user_client=request.user,
+                    sales_header=header,
+                    session=session,
+                    method=p['method'],
+                    amount=p['amount'],
+                    reference=p.get('reference'),
+                )
+                for p in data['payments']
+            ])
+            # bulk_create skips the post_save signal, so fold the totals in here
+            SalesHeader.apply_payments(payments)
+            CashSession.add_payments(payments)
+        return Response(SalesPaymentSerializer(payments, many=True).data, status=status.HTTP_201_CREATED)
+
+class SalesReturnViewSet(SwaggerTagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = SalesReturn.objects.all()
     serializer_class = SalesReturnSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
 
@@ -223,9 +297,10 @@ class SalesReturnViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
         instance.approve(request.user)
         return Response(self.get_serializer(instance).data)
 
-class SalesRefundViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
+class SalesRefundViewSet(SwaggerTagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = SalesRefund.objects.all()
     serializer_class = SalesRefundSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
 
@@ -235,9 +310,10 @@ class SalesRefundViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
         instance.approve(request.user)
         return Response(self.get_serializer(instance).data)
 
-class SalesReservationViewSet(SwaggerTagMixin, viewsets.ReadOnlyModelViewSet):
+class SalesReservationViewSet(SwaggerTagMixin, ExportMixin, viewsets.ReadOnlyModelViewSet):
     queryset = SalesReservation.objects.all()
     serializer_class = SalesReservationSerializer
+    query_budgets = {'list': 5}
     permission_classes = [IsAuthenticated, IsOwner | IsManager | IsEmployee]
     swagger_tag = "Sales"
     filterset_fields = ['user_client', 'sales_header', 'product', 'is_active']
@@ -0,0 +1,80 @@
+"""
+Async sales read endpoints (``/api/async/...``), the event-loop counterparts of
+the dashboard and report views. See ``products/async_views.py``.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.utils.timezone import localdate
+
+from authentication.async_auth import async_api_view
+from sales.models import SalesCounter
+from sales.reports import margin_querysets, margin_result, margin_row
+from sales.sales_counters import adaily_sales_summary
+
+MAX_REPORT_DAYS = 366
+
+
+def _date_range(request):
+    """Parse ``?from=YYYY-MM-DD&to=YYYY-MM-DD`` (inclusive, default: the last 30 days)."""
+    try:
+        end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else localdate()
+        start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else end - timedelta(days=29)
+    except ValueError:
+        return None, None, "from and to must be YYYY-MM-DD"
+    if start > end:
+        return None, None, "from must not be after to"
+    if (end - start).days >= MAX_REPORT_DAYS:
+        return None, None, f"The range may cover at most {MAX_REPORT_DAYS} days"
+    return start, end, None
+
+
+@async_api_view()
+async def todays_sales(request):
+    """Async twin of ``/api/sales/today/`` (``?breakdown=terminal|hour``)."""
+    breakdown = request.GET.get('breakdown')
+    if breakdown not in (None, 'terminal', 'hour'):
+        return JsonResponse({"error": "breakdown must be 'terminal' or 'hour'"}, status=400)
+    return JsonResponse(await adaily_sales_summary(request.user.pk, localdate(), breakdown=breakdown))
+
+
+@async_api_view()
+async def sales_report(request):
+    """Daily sales totals over a date range, read from the sales counters."""
+    start, end, error = _date_range(request)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+    rows = (
+        SalesCounter.objects.filter(user_client=request.user, sales_date__gte=start, sales_date__lte=end)
+        .values('sales_date')
+        .annotate(total_sales=Sum('total_amount'), sale_count=Sum('sale_count'))
+        .order_by('sales_date')
+    )
+    days = [row async for row in rows]
+    return JsonResponse({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'total_sales': sum(row['total_sales'] for row in days),
+        'sale_count': sum(row['sale_count'] for row in days),
+        'days': days,
+    })
+
+
+@async_api_view()
+async def margin_report(request):
+    """Revenue, cost and gross margin per product over a date range (``?from&to``, ``?top=N``)."""
+    start, end, error = _date_range(request)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+    try:
+        top = int(request.GET['top']) if request.GET.get('top') else None
+    except ValueError:
+        return JsonResponse({"error": "top must be an integer"}, status=400)
+    if top is not None and top < 1:
+        return JsonResponse({"error": "top must be at least 1"}, status=400)
+
+    lines, totals, rows = margin_querysets(request.user.pk, start, end, top)
+    totals = await lines.aaggregate(**totals)
+    items = [margin_row(row) async for row in rows]
+    return JsonResponse(margin_result(start, end, totals, items))
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 
@@ -20,6 +21,28 @@ class CheckoutInitializeSerializer(serializers.Serializer):
     terminal_id = serializers.CharField(required=False, allow_blank=True)
 
 
+class OfflinePaymentSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['CASH', 'CARD', 'MOBILE', 'BANK', 'OTHER'])
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    reference = serializers.CharField(required=False, allow_blank=True)
+
+
+class OfflineSaleSerializer(CheckoutInitializeSerializer):
+    client_sale_id = serializers.UUIDField()
+    sold_at = serializers.DateTimeField()
+    session_id = serializers.UUIDField(required=False)
+    payments = OfflinePaymentSerializer(many=True, required=False)
+
+
+class OfflineSalesBatchSerializer(serializers.Serializer):
+    # Each sale is validated on its own so one bad sale does not reject the whole upload
+    sales = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'OFFLINE_SALES_BATCH_MAX_SIZE', 500),
+    )
+
+
 class ReceiptLinkSerializer(serializers.Serializer):
     receipt_id = serializers.UUIDField()
     phone = serializers.CharField(required=False, allow_blank=True)
@@ -3,45 +3,61 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated  # Change if you want to restrict access
-from django.utils.timezone import now
-from django.db.models import Sum
+from django.utils.timezone import localdate
 from django.db import transaction
 from sales.models import SalesHeader, Receipt, SalesDetail
 from registry.models import Customer, PaymentOption, AnonymousProfile
+from products.cost_layers import CostLine, consume_layers
 from products.models import Product, Unit
+from products.stock_ledger import lock_products
 from users.models import UserClient
 from sales.utils.token_hash import hash_token
+from sales.utils.idempotency import idempotent, IDEMPOTENCY_HEADER
 import uuid
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .serializers import CheckoutInitializeSerializer, ReceiptLinkSerializer
+from .serializers import CheckoutInitializeSerializer, ReceiptLinkSerializer, OfflineSaleSerializer, OfflineSalesBatchSerializer
+from sales.offline_sync import ingest_offline_sales
+from sales.sales_counters import daily_sales_summary
 from django.utils.crypto import get_random_string
 
 class TodaysSalesTotalAPIView(APIView):
     permission_classes = [IsAuthenticated]  # ⚠️ For testing; use IsAuthenticated in production
 
+    @swagger_auto_schema(
+        operation_description="Today's sales total for the current client, read from the running sales counters (cached).",
+        manual_parameters=[
+            openapi.Parameter('breakdown', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['terminal', 'hour'], required=False),
+        ],
+        tags=['POS Checkout'],
+    )
     def get(self, request):
-        today = now().date()
-        total_sales = SalesHeader.objects.filter(created_at__date=today).aggregate(
-            total=Sum("total_price")
-        )["total"] or 0
-
-        return Response({"total_sales": float(total_sales)})
+        breakdown = request.query_params.get('breakdown')
+        if breakdown not in (None, 'terminal', 'hour'):
+            return Response({"error": "breakdown must be 'terminal' or 'hour'"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(daily_sales_summary(request.user.pk, localdate(), breakdown=breakdown))
 
 
 class CheckoutInitializeAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Initialize checkout: create SalesHeader, line items, and a Receipt. Supports anonymous capture and phone-lite linking.",
+        operation_description="Initialize checkout: create SalesHeader, line items, and a Receipt. Supports anonymous capture and phone-lite linking. Retries carrying the same Idempotency-Key replay the original response.",
         request_body=CheckoutInitializeSerializer,
+        manual_parameters=[
+            openapi.Parameter(IDEMPOTENCY_HEADER, openapi.IN_HEADER, type=openapi.TYPE_STRING, required=False,
+                              description="Client-generated key; retries with the same key return the first response"),
+        ],
         responses={
             201: openapi.Response(description="Checkout initialized"),
             400: openapi.Response(description="Validation error"),
+            409: openapi.Response(description="Same key still being processed"),
+            422: openapi.Response(description="Key reused with a different payload"),
         },
         tags=['POS Checkout']
     )
     @transaction.atomic
+    @idempotent
     def post(self, request):
         user_client: UserClient = request.user
         serializer = CheckoutInitializeSerializer(data=request.data)
@@ -91,8 +107,15 @@ class CheckoutInitializeAPIView(APIView):
                 return Response({"error": "Each item needs product_id and qty > 0"}, status=status.HTTP_400_BAD_REQUEST)
             subtotal += qty * price
 
+        # Products are locked before their cost layers, in the same order as batch uploads take them
+        products = lock_products(item['product_id'] for item in items)
+        unknown = [str(item['product_id']) for item in items if item['product_id'] not in products]
+        if unknown:
+            return Response({"error": f"Invalid product_id: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
         total_price = subtotal  # extend later with taxes/discounts
-        remaining_balance = 0
+        # Nothing is paid yet; SalesPayment rows draw this down as they are recorded
+        remaining_balance = total_price
 
         # Create SalesHeader (anonymous if no customer)
         order_number = f"SO-{uuid.uuid4().hex[:8].upper()}"
@@ -123,9 +146,12 @@ class CheckoutInitializeAPIView(APIView):
             sales_header.credit_account_code = credit_account_code
         sales_header.save()
 
+        # Cost the whole checkout against the FIFO layers in one pass
+        costs = consume_layers(user_client, [CostLine(item['product_id'], int(item['qty'])) for item in items], products=products)
+
         # Create line items and decrease stock via existing signals
-        for item in items:
-            product = Product.objects.get(pk=item['product_id'])
+        for item, cost_of_goods in zip(items, costs):
+            product = products[item['product_id']]
             unit = Unit.objects.get(pk=item.get('unit_id', product.unit_id))
             qty = int(item['qty'])
             price = float(item.get('price') or product.price)
@@ -136,6 +162,7 @@ class CheckoutInitializeAPIView(APIView):
                 unit=unit,
                 quantity=qty,
                 price_per_unit=price,
+                cost_of_goods=cost_of_goods,
             )
 
         # Create receipt skeleton (amounts can be adjusted by payment flow)
@@ -171,6 +198,50 @@ class CheckoutInitializeAPIView(APIView):
         }, status=status.HTTP_201_CREATED)
 
 
+class CheckoutBatchUploadAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Upload sales queued offline by a till in one request. Each sale carries a client_sale_id "
+                              "(re-uploads are reported as duplicates) and the time it was sold. Sales are validated together "
+                              "and written in chunked transactions; the response has one result per sale, in request order.",
+        request_body=OfflineSalesBatchSerializer,
+        responses={
+            200: openapi.Response(description="Per-sale results"),
+            400: openapi.Response(description="Validation error"),
+        },
+        tags=['POS Checkout']
+    )
+    def post(self, request):
+        user_client: UserClient = request.user
+        serializer = OfflineSalesBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(serializer.validated_data['sales'])
+        valid_positions = []
+        valid_sales = []
+        for position, raw_sale in enumerate(serializer.validated_data['sales']):
+            sale_serializer = OfflineSaleSerializer(data=raw_sale)
+            if sale_serializer.is_valid():
+                valid_positions.append(position)
+                valid_sales.append(sale_serializer.validated_data)
+            else:
+                results[position] = {
+                    "client_sale_id": raw_sale.get('client_sale_id'),
+                    "status": "error",
+                    "errors": sale_serializer.errors,
+                }
+
+        for position, result in zip(valid_positions, ingest_offline_sales(user_client, valid_sales)):
+            results[position] = result
+
+        summary = {key: 0 for key in ('created', 'duplicate', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+        return Response({"summary": summary, "results": results}, status=status.HTTP_200_OK)
+
+
 class ReceiptLinkTokenSerializer(ReceiptLinkSerializer):
     token = serializers.CharField()
 
@@ -12,6 +12,7 @@ from .models import UserClient, PasswordResetToken, UserClientManager  # Import
 class UserClientViewSet(SwaggerTagMixin, viewsets.ModelViewSet):
     queryset = UserClient.objects.all()
     serializer_class = UserClientSerializer
+    query_budgets = {'list': 2}
     swagger_tag = "Clients"
 
     def get_permissions(self):